@@ -0,0 +1 @@
+"""Suite de benchmarks con datos sintéticos deterministas (ver `python -m benchmarks -h`)."""
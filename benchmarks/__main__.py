@@ -0,0 +1,140 @@
+"""
+Benchmarks de los caminos críticos de MRP y costeo.
+
+    python -m benchmarks                         # escala 10k, verifica golden
+    python -m benchmarks --escala 1000000 -r 3   # 1M líneas de ventas
+    python -m benchmarks --solo process_bom,informe_desviacion
+    python -m benchmarks --comparar benchmarks/resultados/<anterior>.json
+    python -m benchmarks --actualizar-golden     # sólo tras un cambio de cálculo intencional
+    python -m benchmarks.carga --usuarios 8      # prueba de carga de la app (benchmarks/carga.py)
+    python -m pytest benchmarks/tests            # pruebas puntuales del núcleo con datos chicos
+
+Cada corrida guarda un JSON en benchmarks/resultados/ con tiempos por caso,
+dimensiones de los datos, commit y versiones, para comparar entre commits.
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from . import casos
+
+DIR_RESULTADOS = casos.DIR_BENCH / "resultados"
+UMBRAL_REGRESION = 1.10  # >10% más lento que la referencia
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=casos.DIR_BENCH,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconocido"
+
+
+def _medir(caso, entorno, repeticiones):
+    tiempos, salida = [], None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        salida = caso.ejecutar(entorno)
+        tiempos.append(time.perf_counter() - t0)
+    return tiempos, salida
+
+
+def _comparar(actual, ruta_ref):
+    ref = json.loads(Path(ruta_ref).read_text())
+    if ref.get("escala") != actual["escala"]:
+        print(f"⚠️  La referencia es de escala {ref.get('escala')}, la actual {actual['escala']}.")
+    regresiones = 0
+    print(f"\nComparación contra {ruta_ref} ({ref.get('commit')}):")
+    for nombre, res in actual["casos"].items():
+        base = ref.get("casos", {}).get(nombre)
+        if not base:
+            continue
+        ratio = res["mediana_s"] / base["mediana_s"] if base["mediana_s"] else float("inf")
+        marca = "🔴" if ratio > UMBRAL_REGRESION else "🟢" if ratio < 1 / UMBRAL_REGRESION else "  "
+        regresiones += ratio > UMBRAL_REGRESION
+        print(f"  {marca} {nombre:<24} {base['mediana_s']:>9.3f}s → {res['mediana_s']:>9.3f}s  ×{ratio:.2f}")
+    return regresiones
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--escala", type=int, default=casos.ESCALA_GOLDEN,
+                    help="líneas de ventas a generar (10k → 10M)")
+    ap.add_argument("--semilla", type=int, default=casos.SEMILLA_GOLDEN)
+    ap.add_argument("-r", "--repeticiones", type=int, default=3)
+    ap.add_argument("--solo", default="", help="casos separados por coma")
+    ap.add_argument("--regenerar", action="store_true", help="vuelve a sembrar la base de prueba")
+    ap.add_argument("--actualizar-golden", action="store_true")
+    ap.add_argument("--comparar", metavar="JSON", help="resultado anterior contra el que comparar")
+    ap.add_argument("--log-etapas", action="store_true", help="emite los logs JSON de mrp.perf")
+    args = ap.parse_args(argv)
+    if args.log_etapas:
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger("mrp.perf").setLevel(logging.INFO)
+
+    solo = {s.strip() for s in args.solo.split(",") if s.strip()}
+    seleccion = [c for c in casos.CASOS if not solo or c.nombre in solo]
+    es_golden = (args.escala, args.semilla) == (casos.ESCALA_GOLDEN, casos.SEMILLA_GOLDEN)
+
+    t0 = time.perf_counter()
+    entorno = casos.preparar(args.escala, args.semilla, args.regenerar)
+    print(f"Datos listos en {time.perf_counter() - t0:.1f}s — {entorno.datos.dim}")
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "escala": args.escala,
+        "semilla": args.semilla,
+        "dimensiones": vars(entorno.datos.dim),
+        "entorno": {
+            "python": platform.python_version(), "pandas": pd.__version__,
+            "numpy": np.__version__, "maquina": platform.machine(),
+        },
+        "casos": {},
+    }
+
+    fallas_golden = 0
+    for caso in seleccion:
+        tiempos, salida = _medir(caso, entorno, args.repeticiones)
+        golden = "n/a"
+        if es_golden and args.actualizar_golden:
+            casos.guardar_golden(caso, salida)
+            golden = "actualizado"
+        elif es_golden and casos.ruta_golden(caso).exists():
+            dif = casos.verificar_golden(caso, salida)
+            golden = "ok" if dif is None else f"DIFIERE: {dif}"
+            fallas_golden += dif is not None
+        resultado["casos"][caso.nombre] = {
+            "tiempos_s": [round(t, 6) for t in tiempos],
+            "min_s": round(min(tiempos), 6),
+            "mediana_s": round(statistics.median(tiempos), 6),
+            "filas_salida": int(len(salida)),
+            "golden": golden,
+        }
+        print(f"  {caso.nombre:<24} mediana {statistics.median(tiempos):>9.3f}s  "
+              f"min {min(tiempos):>9.3f}s  filas {len(salida):>9,}  golden {golden}")
+
+    DIR_RESULTADOS.mkdir(exist_ok=True)
+    destino = DIR_RESULTADOS / f"{datetime.now():%Y%m%d-%H%M%S}-{resultado['commit']}-e{args.escala}.json"
+    destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"\nResultados: {destino}")
+
+    regresiones = _comparar(resultado, args.comparar) if args.comparar else 0
+    return 1 if fallas_golden or regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
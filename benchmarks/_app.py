@@ -0,0 +1,20 @@
+"""
+Acceso al núcleo de cálculo (paquete costeo) apuntando a la base de prueba.
+"""
+import os
+import types
+
+from costeo import compras, costos, db, espejo, informes, mrp, persistencia
+
+
+def cargar_app(ruta_duckdb):
+    """Devuelve un espacio de nombres con la lógica del núcleo sobre el DuckDB `ruta_duckdb`."""
+    os.environ["MRP_BACKEND"] = "duckdb"
+    os.environ["MRP_DUCKDB_PATH"] = str(ruta_duckdb)
+    os.environ.pop("MRP_PARQUET_DIR", None)
+    db.get_engine.cache_clear()
+
+    app = types.SimpleNamespace()
+    for mod in (db, espejo, mrp, compras, costos, informes, persistencia):
+        vars(app).update({k: v for k, v in vars(mod).items() if not k.startswith('__')})
+    return app
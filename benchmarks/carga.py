@@ -0,0 +1,323 @@
+"""
+Prueba de carga: N usuarios simultáneos sobre el app.py real.
+
+    python -m benchmarks.carga                          # 4 usuarios, 2 rondas, escala 10k
+    python -m benchmarks.carga --usuarios 16 --rondas 3 --escala 400000
+    python -m benchmarks.carga --mismo-periodo          # todos piden los mismos informes
+    python -m benchmarks.carga --comparar benchmarks/resultados/carga-<anterior>.json
+
+Cada usuario es una sesión de streamlit.testing (AppTest) en su propio hilo,
+todas en este proceso (como un servidor Streamlit: comparten pool de
+conexiones, cachés y el cupo de informes de costeo.concurrencia). Sobre una
+copia del DuckDB sembrado de benchmarks/.cache, cada ronda recorre Gestión de
+Datos → Explosión MRP → Informes 1, 2 y 3 (generándolos) con un período
+de PERIODO_DIAS días al azar (--mismo-periodo: el último, igual para todos).
+
+Reporta p50 / p95 / p99 de la latencia de cada paso (un rerun del script),
+conexiones a la base (máximo simultáneo en uso y nuevas durante la prueba)
+y RSS del proceso, y guarda un JSON en benchmarks/resultados/ para comparar.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from . import casos
+from .__main__ import DIR_RESULTADOS, UMBRAL_REGRESION, _commit
+
+RUTA_APP = casos.DIR_BENCH.parent / "app.py"
+PERIODO_DIAS = 30
+INTERVALO_MUESTRA = 0.05   # segundos entre muestras de RSS
+
+# (menú, submódulo, botón a pulsar) — un paso por elemento, más la navegación
+RECORRIDO = [
+    ("📦 Gestión de Datos", "Recetario", None),
+    ("🧮 Explosión MRP", None, None),
+    ("📊 Informes", "Rentabilidad", "Generar Informe 1"),
+    ("📊 Informes", "Desviación", "Generar Informe 2"),
+    ("📊 Informes", "Variación Precio Compras", "Generar Informe 3"),
+]
+
+
+# ============================================================
+# MEDICIÓN
+# ============================================================
+def _rss_mb():
+    """RSS actual del proceso en MB (None si no hay /proc)."""
+    try:
+        paginas = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    import resource
+    return paginas * resource.getpagesize() / 2**20
+
+
+class Monitor:
+    """Conexiones del pool en uso / nuevas y RSS muestreado mientras dura la prueba."""
+
+    def __init__(self, engine):
+        self._lock = threading.Lock()
+        self.en_uso = self.max_en_uso = self.abiertas = 0
+        self.rss = []
+        self._fin = threading.Event()
+        if engine is not None:
+            from sqlalchemy import event
+            event.listen(engine, "connect", self._conectar)
+            event.listen(engine, "checkout", self._tomar)
+            event.listen(engine, "checkin", self._devolver)
+        self._hilo = threading.Thread(target=self._muestrear, name="carga-monitor", daemon=True)
+
+    def _conectar(self, *_):
+        with self._lock:
+            self.abiertas += 1
+
+    def _tomar(self, *_):
+        with self._lock:
+            self.en_uso += 1
+            self.max_en_uso = max(self.max_en_uso, self.en_uso)
+
+    def _devolver(self, *_):
+        with self._lock:
+            self.en_uso -= 1
+
+    def _muestrear(self):
+        while not self._fin.wait(INTERVALO_MUESTRA):
+            rss = _rss_mb()
+            if rss is not None:
+                self.rss.append(rss)
+
+    def __enter__(self):
+        self.rss_inicial = _rss_mb()
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._fin.set()
+        self._hilo.join()
+
+
+def percentiles(ms):
+    if not ms:
+        return {"n": 0}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {"n": len(ms), "p50_ms": round(float(p50), 1), "p95_ms": round(float(p95), 1),
+            "p99_ms": round(float(p99), 1), "max_ms": round(float(max(ms)), 1)}
+
+
+# ============================================================
+# USUARIO SIMULADO
+# ============================================================
+@contextlib.contextmanager
+def runtime_compartido():
+    """
+    AppTest instala un Runtime global al empezar cada run() y lo borra al
+    terminar: con varias sesiones en hilos, una borra el de la otra. Durante
+    la prueba queda uno solo fijo (como en el servidor real, con la caché de
+    st.cache_data compartida) y los run() escriben en un Runtime de descarte.
+    También comparten el script compilado, como en el servidor (AppTest lo
+    recompila en cada run() y ast.parse en paralelo falla en Python 3.11).
+    """
+    from unittest.mock import MagicMock
+
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    scripts = ScriptCache()
+    scripts.get_bytecode(str(RUTA_APP))
+    previo = (app_test.Runtime, app_test.ScriptCache, local_script_runner.ScriptCache,
+              Runtime._instance, config.get_option("global.appTest"))
+    app_test.Runtime = types.SimpleNamespace(_instance=None)
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: scripts
+    Runtime._instance = runtime
+    # Cada run() lo pone en True y restaura el valor previo al salir
+    config.set_option("global.appTest", True)
+    try:
+        yield runtime
+    finally:
+        (app_test.Runtime, app_test.ScriptCache, local_script_runner.ScriptCache,
+         Runtime._instance, valor) = previo
+        config.set_option("global.appTest", valor)
+
+
+def _boton(botones, pred):
+    return next((b for b in botones if pred(b)), None)
+
+
+def _usuario(n, args, periodos, registro, errores):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(RUTA_APP), default_timeout=args.timeout)
+
+    def paso(accion, preparar=None):
+        if preparar is not None:
+            preparar()
+        t0 = time.perf_counter()
+        at.run()
+        ms = (time.perf_counter() - t0) * 1000
+        registro.append((accion, ms))
+        if len(at.exception):
+            errores.append(f"usuario {n} · {accion}: {at.exception[0].value}")
+
+    def navegar(menu, sub):
+        visible = sub and _boton(at.sidebar.button, lambda b: b.key == f"sub_{menu} — {sub}")
+        if not visible:
+            paso(f"menú {menu}", _boton(at.sidebar.button, lambda b: b.key == f"menu_{menu}").click)
+        if sub:
+            paso(f"abrir {sub}", _boton(at.sidebar.button, lambda b: b.key == f"sub_{menu} — {sub}").click)
+
+    try:
+        paso("inicio")
+        for ronda in range(args.rondas):
+            desde, hasta = periodos[(n + ronda) % len(periodos)]
+            paso("filtros", lambda: (at.sidebar.date_input[0].set_value(desde),
+                                     at.sidebar.date_input[1].set_value(hasta)))
+            for menu, sub, texto in RECORRIDO:
+                navegar(menu, sub)
+                if texto:
+                    boton = _boton(at.button, lambda b: texto in b.label)
+                    if boton is None:
+                        errores.append(f"usuario {n}: no se encontró «{texto}»")
+                        continue
+                    paso(texto.replace("Generar ", ""), boton.click)
+    except Exception as e:
+        errores.append(f"usuario {n}: {type(e).__name__}: {e}")
+
+
+def _periodos(datos, cantidad, mismo, semilla):
+    ultimo = (datos.fecha_f - timedelta(days=PERIODO_DIAS - 1), datos.fecha_f)
+    if mismo:
+        return [ultimo]
+    rng = random.Random(semilla)
+    dias = max((datos.fecha_f - datos.fecha_i).days - PERIODO_DIAS + 1, 1)
+    inicios = [datos.fecha_i + timedelta(days=rng.randrange(dias)) for _ in range(cantidad)]
+    return [(i, i + timedelta(days=PERIODO_DIAS - 1)) for i in inicios]
+
+
+# ============================================================
+# CORRIDA
+# ============================================================
+def _comparar(actual, ruta_ref):
+    ref = json.loads(Path(ruta_ref).read_text())
+    regresiones = 0
+    print(f"\nComparación contra {ruta_ref} ({ref.get('commit')}, {ref.get('usuarios')} usuarios):")
+    for accion, res in actual["latencia"].items():
+        base = ref.get("latencia", {}).get(accion)
+        if not base or not base.get("n") or not res.get("n"):
+            continue
+        ratio = res["p95_ms"] / base["p95_ms"] if base["p95_ms"] else float("inf")
+        marca = "🔴" if ratio > UMBRAL_REGRESION else "🟢" if ratio < 1 / UMBRAL_REGRESION else "  "
+        regresiones += ratio > UMBRAL_REGRESION
+        print(f"  {marca} {accion:<32} p95 {base['p95_ms']:>9.0f} ms → {res['p95_ms']:>9.0f} ms  ×{ratio:.2f}")
+    return regresiones
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.carga", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-u", "--usuarios", type=int, default=4)
+    ap.add_argument("--rondas", type=int, default=2, help="recorridos completos por usuario")
+    ap.add_argument("--escala", type=int, default=casos.ESCALA_GOLDEN)
+    ap.add_argument("--semilla", type=int, default=casos.SEMILLA_GOLDEN)
+    ap.add_argument("--mismo-periodo", action="store_true", help="todos los usuarios piden el mismo período")
+    ap.add_argument("--escalonar", type=float, default=0.2, help="segundos entre el arranque de cada usuario")
+    ap.add_argument("--timeout", type=float, default=600, help="segundos máximos por rerun")
+    ap.add_argument("--comparar", metavar="JSON", help="resultado anterior contra el que comparar")
+    ap.add_argument("--log-etapas", action="store_true", help="emite los logs JSON de mrp.perf")
+    args = ap.parse_args(argv)
+    if not args.log_etapas:
+        logging.getLogger("mrp.perf").setLevel(logging.WARNING)
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    t0 = time.perf_counter()
+    entorno = casos.preparar(args.escala, args.semilla)
+    # Copia: la app crea tablas auxiliares y no deben quedar en la base de los benchmarks
+    tmp = Path(tempfile.mkdtemp(prefix="mrp-carga-"))
+    ruta_db = tmp / entorno.ruta_db.name
+    shutil.copy(entorno.ruta_db, ruta_db)
+    from ._app import cargar_app
+    app = cargar_app(ruta_db)
+    print(f"Datos listos en {time.perf_counter() - t0:.1f}s — {entorno.datos.dim}")
+
+    periodos = _periodos(entorno.datos, args.usuarios, args.mismo_periodo, args.semilla)
+    registros = [[] for _ in range(args.usuarios)]
+    errores = []
+    hilos = [threading.Thread(target=_usuario, args=(n, args, periodos, registros[n], errores),
+                              name=f"carga-usuario-{n}")
+             for n in range(args.usuarios)]
+
+    try:
+        with runtime_compartido(), Monitor(app.get_engine()) as mon:
+            t_ini = time.perf_counter()
+            for h in hilos:
+                h.start()
+                time.sleep(args.escalonar)
+            for h in hilos:
+                h.join()
+            duracion = time.perf_counter() - t_ini
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    pasos = [r for reg in registros for r in reg]
+    por_accion = {}
+    for accion, ms in pasos:
+        por_accion.setdefault(accion, []).append(ms)
+    informes = [ms for accion, ms in pasos if accion.startswith("Informe")]
+
+    resultado = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "usuarios": args.usuarios,
+        "rondas": args.rondas,
+        "escala": args.escala,
+        "semilla": args.semilla,
+        "mismo_periodo": args.mismo_periodo,
+        "duracion_s": round(duracion, 2),
+        "latencia": {"total": percentiles([ms for _, ms in pasos]),
+                     "informes": percentiles(informes),
+                     **{a: percentiles(v) for a, v in por_accion.items()}},
+        "conexiones": {"max_en_uso": mon.max_en_uso, "nuevas": mon.abiertas},
+        "rss_mb": {"inicial": round(mon.rss_inicial, 1) if mon.rss_inicial else None,
+                   "max": round(max(mon.rss), 1) if mon.rss else None},
+        "errores": errores,
+    }
+
+    print(f"\n{args.usuarios} usuarios × {args.rondas} rondas en {duracion:.1f}s")
+    for accion, p in resultado["latencia"].items():
+        if p["n"]:
+            print(f"  {accion:<32} n {p['n']:>4}  p50 {p['p50_ms']:>8.0f}  p95 {p['p95_ms']:>8.0f}  "
+                  f"p99 {p['p99_ms']:>8.0f} ms")
+    print(f"  conexiones: máx. en uso {mon.max_en_uso}, nuevas {mon.abiertas}")
+    print(f"  RSS: {resultado['rss_mb']['inicial']} → máx. {resultado['rss_mb']['max']} MB")
+    for e in errores:
+        print(f"  ⚠️  {e}")
+
+    DIR_RESULTADOS.mkdir(exist_ok=True)
+    destino = DIR_RESULTADOS / f"carga-{datetime.now():%Y%m%d-%H%M%S}-{resultado['commit']}-u{args.usuarios}.json"
+    destino.write_text(json.dumps(resultado, indent=2, ensure_ascii=False))
+    print(f"\nResultados: {destino}")
+
+    regresiones = _comparar(resultado, args.comparar) if args.comparar else 0
+    return 1 if errores or regresiones else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+"""
+Base local de prueba (DuckDB sembrado con datos sintéticos) y casos de
+benchmark sobre los caminos críticos de MRP y costeo, con verificación
+contra salidas golden.
+"""
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+import duckdb
+import pandas as pd
+
+from . import generador
+from ._app import cargar_app
+
+DIR_BENCH  = Path(__file__).resolve().parent
+DIR_CACHE  = DIR_BENCH / ".cache"
+DIR_GOLDEN = DIR_BENCH / "golden"
+
+# Escala y semilla con las que se generaron los archivos de golden/
+ESCALA_GOLDEN = 10_000
+SEMILLA_GOLDEN = 42
+
+COLS_COMPRAS_DB = [
+    'local', 'fecha_dte', 'rut_proveedor', 'nombre_proveedor', 'tipo_dte',
+    'folio', 'nombre_producto', 'sku', 'subcat', 'codigo_impuesto',
+    'cantidad', 'conversion', 'formato', 'categoria_producto',
+    'cant_conv', 'monto_real', 'recargo2', 'total_neto2',
+    'imp_adic', 'iva_2', 'tootal2', 'costo_realfinal', 'muc'
+]
+
+
+@dataclass
+class Entorno:
+    app: object                      # espacio de nombres devuelto por _app.cargar_app
+    datos: generador.DatosSinteticos
+    ruta_db: Path
+
+
+def _ventas_db(ventas_pos):
+    # Misma transformación que save_ventas (renombre + fecha dd/mm/aaaa)
+    df = ventas_pos.rename(columns={
+        'fecha_pura': 'fecha_venta', 'cat_menu': 'categoria_menu',
+        'nombre': 'nombre_producto', 'id_producto': 'sku_producto',
+        'cantidad': 'cantidad_vendida', 'venta_real': 'monto_venta_real'
+    })
+    df['fecha_venta'] = pd.to_datetime(df['fecha_venta'], dayfirst=True, errors='coerce').dt.date
+    return df.dropna(subset=['fecha_venta'])
+
+
+def preparar(escala, semilla, regenerar=False):
+    """Genera los datos y siembra (una vez por escala/semilla) el DuckDB de prueba."""
+    datos = generador.generar(escala, semilla)
+    DIR_CACHE.mkdir(exist_ok=True)
+    ruta_db = DIR_CACHE / f"escala{escala}-semilla{semilla}.duckdb"
+    sembrar = regenerar or not ruta_db.exists()
+    if sembrar and ruta_db.exists():
+        ruta_db.unlink()
+
+    app = cargar_app(ruta_db)
+    if sembrar:
+        compras, _ = app.procesar_compras(datos.compras_raw)
+        ventas = _ventas_db(datos.ventas)
+        con = duckdb.connect(str(ruta_db))
+        for ddl in app.ESQUEMA_LOCAL:
+            con.execute(ddl)
+        con.register('v_ventas', ventas)
+        con.execute("INSERT INTO ventas BY NAME SELECT * FROM v_ventas")
+        con.register('v_compras', compras[[c for c in COLS_COMPRAS_DB if c in compras.columns]])
+        con.execute("INSERT INTO compras BY NAME SELECT * FROM v_compras")
+        con.close()
+        app.save_recetario(datos.directos.copy(), datos.procesados.copy())
+    return Entorno(app=app, datos=datos, ruta_db=ruta_db)
+
+
+@dataclass
+class Caso:
+    nombre: str
+    ejecutar: Callable        # (entorno) -> DataFrame
+    claves: list              # columnas de orden para comparar con golden
+
+
+def _process_bom(e):
+    d = e.datos
+    return e.app.process_bom(d.hoja_ventas_mrp(), d.directos.copy(), d.procesados.copy())
+
+
+def _procesar_compras(e):
+    return e.app.procesar_compras(e.datos.compras_raw)[0]
+
+
+def _costo_platos(e):
+    return e.app.calcular_costo_platos(e.app.get_engine(), e.datos.fecha_i, e.datos.fecha_f, "Todos")
+
+
+def _recalcular_costos(e):
+    # informe_rentabilidad lee costo_platos ya armado por save_recetario: este
+    # caso mide el cálculo completo (recetario, precios vigentes, costo_recetas)
+    e.app.recalcular_costos()
+    return e.app.run_query("SELECT sku_producto, costo_unitario_teorico FROM costo_platos")
+
+
+def _rentabilidad(e):
+    return e.app.informe_rentabilidad(e.datos.fecha_i, e.datos.fecha_f, "Todos")
+
+
+def _desviacion(e):
+    return e.app.informe_desviacion(e.datos.fecha_i, e.datos.fecha_f, "Todos")
+
+
+CASOS = [
+    Caso('process_bom',           _process_bom,       ['SKU', 'UM']),
+    Caso('procesar_compras',      _procesar_compras,  []),   # conserva el orden de las líneas
+    Caso('calcular_costo_platos', _costo_platos,      ['sku_producto']),
+    Caso('recalcular_costos',     _recalcular_costos, ['sku_producto']),
+    Caso('informe_rentabilidad',  _rentabilidad,      ['sku_producto', 'nombre_producto', 'categoria_menu']),
+    Caso('informe_desviacion',    _desviacion,        ['sku_ingrediente', 'sku']),
+]
+
+
+def canonico(df, claves):
+    """Forma comparable: índice limpio, objetos como texto y orden estable por claves."""
+    out = df.reset_index(drop=True).copy()
+    for c in out.columns:
+        if out[c].dtype == object:
+            out[c] = out[c].astype(str)
+    claves = [c for c in claves if c in out.columns]
+    if claves:
+        out = out.sort_values(claves, kind='mergesort').reset_index(drop=True)
+    return out
+
+
+def ruta_golden(caso):
+    return DIR_GOLDEN / f"{caso.nombre}.parquet"
+
+
+def guardar_golden(caso, df):
+    DIR_GOLDEN.mkdir(exist_ok=True)
+    canonico(df, caso.claves).to_parquet(ruta_golden(caso), index=False)
+
+
+def verificar_golden(caso, df):
+    """Devuelve None si coincide con el golden, o el mensaje de diferencia."""
+    esperado = pd.read_parquet(ruta_golden(caso))
+    obtenido = canonico(df, caso.claves)
+    try:
+        pd.testing.assert_frame_equal(
+            obtenido, esperado, check_dtype=False, check_exact=False, rtol=1e-9, atol=1e-6)
+    except AssertionError as err:
+        return str(err).splitlines()[0] if str(err) else "difiere"
+    return None
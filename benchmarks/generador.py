@@ -0,0 +1,235 @@
+"""
+Generador determinista de datos sintéticos con la forma real de los archivos:
+recetario (hojas Directos / Procesados, con PRO- anidados), ventas del POS y
+Excel de facturas de compras.
+
+Misma (escala, semilla) → mismos datos, byte a byte.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+FECHA_BASE = date(2024, 1, 1)
+LOCALES = ['Centro', 'Norte', 'Costanera']
+UMS = np.array(['G', 'G', 'G', 'CC', 'ML', 'UN', 'KG'])
+CATEGORIAS_INSUMO = np.array(['Carnes', 'Lácteos', 'Verduras', 'Abarrotes', 'Bebidas', 'Panadería'])
+CATEGORIAS_MENU = np.array(['Entradas', 'Fondos', 'Postres', 'Bebidas', 'Sandwich'])
+PROVEEDORES = [(f"76.{100 + i:03d}.{i:03d}-{i % 10}", f"Proveedor {i:02d}") for i in range(25)]
+COD_IMPUESTO = np.array(['', '', '', '', '', '', '271', '27', '24', '18'])
+
+
+@dataclass
+class Dimensiones:
+    escala: int            # líneas de ventas
+    lineas_compras: int
+    platos: int
+    procesados: int
+    insumos: int
+    dias: int
+
+    @classmethod
+    def para(cls, escala, lineas_compras=None):
+        escala = int(escala)
+        platos = int(np.clip(escala // 200, 50, 2000))
+        return cls(
+            escala=escala,
+            lineas_compras=int(lineas_compras or max(escala // 2, 1000)),
+            platos=platos,
+            procesados=max(platos // 8, 6),
+            insumos=int(np.clip(escala // 150, 80, 3000)),
+            dias=int(np.clip(escala // 500, 60, 1095)),
+        )
+
+
+@dataclass
+class DatosSinteticos:
+    dim: Dimensiones
+    insumos: pd.DataFrame      # catálogo: sku, nombre, um, categoria, subcat, precio, conversion, formato
+    directos: pd.DataFrame     # hoja "Directos" del recetario
+    procesados: pd.DataFrame   # hoja "Procesados" del recetario
+    ventas: pd.DataFrame       # export POS (columnas de entrada de save_ventas)
+    compras_raw: pd.DataFrame  # Excel de facturas (entrada de procesar_compras)
+
+    @property
+    def fecha_i(self):
+        return FECHA_BASE
+
+    @property
+    def fecha_f(self):
+        return FECHA_BASE + timedelta(days=self.dim.dias - 1)
+
+    def hoja_ventas_mrp(self):
+        """Hoja "Ventas" del Excel de Explosión MRP (SKU / Cantidad)."""
+        return pd.DataFrame({'SKU': self.ventas['id_producto'], 'Cantidad': self.ventas['cantidad']})
+
+
+def _insumos(rng, dim):
+    n = dim.insumos
+    sku = np.array([f"INS-{i:04d}" for i in range(n)])
+    um = UMS[rng.integers(0, len(UMS), n)]
+    # Precio por unidad de compra (kg / lt / un)
+    precio = np.round(rng.lognormal(np.log(4000), 0.8, n), 0)
+    return pd.DataFrame({
+        'sku': sku,
+        'nombre': [f"Insumo {i:04d}" for i in range(n)],
+        'um': um,
+        'categoria': CATEGORIAS_INSUMO[rng.integers(0, len(CATEGORIAS_INSUMO), n)],
+        'subcat': np.where(rng.random(n) < 0.85, 'Directo', 'Indirecto'),
+        'precio': precio,
+        'conversion': np.where(rng.random(n) < 0.2, rng.choice([6, 12, 24], n), 1),
+        'formato': np.where(rng.random(n) < 0.1, rng.choice([0.5, 2, 5], n), 1),
+        'proveedor': rng.integers(0, len(PROVEEDORES), n),
+    })
+
+
+def _cantidad_receta(rng, um, n):
+    base = np.where(np.isin(um, ['G', 'CC', 'ML']), rng.uniform(5, 300, n), rng.uniform(0.05, 2, n))
+    return np.round(base, 2)
+
+
+def _procesados(rng, dim, ins):
+    filas = []
+    codigos = [f"PRO-{i:03d}" for i in range(dim.procesados)]
+    for k, cod in enumerate(codigos):
+        n_ing = int(rng.integers(3, 9))
+        idx = rng.choice(len(ins), n_ing, replace=False)
+        sel = ins.iloc[idx]
+        cant = _cantidad_receta(rng, sel['um'].to_numpy(), n_ing)
+        efic = np.round(cant * rng.uniform(1.0, 1.25, n_ing), 2)
+        porcion = int(rng.random() < 0.3)
+        rend = float(np.round(cant.sum() * rng.uniform(0.7, 1.0), 1)) if rng.random() < 0.6 else 1.0
+        for j in range(n_ing):
+            filas.append({
+                'Codigo Venta': cod, 'Ingrediente Proc': f"Preparación {k:03d}",
+                'SKU Ingrediente': sel['sku'].iat[j], 'Ingrediente': sel['nombre'].iat[j],
+                'CantReceta': cant[j], 'CantEfic': efic[j], 'UM Salida': sel['um'].iat[j],
+                'Porcion': porcion, 'Eficiencia': rend,
+            })
+        # PRO- anidado: una preparación usa otra ya definida como insumo
+        if k > 2 and rng.random() < 0.25:
+            sub = codigos[int(rng.integers(0, k))]
+            filas.append({
+                'Codigo Venta': cod, 'Ingrediente Proc': f"Preparación {k:03d}",
+                'SKU Ingrediente': sub, 'Ingrediente': f"Preparación {sub[4:]}",
+                'CantReceta': float(np.round(rng.uniform(20, 200), 2)), 'CantEfic': 0.0,
+                'UM Salida': 'G', 'Porcion': porcion, 'Eficiencia': rend,
+            })
+    return pd.DataFrame(filas)
+
+
+def _directos(rng, dim, ins, procesados):
+    pro_cod = procesados['Codigo Venta'].unique()
+    filas = []
+    for p in range(dim.platos):
+        cod = f"PL-{p:04d}"
+        n_ing = int(rng.integers(3, 11))
+        idx = rng.choice(len(ins), n_ing, replace=False)
+        sel = ins.iloc[idx]
+        cant = _cantidad_receta(rng, sel['um'].to_numpy(), n_ing)
+        opcion = np.where(rng.random(n_ing) < 0.1, rng.choice([1, 2, 3], n_ing), 0)
+        for j in range(n_ing):
+            filas.append({
+                'CODIGO VENTA': cod, 'Plato': f"Plato {p:04d}",
+                'SKU': sel['sku'].iat[j], 'Ingrediente': sel['nombre'].iat[j],
+                'CantReal': cant[j], 'UM': sel['um'].iat[j], 'EsOpcion': int(opcion[j]),
+                'Eficiencia': 1,
+            })
+        for _ in range(int(rng.integers(0, 3)) if rng.random() < 0.35 else 0):
+            pro = pro_cod[int(rng.integers(0, len(pro_cod)))]
+            filas.append({
+                'CODIGO VENTA': cod, 'Plato': f"Plato {p:04d}",
+                'SKU': pro, 'Ingrediente': f"Preparación {pro[4:]}",
+                'CantReal': float(np.round(rng.uniform(30, 250), 2)), 'UM': 'G', 'EsOpcion': 0,
+                'Eficiencia': 1,
+            })
+    df = pd.DataFrame(filas)
+    return df.drop_duplicates(subset=['CODIGO VENTA', 'SKU'], ignore_index=True)
+
+
+def _ventas(rng, dim):
+    n = dim.escala
+    plato = rng.zipf(1.3, n) % dim.platos  # pocos platos concentran la venta
+    precio_plato = np.round(rng.uniform(3000, 18000, dim.platos), -1)
+    cant = rng.integers(1, 25, n).astype(float)
+    dia = rng.integers(0, dim.dias, n)
+    fecha = pd.to_datetime(FECHA_BASE) + pd.to_timedelta(dia, unit='D')
+    return pd.DataFrame({
+        'local': np.array(LOCALES)[rng.integers(0, len(LOCALES), n)],
+        # El POS exporta dd/mm/aaaa (save_ventas parsea con dayfirst=True)
+        'fecha_pura': fecha.strftime('%d/%m/%Y'),
+        'cat_menu': CATEGORIAS_MENU[plato % len(CATEGORIAS_MENU)],
+        'nombre': np.char.add('Plato ', np.char.zfill(plato.astype(str), 4)),
+        'id_producto': np.char.add('PL-', np.char.zfill(plato.astype(str), 4)),
+        'cantidad': cant,
+        'venta_real': cant * precio_plato[plato],
+    })
+
+
+def _compras(rng, dim, ins):
+    n = dim.lineas_compras
+    lineas_folio = rng.integers(1, 15, n // 4 + 1)
+    folio_de_linea = np.repeat(np.arange(len(lineas_folio)), lineas_folio)[:n]
+    n_folios = int(folio_de_linea.max()) + 1
+
+    prov_folio = rng.integers(0, len(PROVEEDORES), n_folios)
+    local_folio = np.array(LOCALES)[rng.integers(0, len(LOCALES), n_folios)]
+    dia_folio = rng.integers(0, dim.dias, n_folios)
+    dte_folio = np.where(rng.random(n_folios) < 0.03, 61, 33)
+    con_iva = rng.random(n_folios) < 0.95
+
+    idx = rng.integers(0, len(ins), n)
+    sel = ins.iloc[idx].reset_index(drop=True)
+    cantidad = rng.integers(1, 40, n).astype(float)
+    # Variación de precio por línea (±15%) sobre el precio base del insumo
+    unit = sel['precio'].to_numpy() * sel['conversion'].to_numpy() * sel['formato'].to_numpy()
+    total_item = np.round(cantidad * unit * rng.uniform(0.85, 1.15, n), 0)
+
+    df = pd.DataFrame({
+        'local': local_folio[folio_de_linea],
+        'fecha_dte': pd.to_datetime(FECHA_BASE) + pd.to_timedelta(dia_folio[folio_de_linea], unit='D'),
+        'rut_proveedor': np.array([p[0] for p in PROVEEDORES])[prov_folio[folio_de_linea]],
+        'nombre_proveedor': np.array([p[1] for p in PROVEEDORES])[prov_folio[folio_de_linea]],
+        'tipo_dte': dte_folio[folio_de_linea],
+        'folio': 100000 + folio_de_linea,
+        'nombre_producto': sel['nombre'],
+        'cantidad': cantidad,
+        'total_item': total_item,
+        'codigo_impuesto': COD_IMPUESTO[rng.integers(0, len(COD_IMPUESTO), n)],
+        'sku': sel['sku'],
+        'subcat': sel['subcat'],
+        'conversion': sel['conversion'],
+        'formato': sel['formato'],
+        'categoria_producto': sel['categoria'],
+    })
+
+    # Línea de despacho en ~15% de los folios (reemplaza la última línea del folio)
+    ultima = np.r_[folio_de_linea[1:] != folio_de_linea[:-1], True]
+    despacho = ultima & (rng.random(n) < 0.15) & (lineas_folio[folio_de_linea] > 1)
+    df.loc[despacho, 'nombre_producto'] = 'Despacho'
+    df.loc[despacho, 'sku'] = None
+    df.loc[despacho, 'total_item'] = np.round(rng.uniform(2000, 8000, int(despacho.sum())), 0)
+    df.loc[despacho, ['conversion', 'formato']] = 1
+
+    neto_folio = df.groupby('folio')['total_item'].transform('sum')
+    con_iva_linea = con_iva[folio_de_linea]
+    df['iva'] = np.where(con_iva_linea, np.round(neto_folio * 0.19, 0), 0)
+    df['descuento_global'] = np.where(rng.random(n_folios) < 0.1, 500, 0)[folio_de_linea]
+    df['recargo_global'] = 0
+    # Total declarado con pequeño descuadre de redondeo
+    df['total'] = np.round(neto_folio * np.where(con_iva_linea, 1.19, 1.0)
+                           + rng.integers(-2, 3, n_folios)[folio_de_linea], 0)
+    return df
+
+
+def generar(escala=10_000, semilla=42, lineas_compras=None):
+    dim = Dimensiones.para(escala, lineas_compras)
+    rng = np.random.default_rng(semilla)
+    ins = _insumos(rng, dim)
+    procesados = _procesados(rng, dim, ins)
+    directos = _directos(rng, dim, ins, procesados)
+    return DatosSinteticos(
+        dim=dim, insumos=ins, directos=directos, procesados=procesados,
+        ventas=_ventas(rng, dim), compras_raw=_compras(rng, dim, ins),
+    )
@@ -0,0 +1,55 @@
+"""
+Pruebas puntuales del núcleo (paquete costeo) con DataFrames armados a mano
+sobre un DuckDB temporal por prueba.
+
+    python -m pytest benchmarks/tests
+"""
+import pandas as pd
+import pytest
+
+from costeo import config, db
+
+
+COLS_RECETA = ['codigo_venta', 'nombre_plato', 'sku_ingrediente', 'nombre_ingrediente', 'cant_real',
+               'cant_efic', 'rendimiento', 'um_salida', 'es_procesado', 'es_opcion', 'porcion']
+
+
+def receta(codigo, ingrediente, cant, um='KG', procesado=False, rendimiento=None, porcion=0, opcion=0):
+    """Una fila de la tabla recetas con valores por defecto razonables."""
+    return {'codigo_venta': codigo, 'nombre_plato': f"Plato {codigo}", 'sku_ingrediente': ingrediente,
+            'nombre_ingrediente': f"Ingrediente {ingrediente}", 'cant_real': cant, 'cant_efic': cant,
+            'rendimiento': rendimiento, 'um_salida': um, 'es_procesado': procesado,
+            'es_opcion': opcion, 'porcion': porcion}
+
+
+def compra(sku, fecha, monto, cant=1.0, local='L1'):
+    """Una línea de compras: `monto` total por `cant` unidades convertidas."""
+    return {'local': local, 'fecha_dte': fecha, 'sku': sku, 'subcat': 'Directo', 'nombre_producto': sku,
+            'cant_conv': cant, 'monto_real': monto, 'muc': monto / cant if cant else None}
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    """Engine sobre un DuckDB vacío (esquema local) en tmp_path; sin secretos, espejo ni caché compartida."""
+    monkeypatch.setattr(config, "_secretos", {})
+    monkeypatch.setenv("MRP_BACKEND", "duckdb")
+    monkeypatch.setenv("MRP_DUCKDB_PATH", str(tmp_path / "prueba.duckdb"))
+    monkeypatch.setenv("MRP_ARCHIVO_DIR", str(tmp_path / "archivo"))
+    for var in ("MRP_PARQUET_DIR", "MRP_CACHE_DIR", "MRP_CONSUMO_EN_BASE"):
+        monkeypatch.delenv(var, raising=False)
+    db.get_engine.cache_clear()
+    engine = db.get_engine()
+    yield engine
+    engine.dispose()
+    db.get_engine.cache_clear()
+
+
+@pytest.fixture
+def cargar(base):
+    """cargar(tabla, filas): agrega filas (lista de dicts o DataFrame) a `tabla`."""
+    def _cargar(tabla, filas):
+        df = filas if isinstance(filas, pd.DataFrame) else pd.DataFrame(filas)
+        if tabla == 'recetas':
+            df = df.reindex(columns=COLS_RECETA)
+        df.to_sql(tabla, base, if_exists='append', index=False)
+    return _cargar
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from costeo import anomalias
+from costeo.db import run_query
+
+from .conftest import compra
+
+
+def _lineas(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({'sku': rng.choice(['X', 'Y', 'Z'], n), 'muc': np.exp(rng.normal(3, 0.2, n))})
+
+
+def _ordenar(est):
+    return est.sort_values('sku', ignore_index=True).astype({'n': 'int64', 'media': float, 'm2': float})
+
+
+@pytest.mark.parametrize("corte", [1, 17, 39])
+def test_chan_igual_a_una_sola_muestra(corte):
+    df = _lineas(40)
+    df.loc[:5, 'sku'] = 'SOLO-A'            # SKU presente sólo en una de las dos partes
+    df.loc[2, 'muc'] = 0                    # muc ≤ 0 no entra
+    unidas = anomalias.combinar(anomalias.estadisticas_lote(df.iloc[:corte]),
+                                anomalias.estadisticas_lote(df.iloc[corte:]))
+    pd.testing.assert_frame_equal(_ordenar(unidas), _ordenar(anomalias.estadisticas_lote(df)))
+
+
+def test_combinar_con_vacio():
+    lote = anomalias.estadisticas_lote(_lineas(10))
+    vacio = pd.DataFrame(columns=anomalias.COLS_ESTADISTICAS)
+    pd.testing.assert_frame_equal(_ordenar(anomalias.combinar(vacio, lote)), _ordenar(lote))
+
+
+def test_carga_incremental_igual_a_reconstruir(base, cargar):
+    historial = [compra(s, '2024-01-01', m) for s, m in zip(_lineas(30)['sku'], _lineas(30)['muc'])]
+    cargar('compras', historial)
+    assert anomalias.reconstruir_estadisticas() == 3
+    carga = pd.DataFrame([compra('X', '2024-02-01', 25.0), compra('W', '2024-02-01', 3.0)])
+    cargar('compras', carga)
+    anomalias.actualizar_estadisticas(carga)
+    incremental = _ordenar(run_query("SELECT sku, n, media, m2 FROM precio_estadisticas"))
+    anomalias.reconstruir_estadisticas()
+    pd.testing.assert_frame_equal(incremental, _ordenar(run_query("SELECT sku, n, media, m2 FROM precio_estadisticas")))
+
+
+def test_actualizar_deja_afuera_las_anomalas(base, cargar):
+    cargar('compras', [compra('X', '2024-01-01', m) for m in (20, 21, 19, 20.5, 19.5, 20)])
+    anomalias.reconstruir_estadisticas()
+    antes = run_query("SELECT n, media, m2 FROM precio_estadisticas WHERE sku = 'X'")
+    carga = pd.DataFrame({'sku': ['X', 'X'], 'muc': [20_000, 20.0]})     # ×1000 mal tipeado + una normal
+    anomalias.actualizar_estadisticas(carga)
+    despues = run_query("SELECT n, media, m2 FROM precio_estadisticas WHERE sku = 'X'")
+    assert despues.loc[0, 'n'] == antes.loc[0, 'n'] + 1
+    assert anomalias.puntuar_compras(pd.DataFrame({'sku': ['X'], 'muc': [20_000]}))['anomalia'].all()
+
+
+def test_puntuar_marca_errores_de_conversion(base, cargar):
+    cargar('compras', [compra('X', '2024-01-01', m) for m in (20, 21, 19, 20.5, 19.5, 20)]
+                      + [compra('Y', '2024-01-01', m) for m in (5, 5.5, 4.5)])
+    nuevas = pd.DataFrame({'sku': ['X', 'X', 'X', 'Y', None], 'muc': [20.2, 20_000, 0.02, 5000, 1]})
+    out = anomalias.puntuar_compras(nuevas)
+    assert out['anomalia'].tolist() == [False, True, True, False, False]     # Y: menos de MIN_OBS compras
+    assert out.loc[0, 'muc_referencia'] == pytest.approx(np.exp(np.log([20, 21, 19, 20.5, 19.5, 20]).mean()))
+    assert np.isnan(out.loc[3, 'z_precio'])
@@ -0,0 +1,47 @@
+import pandas as pd
+import pytest
+
+from costeo import compartido
+from costeo.persistencia import save_recetario
+
+from .conftest import receta
+
+
+@pytest.fixture
+def cache(base, cargar, tmp_path, monkeypatch):
+    monkeypatch.setenv("MRP_CACHE_DIR", str(tmp_path / "compartido"))
+    cargar('recetas', [receta('A', 'X', 1.0), receta('A', 'Y', 2.0)])
+    return tmp_path / "compartido"
+
+
+def test_recetas_se_publican_y_no_se_copian_en_cada_lectura(cache):
+    a = compartido.recetas()
+    assert len(a) == 2
+    assert compartido.estado_compartidas()[0]['version'] == 1
+    a['cant_real'] = a['cant_real'] * 10      # reemplazar columnas no toca el frame del proceso
+    a['extra'] = 1
+    b = compartido.recetas()
+    assert b['cant_real'].tolist() == [1.0, 2.0] and 'extra' not in b.columns
+    # Columnas numéricas sobre el mapa: mismo buffer en cada lectura
+    assert b['cant_real'].to_numpy().ctypes.data == compartido.recetas()['cant_real'].to_numpy().ctypes.data
+    with pytest.raises(ValueError):
+        b.loc[0, 'cant_real'] = 5.0
+
+
+def test_alta_publica_version_nueva(cache):
+    antes = compartido.recetas().attrs['version']
+    directos = {'CODIGO VENTA': ['A', 'B'], 'Plato': ['a', 'b'], 'SKU': ['X', 'Z'], 'Ingrediente': ['x', 'z'],
+                'CantReal': [1.0, 3.0], 'Eficiencia': [1, 1], 'UM': ['KG', 'KG'], 'EsOpcion': [0, 0]}
+    assert save_recetario(pd.DataFrame(directos), pd.DataFrame(columns=['Codigo Venta']))
+    estado = {e['tabla']: e for e in compartido.estado_compartidas()}
+    assert estado['recetas']['version'] == 2 and estado['recetas']['filas'] == 2
+    assert sorted(compartido.recetas()['sku_ingrediente']) == ['X', 'Z']
+    assert compartido.recetas().attrs['version'] != antes
+
+
+def test_puntero_de_otro_formato_se_ignora(cache, monkeypatch):
+    compartido.recetas()
+    monkeypatch.setattr(compartido, 'FORMATO', compartido.FORMATO + 1)
+    assert compartido.estado_compartidas()[0]['version'] is None
+    assert len(compartido.recetas()) == 2      # se vuelve a publicar con el formato vigente
+    assert compartido.estado_compartidas()[0]['version'] == 1
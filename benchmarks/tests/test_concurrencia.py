@@ -0,0 +1,85 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from costeo import concurrencia
+
+
+class Informe:
+    """calcular bloquea hasta `soltar`; cuenta llamadas y el máximo de cálculos simultáneos."""
+
+    def __init__(self):
+        self.llamadas, self.activos, self.maximo = [], 0, 0
+        self.empezo, self.soltar = threading.Event(), threading.Event()
+        self._lock = threading.Lock()
+
+    def calcular(self, clave):
+        with self._lock:
+            self.llamadas.append(clave)
+            self.activos += 1
+            self.maximo = max(self.maximo, self.activos)
+        self.empezo.set()
+        assert self.soltar.wait(5)
+        with self._lock:
+            self.activos -= 1
+        if clave == 'falla':
+            raise ValueError("sin datos")
+        return pd.DataFrame({'clave': [clave]})
+
+
+def _en_hilos(fn, claves):
+    resultados = [None] * len(claves)
+
+    def correr(i, clave):
+        try:
+            resultados[i] = concurrencia.ejecutar_unico(fn.calcular, clave)
+        except Exception as e:
+            resultados[i] = e
+    hilos = [threading.Thread(target=correr, args=(i, c)) for i, c in enumerate(claves)]
+    hilos[0].start()
+    assert fn.empezo.wait(5)
+    for h in hilos[1:]:
+        h.start()
+    time.sleep(0.2)                      # los demás ya esperan (vuelo o cupo)
+    fn.soltar.set()
+    for h in hilos:
+        h.join(5)
+    return resultados
+
+
+def test_pedidos_identicos_calculan_una_vez(monkeypatch):
+    monkeypatch.setenv("MRP_MAX_INFORMES", "4")
+    fn = Informe()
+    resultados = _en_hilos(fn, ['enero'] * 4)
+    assert fn.llamadas == ['enero']
+    assert all(r['clave'].tolist() == ['enero'] for r in resultados)
+    assert len({id(r) for r in resultados}) == 4          # cada uno recibe su copia
+
+
+def test_error_llega_a_todos_y_no_queda_en_curso(monkeypatch):
+    monkeypatch.setenv("MRP_MAX_INFORMES", "4")
+    fn = Informe()
+    resultados = _en_hilos(fn, ['falla'] * 3)
+    assert fn.llamadas == ['falla'] and all(isinstance(r, ValueError) for r in resultados)
+    assert not concurrencia._en_curso
+
+
+def test_cupo_limita_calculos_distintos(monkeypatch):
+    monkeypatch.setenv("MRP_MAX_INFORMES", "1")
+    fn = Informe()
+    _en_hilos(fn, ['enero', 'febrero', 'marzo'])
+    assert sorted(fn.llamadas) == ['enero', 'febrero', 'marzo'] and fn.maximo == 1
+
+
+def test_version_de_datos_separa_pedidos():
+    clave = concurrencia.clave_pedido(Informe.calcular, ('enero',))
+    concurrencia.datos_cambiaron()
+    assert concurrencia.clave_pedido(Informe.calcular, ('enero',)) != clave
+
+
+@pytest.mark.parametrize("valor,esperado", [("3", 3), ("0", 1), ("x", concurrencia.MAX_INFORMES_DEFECTO)])
+def test_limite_informes(monkeypatch, valor, esperado):
+    monkeypatch.setenv("MRP_MAX_INFORMES", valor)
+    assert concurrencia.limite_informes() == esperado
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from costeo.informes import consumo_diario, consumo_teorico
+
+from .conftest import receta
+
+
+def test_venta_sin_sku_producto_no_suma_consumo(base, cargar):
+    cargar('recetas', [receta('A', 'X', 1.0), receta('B', 'Y', 1.0)])
+    cargar('ventas', [
+        {'local': 'L1', 'fecha_venta': '2024-01-01', 'sku_producto': 'A', 'cantidad_vendida': 1},
+        {'local': 'L1', 'fecha_venta': '2024-01-01', 'sku_producto': None, 'cantidad_vendida': 100},
+        {'local': 'L1', 'fecha_venta': '2024-01-02', 'sku_producto': 'B', 'cantidad_vendida': 2},
+    ])
+    matriz, _ = consumo_diario('2024-01-01', '2024-01-02', "Todos")
+    assert matriz.sum().to_dict() == {'X': 1.0, 'Y': 2.0}
+
+
+def test_filas_suman_consumo_teorico(base, cargar):
+    # Plato directo + plato con un procesado (rendimiento 4) en gramos
+    filas = [receta('A', 'X', 0.5), receta('B', 'PRO-1', 1.0), receta('B', 'X', 200, um='G'),
+             receta('PRO-1', 'Y', 2.0, procesado=True, rendimiento=4), receta('PRO-1', 'Z', 1.0, procesado=True)]
+    cargar('recetas', filas)
+    cargar('ventas', [
+        {'local': 'L1', 'fecha_venta': '2024-01-01', 'sku_producto': 'A', 'cantidad_vendida': 3},
+        {'local': 'L2', 'fecha_venta': '2024-01-03', 'sku_producto': 'B', 'cantidad_vendida': 2},
+        {'local': 'L1', 'fecha_venta': '2024-01-03', 'sku_producto': 'A', 'cantidad_vendida': 1},
+    ])
+    matriz, nombres = consumo_diario('2024-01-01', '2024-01-03', "Todos")
+    assert list(matriz.index.astype(str)) == ['2024-01-01', '2024-01-02', '2024-01-03']
+    assert matriz.loc[pd.Timestamp('2024-01-02').date()].eq(0).all()
+
+    df_v = pd.DataFrame({'sku_producto': ['A', 'B'], 'cant_vendida': [4.0, 2.0]})
+    teorico = consumo_teorico(df_v, pd.DataFrame(filas)).set_index('sku_ingrediente')['consumo_teorico']
+    pd.testing.assert_series_equal(matriz.sum().sort_index(), teorico.sort_index(), check_names=False)
+    assert nombres['X'] == 'Ingrediente X'
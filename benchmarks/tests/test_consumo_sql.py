@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from costeo.consumo_sql import consumo_teorico_sql
+from costeo.informes import consumo_teorico
+
+from .conftest import receta
+
+RECETAS = [
+    receta('A', 'X', 0.2), receta('A', 'Y', 150, um='g'), receta('A', 'Q', 1.0, opcion=1),     # opcional: fuera
+    {**receta('A', 'W', 0.5), 'es_opcion': None},                                              # NULL cuenta como 0
+    receta('B', 'PRO-1', 2.0), receta('B', 'PRO-2', 300, um='cc'), receta('B', 'PRO-3', 1.0),
+    # Rendimiento explícito > 1
+    receta('PRO-1', 'X', 1.0, procesado=True, rendimiento=5), receta('PRO-1', 'Z', 500, um='G', procesado=True),
+    # Sin rendimiento: divide por Σ cant_real; anida un PRO- (cuenta como ingrediente)
+    receta('PRO-2', 'Y', 0.75, procesado=True), receta('PRO-2', 'PRO-1', 0.25, procesado=True),
+    # Porción: sin dividir por el rendimiento
+    receta('PRO-3', 'Z', 0.1, procesado=True, rendimiento=10, porcion=1),
+]
+
+
+@pytest.fixture
+def datos(base, cargar):
+    cargar('recetas', RECETAS)
+    cargar('ventas', [
+        {'local': 'L1', 'fecha_venta': '2024-01-01', 'sku_producto': 'A', 'cantidad_vendida': 3},
+        {'local': 'l2', 'fecha_venta': '2024-01-02', 'sku_producto': 'B', 'cantidad_vendida': 2},
+        {'local': 'L1', 'fecha_venta': '2024-01-05', 'sku_producto': 'B', 'cantidad_vendida': 1},
+        {'local': 'L1', 'fecha_venta': '2024-02-01', 'sku_producto': 'A', 'cantidad_vendida': 50},   # fuera
+        {'local': 'L1', 'fecha_venta': '2024-01-03', 'sku_producto': 'SIN-RECETA', 'cantidad_vendida': 9},
+    ])
+
+
+@pytest.mark.parametrize("local", ['Todos', 'L1', 'L2'])
+def test_cte_recursivo_igual_a_python(datos, local):
+    ventas = pd.DataFrame({'local': ['L1', 'L2', 'L1'], 'sku_producto': ['A', 'B', 'B'], 'cant_vendida': [3, 2, 1]})
+    if local != 'Todos':
+        ventas = ventas[ventas['local'] == local]
+    python = consumo_teorico(ventas.groupby('sku_producto', as_index=False)['cant_vendida'].sum(),
+                             pd.DataFrame(RECETAS)).set_index('sku_ingrediente')['consumo_teorico']
+    sql = consumo_teorico_sql('2024-01-01', '2024-01-31', local).set_index('sku_ingrediente')['consumo_teorico']
+    pd.testing.assert_series_equal(sql.sort_index(), python.sort_index(), check_names=False,
+                                   check_index_type=False)
+    assert 'Q' not in sql.index
+
+
+def test_periodo_sin_ventas(datos):
+    df = consumo_teorico_sql('2023-01-01', '2023-12-31', 'Todos')
+    assert df.empty and list(df.columns) == ['sku_ingrediente', 'consumo_teorico', 'nombre_ingrediente']
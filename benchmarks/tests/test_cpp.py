@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from costeo import cpp
+from costeo.db import run_query
+
+from .conftest import compra
+
+
+def _historial():
+    h = run_query("SELECT fecha, local, sku, cant, monto, cant_acum, monto_acum, cpp FROM cpp_historial")
+    return h.assign(fecha=pd.to_datetime(h['fecha'])).sort_values(['local', 'sku', 'fecha'], ignore_index=True)
+
+
+@pytest.fixture
+def compras(base, cargar):
+    cargar('compras', [compra('X', '2024-01-01 09:00', 100, cant=10), compra('X', '2024-01-01 17:00', 60, cant=2),
+                       compra('X', '2024-01-05 10:00', 80, cant=4, local='l2'), compra('X', '2024-01-09', 30, cant=1),
+                       compra('Y', '2024-01-02', 50, cant=0)])     # cant 0: no entra al promedio
+    assert cpp.reconstruir_cpp() == 3
+
+
+def test_reconstruir_acumula_por_local_y_sku(compras):
+    h = _historial()
+    assert h[['local', 'sku']].drop_duplicates().values.tolist() == [['L1', 'X'], ['L2', 'X']]
+    l1 = h[h['local'] == 'L1']
+    assert l1['cant_acum'].tolist() == [12.0, 13.0] and l1['cpp'].tolist() == [160 / 12, 190 / 13]
+
+
+def test_costo_promedio_por_fecha_y_local(compras):
+    vigente = cpp.costo_promedio().set_index('sku')['cpp']
+    assert vigente.to_dict() == {'X': pytest.approx(270 / 17)}
+    assert cpp.costo_promedio('2024-01-04').set_index('sku')['cpp']['X'] == pytest.approx(160 / 12)
+    assert cpp.costo_promedio(local='l2').set_index('sku')['cpp']['X'] == pytest.approx(20.0)
+    assert cpp.costo_promedio('2023-12-31').empty
+
+
+def test_factura_atrasada_igual_a_reconstruir(compras, cargar):
+    atrasada = pd.DataFrame([compra('X', '2024-01-03', 90, cant=3), compra('Z', '2024-01-03', 10, cant=5)])
+    cargar('compras', atrasada)
+    cpp.actualizar_cpp(atrasada)
+    incremental = _historial()
+    estado = run_query("SELECT local, sku, cpp FROM cpp_sku ORDER BY local, sku")
+    cpp.reconstruir_cpp()
+    pd.testing.assert_frame_equal(incremental, _historial(), check_dtype=False)
+    pd.testing.assert_frame_equal(estado, run_query("SELECT local, sku, cpp FROM cpp_sku ORDER BY local, sku"))
+    assert estado['cpp'].tolist() == pytest.approx([(190 + 90) / 16, 2.0, 20.0])     # L1 X, L1 Z, L2 X
+
+
+def test_nota_de_credito_descuenta_cantidad_y_monto(base, cargar):
+    # Compra 10 a 10 c/u; se devuelven 4 (tipo 61: monto negativo, cant_conv positiva)
+    cargar('compras', [{**compra('X', '2024-01-01', 100, cant=10), 'tipo_dte': 33},
+                       {**compra('X', '2024-01-02', -40, cant=4), 'tipo_dte': 61}])
+    cpp.reconstruir_cpp()
+    h = _historial()
+    assert h['cant_acum'].tolist() == [10.0, 6.0] and h['cpp'].tolist() == [10.0, 10.0]
+
+    nota = pd.DataFrame([{**compra('X', '2024-01-03', -60, cant=6), 'tipo_dte': 61}])
+    cargar('compras', nota)
+    cpp.actualizar_cpp(nota)
+    incremental = _historial()
+    assert incremental['cant_acum'].iat[-1] == 0 and pd.isna(incremental['cpp'].iat[-1])
+    cpp.reconstruir_cpp()
+    pd.testing.assert_frame_equal(incremental, _historial(), check_dtype=False)
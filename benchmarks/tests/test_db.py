@@ -0,0 +1,23 @@
+from sqlalchemy import text
+
+from costeo import avisos, db
+
+
+def test_asegurar_tabla_reintenta_tras_un_fallo(base, monkeypatch):
+    avisados = []
+    monkeypatch.setattr(avisos, 'advertencia', avisados.append)
+    ddl = "CREATE TABLE IF NOT EXISTS prueba_aux (x INTEGER)"
+    roto = "CREATE TABLE IF NOT EXISTS prueba_aux (x TIPO_INEXISTENTE)"
+    assert not db.asegurar_tabla(base, roto)
+    assert not db.asegurar_tabla(base, roto)
+    assert len(avisados) == 1                        # se avisa una vez, se reintenta siempre
+    assert db.asegurar_tabla(base, ddl)
+    with base.begin() as conn:
+        conn.execute(text("DROP TABLE prueba_aux"))
+    assert db.asegurar_tabla(base, ddl)              # éxito recordado: no vuelve a correr el DDL
+    assert db.run_query("SELECT COUNT(*) AS n FROM information_schema.tables "
+                        "WHERE table_name = 'prueba_aux'")['n'].iat[0] == 0
+
+
+def test_lista_in():
+    assert db.lista_in(['a', 'b'], 'm') == (":m0, :m1", {'m0': 'a', 'm1': 'b'})
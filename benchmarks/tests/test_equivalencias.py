@@ -0,0 +1,50 @@
+import pandas as pd
+from sqlalchemy import text
+
+from costeo import avisos, equivalencias
+from costeo.equivalencias import (aplicar_equivalencias, cierre, guardar_equivalencia, mapa_equivalencias,
+                                  validar_equivalencias)
+
+
+def _equiv(pares):
+    return pd.DataFrame(pares, columns=['sku_compra', 'sku_receta'])
+
+
+def test_cierre_resuelve_cadenas():
+    df, ciclos = cierre(_equiv([('A', 'B'), ('B', 'C'), ('D', 'C')]))
+    assert dict(zip(df['sku_compra'], df['sku_receta'])) == {'A': 'C', 'B': 'C', 'D': 'C'}
+    assert dict(zip(df['sku_compra'], df['saltos'])) == {'A': 2, 'B': 1, 'D': 1}
+    assert ciclos == []
+
+
+def test_cierre_con_ciclo_conserva_salto_directo():
+    df, ciclos = cierre(_equiv([('A', 'B'), ('B', 'A'), ('C', 'A')]))
+    assert dict(zip(df['sku_compra'], df['sku_receta'])) == {'A': 'B', 'B': 'A', 'C': 'A'}
+    assert len(ciclos) == 1 and set(ciclos[0]) == {'A', 'B'}
+
+
+def test_validar_rechaza_ciclos_y_repetidos(base, cargar):
+    cargar('sku_equivalencias', [{'sku_compra': 'A', 'sku_receta': 'B', 'descripcion': ''},
+                                 {'sku_compra': 'G', 'sku_receta': 'H', 'descripcion': ''}])
+    ok, problemas = validar_equivalencias(pd.DataFrame({
+        'SKU Compra': ['B', 'C', 'D', 'D', 'E', 'G'],
+        'sku_receta': ['A', 'C', 'X', 'Y', 'F', 'I'],
+    }))
+    motivos = dict(zip(problemas['sku_compra'], problemas['motivo']))
+    assert motivos['B'].startswith('ciclo') and motivos['C'] == 'origen = destino'
+    assert motivos['D'] == 'origen repetido con destinos distintos'
+    assert dict(zip(ok['sku_compra'], ok['accion'])) == {'E': 'nueva', 'G': 'reemplaza'}
+
+
+def test_mapa_se_renueva_si_otro_proceso_cambia_el_cierre(base, monkeypatch):
+    with avisos.capturar():
+        guardar_equivalencia('A', 'B')
+    assert aplicar_equivalencias(['A', 'Z']).tolist() == ['B', 'Z']
+
+    # Otro worker reconstruye el cierre: cambia las filas y la marca, no la versión de este proceso
+    with base.begin() as conn:
+        conn.execute(text("UPDATE sku_equiv_cierre SET sku_receta = 'C'"))
+        conn.execute(text("UPDATE sku_equiv_marca SET marca = 'otro-proceso'"))
+    assert mapa_equivalencias() == {'A': 'B'}          # dentro de REVALIDAR_SEG
+    monkeypatch.setattr(equivalencias, 'REVALIDAR_SEG', 0)
+    assert mapa_equivalencias() == {'A': 'C'}
@@ -0,0 +1,34 @@
+import pytest
+
+from costeo import espejo
+from costeo.informes import _ventas_diarias
+
+
+@pytest.fixture
+def ventas(base, cargar):
+    cargar('ventas', [
+        {'local': 'Centro', 'fecha_venta': '2024-03-01', 'sku_producto': 'A', 'cantidad_vendida': 1.0},
+        {'local': ' Centro ', 'fecha_venta': '2024-03-01', 'sku_producto': 'A', 'cantidad_vendida': 10.0},
+        {'local': 'CENTRO', 'fecha_venta': '2024-03-02', 'sku_producto': 'A', 'cantidad_vendida': 100.0},
+    ])
+
+
+def _por_local(local):
+    df = _ventas_diarias('2024-03-01', '2024-03-31', local)
+    return sorted(df['cant_vendida'].tolist())
+
+
+@pytest.mark.parametrize("local", ["Centro", " Centro ", "Todos"])
+def test_espejo_filtra_el_local_igual_que_la_base(ventas, tmp_path, monkeypatch, local):
+    en_base = _por_local(local)
+    monkeypatch.setenv("MRP_PARQUET_DIR", str(tmp_path / "espejo"))
+    assert espejo.reconstruir_espejo('ventas') == 3
+    assert espejo.espejo_activo('ventas')
+    assert _por_local(local) == en_base
+
+
+def test_espejo_de_formato_anterior_no_se_usa(ventas, tmp_path, monkeypatch):
+    monkeypatch.setenv("MRP_PARQUET_DIR", str(tmp_path / "espejo"))
+    espejo.reconstruir_espejo('ventas')
+    monkeypatch.setattr(espejo, 'FORMATO_ESPEJO', espejo.FORMATO_ESPEJO + 1)
+    assert not espejo.espejo_activo('ventas')
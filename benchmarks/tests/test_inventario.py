@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from costeo import inventario
+from costeo.db import run_query
+
+from .conftest import compra, receta
+
+
+def _venta(sku, fecha, cant, local='L1'):
+    return {'local': local, 'fecha_venta': fecha, 'sku_producto': sku, 'cantidad_vendida': cant}
+
+
+def _tabla(nombre, orden):
+    df = run_query(f"SELECT * FROM {nombre} ORDER BY {orden}")
+    return df.assign(**{c: pd.to_datetime(df[c]) for c in ('fecha', 'mes') if c in df.columns})
+
+
+@pytest.fixture
+def libro(base, cargar):
+    cargar('recetas', [receta('A', 'X', 0.5)])
+    cargar('compras', [compra('X', '2024-01-03 10:00', 100, cant=10), compra('X', '2024-03-02', 50, cant=5),
+                       compra('X', '2024-01-04', 20, cant=2, local='L2')])
+    cargar('ventas', [_venta('A', '2024-01-10', 4), _venta('A', '2024-02-20', 6), _venta('A', '2024-03-05', 2)])
+    assert inventario.reconstruir_inventario() == 6
+
+
+def test_cierres_mensuales_sin_huecos(libro):
+    cierres = _tabla('stock_saldos', 'local, mes')
+    l1 = cierres[cierres['local'] == 'L1']
+    assert l1['mes'].dt.strftime('%Y-%m').tolist() == ['2024-01', '2024-02', '2024-03']
+    assert l1['saldo'].tolist() == [8.0, 5.0, 9.0]
+    # L2 sólo tiene movimientos en enero: su cierre se arrastra hasta el último mes
+    assert cierres.loc[cierres['local'] == 'L2', 'saldo'].tolist() == [2.0, 2.0, 2.0]
+
+
+@pytest.mark.parametrize("fecha", ['2023-12-31', '2024-01-09', '2024-01-31', '2024-02-20', '2024-03-04', '2024-06-30'])
+@pytest.mark.parametrize("local", ['Todos', 'l1'])
+def test_saldo_igual_a_sumar_movimientos(libro, fecha, local):
+    mov = _tabla('stock_movimientos', 'fecha')
+    mov = mov[mov['fecha'] <= pd.Timestamp(fecha)]
+    if local != 'Todos':
+        mov = mov[mov['local'] == local.upper()]
+    esperado = mov.groupby('sku')['cantidad'].sum()
+    obtenido = inventario.saldos(fecha, local).set_index('sku')['saldo']
+    pd.testing.assert_series_equal(obtenido.sort_index(), esperado.sort_index(), check_names=False, check_dtype=False,
+                                  check_index_type=False)
+
+
+def test_compra_atrasada_igual_a_reconstruir(libro, cargar):
+    atrasada = pd.DataFrame([compra('X', '2024-02-01', 30, cant=3)])
+    cargar('compras', atrasada)
+    inventario.registrar_compras(atrasada)
+    movimientos, cierres = _tabla('stock_movimientos', 'local, sku, fecha, tipo'), _tabla('stock_saldos', 'local, mes')
+    assert cierres.loc[cierres['local'] == 'L1', 'saldo'].tolist() == [8.0, 8.0, 12.0]
+    inventario.reconstruir_inventario()
+    pd.testing.assert_frame_equal(movimientos, _tabla('stock_movimientos', 'local, sku, fecha, tipo'))
+    pd.testing.assert_frame_equal(cierres, _tabla('stock_saldos', 'local, mes'))
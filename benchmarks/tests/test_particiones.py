@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from costeo.db import run_query
+from costeo.espejo import espejo_activo, leer_espejo, reconstruir_espejo
+from costeo.particiones import anios_archivados, archivar, restaurar
+
+from .conftest import compra, receta
+
+
+@pytest.fixture
+def datos(cargar, tmp_path, monkeypatch):
+    monkeypatch.setenv("MRP_PARQUET_DIR", str(tmp_path / "espejo"))
+    cargar('recetas', [receta('A', 'X', 1.0)])
+    cargar('compras', [compra('X', '2023-03-01 10:00', 100), compra('X', '2023-11-05 09:00', 120),
+                       compra('Y', '2023-06-10 12:00', 50), compra('X', '2024-02-01 08:00', 130)])
+    cargar('ventas', [{'local': 'L1', 'fecha_venta': '2023-05-02', 'sku_producto': 'A', 'cantidad_vendida': 3},
+                      {'local': 'L1', 'fecha_venta': '2024-01-15', 'sku_producto': 'A', 'cantidad_vendida': 2}])
+    for tabla in ('compras', 'ventas'):
+        reconstruir_espejo(tabla)
+
+
+def _filas(tabla, col, anio):
+    base = run_query(f"SELECT * FROM {tabla} WHERE {col} >= '{anio}-01-01' AND {col} < '{anio + 1}-01-01'")
+    espejo = leer_espejo(tabla, [col, 'local'], f"{anio}-01-01", f"{anio}-12-31")
+    return len(base), len(espejo)
+
+
+def test_archivar_conserva_ultima_compra_y_actualiza_espejo(base, datos):
+    hechos = archivar(2023, hoy=pd.Timestamp('2025-03-01').date())
+    assert hechos == {'compras': 3, 'ventas': 1}
+    assert set(anios_archivados('compras')) == {2023}
+    # Y no tiene compras posteriores: su última compra (2023) queda en la base
+    conservadas = run_query("SELECT sku FROM compras WHERE fecha_dte < '2024-01-01'")
+    assert conservadas['sku'].tolist() == ['Y']
+    assert espejo_activo('compras')
+    assert _filas('compras', 'fecha_dte', 2023) == (1, 1)
+    assert _filas('ventas', 'fecha_venta', 2023) == (0, 0)
+    assert _filas('compras', 'fecha_dte', 2024) == (1, 1)
+
+
+def test_restaurar_reemplaza_conservadas_y_rehace_espejo(base, datos):
+    archivar(2023, hoy=pd.Timestamp('2025-03-01').date())
+    hechos = restaurar(2023)
+    assert hechos == {'compras': 3, 'ventas': 1}
+    assert anios_archivados('compras') == {}
+    assert _filas('compras', 'fecha_dte', 2023) == (3, 3)
+    assert _filas('ventas', 'fecha_venta', 2023) == (1, 1)
+    assert len(run_query("SELECT * FROM compras")) == 4
@@ -0,0 +1,26 @@
+import pandas as pd
+
+from costeo import avisos, persistencia
+from costeo.concurrencia import version_datos
+from costeo.db import run_query
+
+
+def test_paso_de_mantenimiento_que_falla_no_corta_el_alta(base, monkeypatch):
+    def falla(*args):
+        raise RuntimeError("sin costo_platos")
+
+    hechos = []
+    monkeypatch.setattr(persistencia, 'recalcular_costos', falla)
+    monkeypatch.setattr(persistencia, 'actualizar_cpp', lambda df: hechos.append('cpp'))
+    monkeypatch.setattr(persistencia, 'actualizar_estadisticas', lambda df: hechos.append('estadisticas'))
+    antes = version_datos()
+    df = pd.DataFrame({'local': ['L1'], 'fecha_dte': [pd.Timestamp('2024-01-05')], 'sku': ['X'],
+                       'subcat': ['Directo'], 'cant_conv': [2.0], 'monto_real': [200.0], 'muc': [100.0]})
+    with avisos.capturar() as capturados:
+        assert persistencia.save_compras(df) is True
+
+    assert len(run_query("SELECT * FROM compras")) == 1
+    assert hechos == ['cpp', 'estadisticas']
+    assert version_datos() == antes + 1
+    advertencias = [m for tipo, m in capturados if tipo == 'advertencia']
+    assert any('recalcular costo_platos' in m and 'sin costo_platos' in m for m in advertencias)
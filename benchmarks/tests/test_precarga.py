@@ -0,0 +1,14 @@
+import pytest
+
+from costeo import perf, precarga
+
+
+def informe_que_falla(desde):
+    with perf.medir("informe que falla"):
+        raise ValueError(desde)
+
+
+def test_calcular_cierra_la_traza_aunque_falle():
+    with pytest.raises(ValueError):
+        precarga._calcular(informe_que_falla, ("2024-01-01",))
+    assert perf._traza_actual.get() is None
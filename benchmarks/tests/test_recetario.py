@@ -0,0 +1,41 @@
+import pytest
+
+from costeo.recetario import CLAVE, pagina_recetario
+
+from .conftest import receta
+
+
+@pytest.fixture
+def recetario(base, cargar):
+    filas = [receta('A', 'X', 1.0), receta('A', 'Y', 1.0), receta('B', 'X', 1.0),
+             receta('PRO-1', 'X', 1.0, procesado=True), receta('PRO-1', 'X', 2.0),      # misma clave salvo es_procesado
+             receta('C_1', 'Z', 1.0), receta('C%1', 'Z', 1.0)]
+    cargar('recetas', filas)
+    return sorted((f['codigo_venta'], f['sku_ingrediente'], f['es_procesado']) for f in filas)
+
+
+def _recorrer(filas, **busqueda):
+    vistas, cursor, paginas = [], None, 0
+    while True:
+        df, cursor = pagina_recetario(cursor, filas=filas, **busqueda)
+        paginas += 1
+        assert len(df) <= filas
+        vistas += [tuple(c) for c in df[CLAVE].itertuples(index=False)]
+        if cursor is None:
+            return vistas, paginas
+
+
+@pytest.mark.parametrize("filas,paginas", [(2, 4), (7, 1), (1, 7), (50, 1)])
+def test_paginas_recorren_todo_sin_repetir(recetario, filas, paginas):
+    vistas, n = _recorrer(filas)
+    assert [(c, s, bool(p)) for c, s, p in vistas] == recetario
+    assert n == paginas
+
+
+def test_busqueda_escapa_comodines(recetario):
+    vistas, _ = _recorrer(1, plato="c_1")
+    assert [v[0] for v in vistas] == ['C_1']
+    vistas, _ = _recorrer(2, plato="%")
+    assert [v[0] for v in vistas] == ['C%1']
+    vistas, _ = _recorrer(2, plato="pro", ingrediente="ingrediente x")
+    assert [bool(v[2]) for v in vistas] == [False, True]
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from costeo.costos import costo_recetas
+from costeo.simulador import matriz_recetas, multiplicadores, simular
+
+from .conftest import compra, receta
+
+RECETAS = [receta('A', 'X', 0.5), receta('A', 'X', 0.25), receta('A', 'Y', 300, um='g'),
+           receta('B', 'Y', 1.0), receta('B', 'PRO-1', 2.0),
+           receta('PRO-1', 'Z', 1.0, procesado=True), receta('PRO-1', 'X', 0.1, procesado=True)]
+
+
+def _precio(sku, precio, categoria, proveedor):
+    return {**compra(sku, '2024-01-02', precio), 'categoria_producto': categoria, 'nombre_proveedor': proveedor}
+
+
+def test_matriz_igual_a_costo_recetas():
+    df_rec = pd.DataFrame(RECETAS)
+    # cant_efic distinto de cant_real: los procesados deben usar cant_efic
+    df_rec.loc[df_rec['es_procesado'], 'cant_efic'] *= 2
+    df_rec.loc[len(df_rec)] = {**receta('B', 'W', 9.0), 'es_procesado': None}     # sin tipo: no entra
+    precios = pd.DataFrame({'sku': ['X', 'Y', 'Z', 'PRO-1', 'W'], 'precio_unitario': [10.0, 4.0, 7.0, 0.0, 1.0]})
+
+    codigos, skus, R = matriz_recetas(df_rec)
+    assert 'W' not in skus
+    p0 = precios.set_index('sku')['precio_unitario'].reindex(skus).to_numpy()
+    esperado = costo_recetas(df_rec, precios).set_index('sku_producto')['costo_unitario_teorico']
+    np.testing.assert_allclose(R @ p0, esperado.reindex(codigos).to_numpy())
+
+
+def test_multiplicadores_componen_por_alcance():
+    atributos = pd.DataFrame({'sku': ['X', 'Y', 'Z'], 'categoria_producto': ['Lácteos', 'Carnes', None],
+                              'subcat': ['Directo'] * 3, 'nombre_proveedor': ['P1', 'P2', 'P1']})
+    escenarios = pd.DataFrame([
+        {'escenario': 'Lácteos', 'alcance': 'categoria', 'valor': ' lácteos ', 'variacion_pct': 10},
+        {'escenario': 'Mix', 'alcance': 'Todos', 'valor': None, 'variacion_pct': 10},
+        {'escenario': 'Mix', 'alcance': 'proveedor', 'valor': 'p1', 'variacion_pct': -50},
+        {'escenario': 'Mix', 'alcance': 'sku', 'valor': 'Y', 'variacion_pct': 'x'},     # no numérico: 0
+        {'escenario': ' ', 'alcance': 'todos', 'valor': None, 'variacion_pct': 99},       # sin nombre: se ignora
+    ])
+    nombres, M = multiplicadores(escenarios, atributos)
+    assert list(nombres) == ['Lácteos', 'Mix']
+    np.testing.assert_allclose(M, [[1.1, 1.0, 1.0], [0.55, 1.1, 0.55]])
+
+    with pytest.raises(ValueError, match="local"):
+        multiplicadores(pd.DataFrame([{'escenario': 'E', 'alcance': 'local', 'valor': 'L1', 'variacion_pct': 5}]),
+                        atributos)
+
+
+def test_simular_resumen_y_detalle(base, cargar):
+    cargar('recetas', RECETAS)
+    cargar('compras', [_precio('X', 10, 'Lácteos', 'P1'), _precio('Y', 4, 'Carnes', 'P2'),
+                       _precio('Z', 7, 'Verduras', 'P1')])
+    cargar('ventas', [
+        {'local': 'L1', 'fecha_venta': '2024-02-01', 'sku_producto': 'A', 'nombre_producto': 'Plato A',
+         'categoria_menu': 'Fondos', 'cantidad_vendida': 2, 'monto_venta_real': 40},
+        {'local': 'L1', 'fecha_venta': '2024-02-01', 'sku_producto': 'B', 'nombre_producto': 'Plato B',
+         'categoria_menu': 'Fondos', 'cantidad_vendida': 1, 'monto_venta_real': 30},
+    ])
+    escenarios = pd.DataFrame([
+        {'escenario': 'Sin cambio', 'alcance': 'todos', 'valor': None, 'variacion_pct': 0},
+        {'escenario': 'Lácteos +20%', 'alcance': 'categoria', 'valor': 'Lácteos', 'variacion_pct': 20},
+    ])
+    resumen, detalle = simular(escenarios, '2024-02-01', '2024-02-28')
+
+    # A = 0.75·10 + 0.3·4 = 8.7 ; B = 4 + 2·(precio de PRO-1, sin compras) = 4, como
+    # calcular_costo_platos. PRO-1 es sub-receta: no aparece como plato
+    base_ = detalle[detalle['escenario'] == 'Sin cambio'].set_index('sku_producto')
+    assert base_['costo_base'].to_dict() == pytest.approx({'A': 8.7, 'B': 4.0})
+    assert base_.loc['A', 'margen_base_pct'] == pytest.approx((1 - 8.7 / 20) * 100)
+
+    r = resumen.set_index('escenario')
+    assert r.loc['Sin cambio', 'delta_costo'] == 0 and r.loc['Sin cambio', 'platos_afectados'] == 0
+    # X sube 2 → A +0.75·2 por plato, 2 vendidos
+    assert r.loc['Lácteos +20%', 'delta_costo'] == pytest.approx(2 * 1.5)
+    assert r.loc['Lácteos +20%', 'platos_afectados'] == 1
+    assert r.loc['Sin cambio', 'margen_pct'] == pytest.approx((70 - 2 * 8.7 - 4) / 70 * 100)
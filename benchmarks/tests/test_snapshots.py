@@ -0,0 +1,43 @@
+from datetime import date
+
+import pandas as pd
+
+from costeo import snapshots
+from costeo.compartido import recetas
+from costeo.persistencia import save_recetario
+from costeo.snapshots import generar_snapshots, plan_periodo, resumen_snapshots, version_recetas
+
+from .conftest import receta
+
+
+def test_genera_solo_meses_con_datos(base, cargar):
+    cargar('recetas', [receta('A', 'X', 1.0)])
+    cargar('ventas', [{'local': 'L1', 'fecha_venta': '2024-01-10', 'sku_producto': 'A', 'cantidad_vendida': 1},
+                      {'local': 'L1', 'fecha_venta': '2024-02-20', 'sku_producto': 'A', 'cantidad_vendida': 2}])
+    cargar('compras', [{'local': 'L1', 'fecha_dte': pd.Timestamp('2024-01-05'), 'sku': 'X', 'subcat': 'Directo',
+                        'cant_conv': 1.0, 'monto_real': 10.0}])
+    assert generar_snapshots(hoy=date(2026, 10, 1)) == {'ventas': 2, 'consumo': 2, 'compras': 2}
+    assert generar_snapshots(hoy=date(2026, 10, 1)) == {'ventas': 0, 'consumo': 0, 'compras': 0}
+    assert not resumen_snapshots().empty
+
+
+def test_plan_periodo_separa_meses_con_snapshot(base, cargar):
+    cargar('ventas', [{'local': 'L1', 'fecha_venta': '2024-02-20', 'sku_producto': 'A', 'cantidad_vendida': 2}])
+    generar_snapshots('2024-02', '2024-02', hoy=date(2026, 10, 1))
+    meses, tramos = plan_periodo('2024-01-15', '2024-03-10', 'ventas')
+    assert meses == [date(2024, 2, 1)]
+    assert tramos == [(date(2024, 1, 15), date(2024, 1, 31)), (date(2024, 3, 1), date(2024, 3, 10))]
+
+
+def test_version_recetas_se_huellea_una_vez_por_version(base, cargar, monkeypatch):
+    cargar('recetas', [receta('A', 'X', 1.0), receta('A', 'Y', 2.0)])
+    v1 = version_recetas(recetas())
+    assert v1 == version_recetas(pd.DataFrame(recetas()))            # misma huella que sin versión
+    monkeypatch.setattr(snapshots.pd.util, 'hash_pandas_object', None)
+    assert version_recetas(recetas()) == v1                          # misma versión: no se vuelve a huellear
+    monkeypatch.undo()
+
+    directos = {'CODIGO VENTA': ['A'], 'Plato': ['a'], 'SKU': ['Z'], 'Ingrediente': ['z'],
+                'CantReal': [1.0], 'Eficiencia': [1], 'UM': ['KG'], 'EsOpcion': [0]}
+    assert save_recetario(pd.DataFrame(directos), pd.DataFrame(columns=['Codigo Venta']))
+    assert version_recetas(recetas()) not in ('', v1)
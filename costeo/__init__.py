@@ -0,0 +1,16 @@
+"""
+Núcleo de cálculo del MRP gastronómico, sin dependencia de Streamlit.
+
+    costeo.db           conexión (Postgres / DuckDB) y run_query
+    costeo.espejo       espejo Parquet de compras y ventas
+    costeo.mrp          explosión de materiales (process_bom)
+    costeo.compras      procesado del Excel de facturas
+    costeo.informes     Informes 1, 2 y 3
+    costeo.persistencia altas de recetario, compras y ventas
+    costeo.perf         instrumentación por etapas (logger "mrp.perf")
+
+La app (app.py) y la línea de comandos (python -m costeo) usan estos módulos.
+Los avisos al usuario pasan por costeo.avisos y la configuración por
+costeo.config, de modo que cada interfaz decide cómo mostrarlos y de dónde
+salen los secretos.
+"""
@@ -0,0 +1,181 @@
+"""
+Detección de precios anómalos al cargar compras.
+
+precio_estadisticas guarda por SKU n, media y m2 (suma de cuadrados de las
+desviaciones, Welford) de log(muc) de todas las compras con muc > 0. En
+escala logarítmica un error de conversion / formato (×10, ×1000) es un
+salto grande y simétrico, independiente del nivel de precio del SKU.
+
+    z = (log(muc) − media) / √(m2 / (n − 1))        anómala si |z| > UMBRAL_Z
+
+Cada carga se resume en un (n, media, m2) por SKU y se combina con lo
+guardado (fórmula de Chan para unir dos resúmenes), así no hace falta
+releer el historial. save_compras → actualizar_estadisticas(df), que deja
+afuera las líneas que puntuar_compras marca como anómalas (una factura mal
+tipeada inflaría la varianza del SKU y taparía la próxima);
+puntuar_compras(df) marca las líneas antes de guardar (vista previa de
+Compras). La copia desde Supabase las rearma con todo el historial (y la
+primera carga, si la tabla está vacía).
+"""
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from .db import asegurar_tabla, get_engine, lista_in, run_query
+from .particiones import anios_archivados, leer_archivo
+from .perf import medir
+
+UMBRAL_Z = 4.0
+MIN_OBS = 5      # con menos compras del SKU no se puntúa
+
+COLS_ESTADISTICAS = ['sku', 'n', 'media', 'm2']
+
+ESQUEMA_ESTADISTICAS = """
+    CREATE TABLE IF NOT EXISTS precio_estadisticas (
+        sku VARCHAR, n BIGINT, media DOUBLE PRECISION, m2 DOUBLE PRECISION, actualizado TIMESTAMP
+    )
+"""
+
+
+def _engine_estadisticas():
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_ESTADISTICAS):
+        return None
+    return engine
+
+
+def _log_muc(df):
+    """(sku, x = log(muc)) de las líneas con SKU y muc > 0."""
+    muc = pd.to_numeric(df['muc'], errors='coerce')
+    ok = (muc > 0) & df['sku'].notna()
+    return pd.DataFrame({'sku': df.loc[ok, 'sku'].astype(str), 'x': np.log(muc[ok])})
+
+
+def estadisticas_lote(df):
+    """(sku, n, media, m2) de log(muc) de las líneas de `df`."""
+    x = _log_muc(df)
+    if x.empty:
+        return pd.DataFrame(columns=COLS_ESTADISTICAS)
+    g = x.groupby('sku')['x']
+    est = pd.DataFrame({'n': g.size(), 'media': g.mean(), 'm2': g.var(ddof=0) * g.size()})
+    return est.reset_index()[COLS_ESTADISTICAS]
+
+
+def combinar(a, b):
+    """Une dos resúmenes (sku, n, media, m2) como si fueran una sola muestra."""
+    t = a.merge(b, on='sku', how='outer', suffixes=('_a', '_b'))
+    t = t.astype({c: float for c in t.columns if c != 'sku'})     # un resumen vacío llega como object
+    na, nb = t['n_a'].fillna(0), t['n_b'].fillna(0)
+    ma, mb = t['media_a'].fillna(0), t['media_b'].fillna(0)
+    n = na + nb
+    delta = mb - ma
+    return pd.DataFrame({
+        'sku': t['sku'],
+        'n': n.astype('int64'),
+        'media': ma + delta * nb / n,
+        'm2': t['m2_a'].fillna(0) + t['m2_b'].fillna(0) + delta ** 2 * na * nb / n,
+    })
+
+
+def _guardar(engine, est, skus=None):
+    with engine.begin() as conn:
+        if skus is None:
+            conn.execute(text("DELETE FROM precio_estadisticas"))
+        elif skus:
+            marcas, params = lista_in(skus)
+            conn.execute(text(f"DELETE FROM precio_estadisticas WHERE sku IN ({marcas})"), params)
+        if not est.empty:
+            est.assign(actualizado=datetime.now()).to_sql('precio_estadisticas', conn,
+                                                           if_exists='append', index=False)
+
+
+def reconstruir_estadisticas():
+    """Rearma precio_estadisticas desde compras (años archivados desde su Parquet). Devuelve los SKUs."""
+    engine = _engine_estadisticas()
+    if engine is None:
+        return None
+    archivados = sorted(anios_archivados('compras'))
+    excluir, params = "", {}
+    if archivados:
+        marcas, params = lista_in(archivados, "a")
+        excluir = f"AND EXTRACT(YEAR FROM fecha_dte) NOT IN ({marcas})"
+    with medir("anomalías: reconstruir") as m:
+        est = run_query(f"""
+            SELECT CAST(sku AS VARCHAR) AS sku, COUNT(*) AS n, AVG(LN(muc)) AS media,
+                   VAR_POP(LN(muc)) * COUNT(*) AS m2
+            FROM compras
+            WHERE muc > 0 AND sku IS NOT NULL {excluir}
+            GROUP BY 1
+        """, params or None)
+        if est.empty:
+            est = pd.DataFrame(columns=COLS_ESTADISTICAS)
+        for anio in archivados:
+            for df in leer_archivo('compras', ['fecha_dte', 'sku', 'muc'], f"{anio}-01-01", f"{anio}-12-31"):
+                est = combinar(est, estadisticas_lote(df))
+        m['filas_out'] = len(est)
+    _guardar(engine, est)
+    return len(est)
+
+
+def _guardadas(skus):
+    marcas, params = lista_in(skus)
+    df = run_query(f"SELECT sku, n, media, m2 FROM precio_estadisticas WHERE sku IN ({marcas})", params)
+    return df if not df.empty else pd.DataFrame(columns=COLS_ESTADISTICAS)
+
+
+def actualizar_estadisticas(df):
+    """
+    Suma una carga de compras a las estadísticas de sus SKUs, sin las líneas
+    anómalas (columna `anomalia`, o puntuar_compras si no viene). Devuelve
+    los SKUs actualizados.
+    """
+    engine = _engine_estadisticas()
+    if engine is None or not {'sku', 'muc'} <= set(df.columns):
+        return None
+    if run_query("SELECT sku FROM precio_estadisticas LIMIT 1").empty:
+        return reconstruir_estadisticas()
+    anomalas = df['anomalia'] if 'anomalia' in df.columns else puntuar_compras(df)['anomalia']
+    lote = estadisticas_lote(df[~anomalas.fillna(False).astype(bool)])
+    if lote.empty:
+        return 0
+    skus = lote['sku'].tolist()
+    with medir("anomalías: actualizar", filas_in=len(df)) as m:
+        est = combinar(_guardadas(skus), lote)
+        m['filas_out'] = len(est)
+    _guardar(engine, est, skus)
+    return len(est)
+
+
+def puntuar_compras(df, umbral=UMBRAL_Z, minimo=MIN_OBS):
+    """
+    Copia de `df` con muc_referencia (media geométrica histórica del SKU),
+    z_precio y anomalia (|z| > umbral, con al menos `minimo` compras previas).
+    """
+    out = df.copy()
+    out['muc_referencia'] = np.nan
+    out['z_precio'] = np.nan
+    out['anomalia'] = False
+    if out.empty or not {'sku', 'muc'} <= set(out.columns) or _engine_estadisticas() is None:
+        return out
+    skus = sorted(out['sku'].dropna().astype(str).unique())
+    if not skus:
+        return out
+    with medir("anomalías: puntuar", filas_in=len(out)) as m:
+        est = _guardadas(skus)
+        if est.empty and run_query("SELECT sku FROM precio_estadisticas LIMIT 1").empty and reconstruir_estadisticas():
+            est = _guardadas(skus)
+        est = est[est['n'] >= minimo].set_index('sku')
+        sd = np.sqrt(est['m2'] / (est['n'] - 1))
+        clave = out['sku'].astype(str)
+        media = clave.map(est['media']).to_numpy(dtype=float)
+        desvio = clave.map(sd.where(sd > 0)).to_numpy(dtype=float)
+        muc = pd.to_numeric(out['muc'], errors='coerce').to_numpy(dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = (np.log(np.where(muc > 0, muc, np.nan)) - media) / desvio
+        out['muc_referencia'] = np.exp(media)
+        out['z_precio'] = z
+        out['anomalia'] = np.abs(np.nan_to_num(z)) > umbral
+        m['filas_out'] = int(out['anomalia'].sum())
+    return out
@@ -0,0 +1,57 @@
+"""
+Mensajes al usuario emitidos desde el núcleo (éxito, advertencia, error).
+
+Por defecto van al logger "mrp"; la app Streamlit los redirige a
+st.success / st.warning / st.error con usar_avisos(). Un cálculo en segundo
+plano (sin página donde mostrarlos) los junta con capturar() y quien usa el
+resultado los muestra con reemitir().
+"""
+import contextvars
+import logging
+from contextlib import contextmanager
+
+_log = logging.getLogger("mrp")
+_destinos = {'exito': _log.info, 'advertencia': _log.warning, 'error': _log.error}
+_captura = contextvars.ContextVar("avisos_captura", default=None)
+
+
+def usar_avisos(exito=None, advertencia=None, error=None):
+    for clave, fn in (('exito', exito), ('advertencia', advertencia), ('error', error)):
+        if fn is not None:
+            _destinos[clave] = fn
+
+
+def _emitir(clave, msg):
+    capturados = _captura.get()
+    if capturados is not None:
+        capturados.append((clave, msg))
+    else:
+        _destinos[clave](msg)
+
+
+def exito(msg):
+    _emitir('exito', msg)
+
+
+def advertencia(msg):
+    _emitir('advertencia', msg)
+
+
+def error(msg):
+    _emitir('error', msg)
+
+
+@contextmanager
+def capturar():
+    """Junta los avisos del bloque en una lista de (tipo, mensaje) en vez de emitirlos."""
+    capturados = []
+    token = _captura.set(capturados)
+    try:
+        yield capturados
+    finally:
+        _captura.reset(token)
+
+
+def reemitir(capturados):
+    for clave, msg in capturados:
+        _emitir(clave, msg)
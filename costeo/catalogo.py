@@ -0,0 +1,110 @@
+"""
+Dimensión catalogo_sku: nombre canónico, subcategoría, categoría y UM por SKU.
+
+Mismo criterio que usaban los informes con sus GROUP BY sobre compras:
+MIN(nombre_producto), MIN(subcat) y MIN(categoria_producto) de las compras
+'Directo' / 'Indirecto'; la UM es la del recetario (MIN(um_salida)).
+save_compras actualiza sólo los SKUs de la carga; save_recetario y la copia
+desde Supabase la rearman completa. Se lee una vez y queda en memoria.
+"""
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from .compartido import compartida_activa, tabla_compartida
+from .db import asegurar_tabla, get_engine, lista_in, run_query
+from .perf import medir
+
+COLS_CATALOGO = ['sku', 'nombre', 'subcat', 'categoria', 'um']
+
+ESQUEMA_CATALOGO = """
+    CREATE TABLE IF NOT EXISTS catalogo_sku (
+        sku VARCHAR, nombre VARCHAR, subcat VARCHAR, categoria VARCHAR, um VARCHAR,
+        actualizado TIMESTAMP
+    )
+"""
+
+# Catálogo en memoria por base (URL del engine)
+_catalogo_cache = {}
+
+
+def _calcular(skus=None):
+    """Filas del catálogo desde compras + recetario (todas, o sólo `skus`)."""
+    filtro, params = "", {}
+    if skus is not None:
+        marcas, params = lista_in(skus)
+        filtro = f"AND sku IN ({marcas})"
+    df = run_query(f"""
+        SELECT sku, MIN(nombre_producto) AS nombre, MIN(subcat) AS subcat,
+               MIN(categoria_producto) AS categoria
+        FROM compras
+        WHERE subcat IN ('Directo', 'Indirecto') {filtro}
+        GROUP BY sku
+    """, params or None)
+    if df.empty:
+        return pd.DataFrame(columns=COLS_CATALOGO)
+    um = run_query("SELECT sku_ingrediente AS sku, MIN(um_salida) AS um FROM recetas GROUP BY 1")
+    if um.empty:
+        return df.assign(um=None)[COLS_CATALOGO]
+    return df.merge(um, on='sku', how='left')[COLS_CATALOGO]
+
+
+def actualizar_catalogo(skus=None):
+    """
+    Rearma catalogo_sku (completo si `skus` es None, o sólo esos SKUs) y
+    refresca la copia en memoria. Devuelve las filas escritas.
+    """
+    engine = get_engine()
+    if engine is None:
+        return None
+    tabla_ok = asegurar_tabla(engine, ESQUEMA_CATALOGO)
+    # Sin catálogo armado todavía, una actualización parcial lo dejaría incompleto
+    if skus is not None and tabla_ok and run_query("SELECT sku FROM catalogo_sku LIMIT 1").empty:
+        skus = None
+    if skus is not None:
+        skus = sorted(pd.Series(skus).dropna().astype(str).unique())
+        if not skus:
+            return 0
+    with medir("catálogo: actualizar", filas_in=None if skus is None else len(skus)) as m:
+        df = _calcular(skus)
+        m['filas_out'] = len(df)
+    if tabla_ok:
+        with engine.begin() as conn:
+            if skus is None:
+                conn.execute(text("DELETE FROM catalogo_sku"))
+            else:
+                marcas, params = lista_in(skus)
+                conn.execute(text(f"DELETE FROM catalogo_sku WHERE sku IN ({marcas})"), params)
+            if not df.empty:
+                df.assign(actualizado=datetime.now()).to_sql('catalogo_sku', conn, if_exists='append', index=False)
+    _catalogo_cache.pop(str(engine.url), None)
+    return len(df)
+
+
+def catalogo():
+    """
+    catalogo_sku completo (sku, nombre, subcat, categoria, um), leído una vez
+    por base (o por versión publicada, con la caché compartida activa).
+    """
+    engine = get_engine()
+    if engine is None:
+        return pd.DataFrame(columns=COLS_CATALOGO)
+    if compartida_activa():
+        return tabla_compartida('catalogo')
+    clave = str(engine.url)
+    if clave not in _catalogo_cache:
+        _catalogo_cache[clave] = catalogo_en_base()
+    return _catalogo_cache[clave]
+
+
+def catalogo_en_base():
+    """catalogo_sku leído de la base (lo arma si está vacío)."""
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_CATALOGO):
+        return _calcular()
+    sql = f"SELECT {', '.join(COLS_CATALOGO)} FROM catalogo_sku"
+    df = run_query(sql)
+    if df.empty and actualizar_catalogo():
+        df = run_query(sql)
+    return df
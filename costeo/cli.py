@@ -0,0 +1,435 @@
+"""
+Línea de comandos para procesos batch (p. ej. corridas nocturnas programadas).
+
+    python -m costeo mrp archivo_mrp.xlsx -o MRP_Explosion.xlsx
+    python -m costeo compras facturas.xlsx -o compras.parquet [--guardar]
+    python -m costeo informe rentabilidad --desde 2024-01-01 --hasta 2024-01-31 -o inf1.xlsx
+    python -m costeo informe desviacion   --desde 2024-01-01 --hasta 2024-01-31 --local Centro -o inf2.parquet
+    python -m costeo informe precios      --mes-base 2024-01 --mes-comp 2024-02 -o inf3.xlsx
+    python -m costeo informe consumo-diario --desde 2024-01-01 --hasta 2024-01-31 -o consumo.csv
+    python -m costeo snapshots [--desde 2024-01 --hasta 2024-06] [--recalcular]
+    python -m costeo costos
+    python -m costeo inventario
+    python -m costeo cpp
+    python -m costeo equivalencias equivalencias.xlsx [--validar]
+    python -m costeo funcion-consumo
+    python -m costeo compartido
+    python -m costeo particionar compras
+    python -m costeo archivar 2023 [--tabla compras]    |    python -m costeo restaurar 2023
+    python -m costeo exportar compras --desde 2024-01-01 --hasta 2024-12-31 -o compras_2024.parquet
+    python -m costeo planificar -o sugerencia.xlsx [--hasta 2024-01-31 --local Centro --pronostico pron.parquet]
+    python -m costeo simular escenarios.csv --desde 2024-01-01 --hasta 2024-01-31 -o resumen.xlsx [--detalle detalle.parquet]
+
+La salida se escribe según la extensión de -o (.xlsx, .parquet o .csv).
+La conexión sale de MRP_BACKEND / MRP_DUCKDB_PATH o de .streamlit/secrets.toml
+(MRP_SECRETS_FILE para otra ruta), igual que la app.
+Código de salida: 0 si se generó el archivo, 1 si no hubo datos o falló.
+
+    mrp              explosión MRP desde el Excel Ventas / Directos / Procesados
+    compras          procesa un Excel de facturas (marca precios anómalos);
+                     --guardar además las carga en la base
+    informe          Informes 1–3 y consumo diario; "desviacion --cpp" valoriza
+                     el Δ $ a CPP al cierre de --hasta
+    snapshots        precalcula los meses cerrados de los Informes 1 y 2 (proceso
+                     nocturno; ver costeo.snapshots)
+    costos           rearma costo_platos (tras cargas hechas fuera de la app)
+    inventario       rearma el libro de stock teórico y sus cierres mensuales
+                     (ver costeo.inventario)
+    cpp              rearma el costo promedio ponderado por SKU (ver costeo.cpp)
+    equivalencias    valida e importa un .xlsx/.csv (sku_compra, sku_receta,
+                     descripcion); con --validar sólo informa
+    funcion-consumo  crea en Postgres consumo_teorico_periodo(desde, hasta, local,
+                     niveles), el consumo del Informe 2 en la base (ver costeo.consumo_sql)
+    compartido       vuelve a publicar recetas, precios y catálogo en la caché
+                     compartida (MRP_CACHE_DIR; ver costeo.compartido)
+    particionar      convierte compras / ventas en tablas particionadas por mes (Postgres)
+    archivar         mueve un año cerrado a Parquet y lo saca de la base;
+                     restaurar lo devuelve (ver costeo.particiones)
+    exportar         vuelca una tabla por bloques (cursor del lado del servidor)
+    planificar       pronóstico de la próxima semana y sugerencia de compra por
+                     ingrediente (ver costeo.planificacion)
+    simular          resumen por escenario de un .csv/.xlsx de escenarios
+                     (escenario, alcance, valor, variacion_pct; ver costeo.simulador)
+"""
+import argparse
+import logging
+import sys
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+
+INFORMES = ('rentabilidad', 'desviacion', 'precios', 'consumo-diario')
+TABLAS_EXPORTABLES = ('compras', 'ventas', 'recetas', 'sku_equivalencias')
+TABLAS_PARTICIONABLES = ('compras', 'ventas')
+
+
+def _fecha(valor):
+    return date.fromisoformat(valor)
+
+
+def _escribir(df, destino):
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    ext = destino.suffix.lower()
+    if ext == '.xlsx':
+        with pd.ExcelWriter(destino, engine='openpyxl') as w:
+            df.to_excel(w, index=False)
+    elif ext == '.parquet':
+        df.to_parquet(destino, index=False)
+    elif ext == '.csv':
+        df.to_csv(destino, index=False)
+    else:
+        raise SystemExit(f"Formato de salida no soportado: '{ext}' (usar .xlsx, .parquet o .csv)")
+    logging.getLogger("mrp").info(f"✅ {len(df):,} filas → {destino}")
+
+
+def _mrp(args):
+    from .mrp import process_bom
+
+    xls = pd.ExcelFile(args.archivo)
+    return process_bom(
+        pd.read_excel(xls, 'Ventas'),
+        pd.read_excel(xls, 'Directos'),
+        pd.read_excel(xls, 'Procesados')
+    )
+
+
+def _compras(args):
+    from .anomalias import puntuar_compras
+    from .compras import procesar_compras
+    from .persistencia import save_compras
+
+    df, advertencias = procesar_compras(pd.read_excel(args.archivo))
+    for adv in advertencias:
+        logging.getLogger("mrp").warning(adv.replace('**', ''))
+    anomalas = puntuar_compras(df)
+    for _, r in anomalas[anomalas['anomalia']].iterrows():
+        logging.getLogger("mrp").warning(f"Precio anómalo: folio {r.get('folio')} SKU {r['sku']} "
+                                         f"MUC {r['muc']:,.2f} (referencia {r['muc_referencia']:,.2f})")
+    if args.guardar and not save_compras(df):
+        return pd.DataFrame()
+    return df
+
+
+def _informe(args):
+    from . import informes
+
+    if args.informe == 'precios':
+        if not (args.mes_base and args.mes_comp):
+            raise SystemExit("El informe de precios requiere --mes-base y --mes-comp (AAAA-MM)")
+        return informes.informe_variacion_precios(args.mes_base, args.mes_comp, args.categoria)
+    if not (args.desde and args.hasta):
+        raise SystemExit(f"El informe de {args.informe} requiere --desde y --hasta (AAAA-MM-DD)")
+    if args.informe == 'rentabilidad':
+        return informes.informe_rentabilidad(args.desde, args.hasta, args.local)
+    if args.informe == 'consumo-diario':
+        matriz, _ = informes.consumo_diario(args.desde, args.hasta, args.local)
+        return matriz.reset_index()
+    from .inventario import informe_desviacion_stock
+
+    informe = informe_desviacion_stock(args.desde, args.hasta, args.local)
+    if args.cpp:
+        from .cpp import valorizar_cpp
+
+        informe = valorizar_cpp(informe, args.hasta, args.local)
+    return informe
+
+
+def _snapshots(args):
+    from .snapshots import generar_snapshots
+
+    generados = generar_snapshots(args.desde, args.hasta, args.recalcular)
+    if not generados:
+        logging.getLogger("mrp").error("No se generaron snapshots (sin conexión o sin datos).")
+        return 1
+    for tipo, n in generados.items():
+        logging.getLogger("mrp").info(f"✅ snap_{tipo}: {n} meses generados")
+    return 0
+
+
+def _costos(args):
+    from .costos import recalcular_costos
+
+    n = recalcular_costos()
+    if not n:
+        logging.getLogger("mrp").error("No se recalcularon costos (sin conexión, recetario o precios).")
+        return 1
+    logging.getLogger("mrp").info(f"✅ costo_platos: {n:,} platos")
+    return 0
+
+
+def _inventario(args):
+    from .inventario import reconstruir_inventario
+
+    n = reconstruir_inventario()
+    if not n:
+        logging.getLogger("mrp").error("No se rearmó el inventario (sin conexión o sin movimientos).")
+        return 1
+    logging.getLogger("mrp").info(f"✅ stock_movimientos: {n:,} movimientos")
+    return 0
+
+
+def _cpp(args):
+    from .cpp import reconstruir_cpp
+
+    n = reconstruir_cpp()
+    if not n:
+        logging.getLogger("mrp").error("No se rearmó el CPP (sin conexión o sin compras).")
+        return 1
+    logging.getLogger("mrp").info(f"✅ cpp_historial: {n:,} filas")
+    return 0
+
+
+def _equivalencias(args):
+    from .equivalencias import importar_equivalencias, validar_equivalencias
+
+    leer = pd.read_csv if args.archivo.lower().endswith('.csv') else pd.read_excel
+    try:
+        ok, problemas = validar_equivalencias(leer(args.archivo, dtype=str))
+    except ValueError as e:
+        raise SystemExit(f"Archivo no válido: {e}")
+    for _, r in problemas.iterrows():
+        logging.getLogger("mrp").warning(f"Rechazada {r['sku_compra']} → {r['sku_receta']}: {r['motivo']}")
+    logging.getLogger("mrp").info(", ".join(f"{a}: {n:,}" for a, n in ok['accion'].value_counts().items()) or "sin filas válidas")
+    if args.validar:
+        return 0
+    n = importar_equivalencias(ok)
+    if n is None:
+        return 1
+    logging.getLogger("mrp").info(f"✅ sku_equivalencias: {n:,} filas importadas")
+    return 0
+
+
+def _compartido(args):
+    from .compartido import compartida_activa, estado_compartidas, publicar_tablas
+
+    if not compartida_activa():
+        logging.getLogger("mrp").error("Caché compartida inactiva: definir MRP_CACHE_DIR o cache_dir en [storage].")
+        return 1
+    publicadas = publicar_tablas()
+    for e in estado_compartidas():
+        logging.getLogger("mrp").info(f"{e['tabla']}: versión {e['version']} · {e['filas'] or 0:,} filas · {e['MB']} MB")
+    return 0 if all(publicadas.values()) else 1
+
+
+def _funcion_consumo(args):
+    from .consumo_sql import instalar_funcion_consumo
+
+    if not instalar_funcion_consumo():
+        logging.getLogger("mrp").error("No se creó consumo_teorico_periodo (requiere Postgres).")
+        return 1
+    logging.getLogger("mrp").info("✅ función consumo_teorico_periodo(desde, hasta, local, niveles) creada")
+    return 0
+
+
+def _particionar(args):
+    from .particiones import particionar
+
+    return 0 if particionar(args.tabla) else 1
+
+
+def _archivo(args):
+    from .particiones import archivar, restaurar
+
+    tablas = (args.tabla,) if args.tabla else ('compras', 'ventas')
+    try:
+        hechos = archivar(args.anio, tablas) if args.comando == 'archivar' else restaurar(args.anio, tablas)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if not hechos:
+        logging.getLogger("mrp").error(f"Nada que {args.comando} para {args.anio}.")
+        return 1
+    for tabla, n in hechos.items():
+        logging.getLogger("mrp").info(f"✅ {tabla} {args.anio}: {n:,} filas ({args.comando})")
+    return 0
+
+
+def _exportar(args):
+    from .db import dia_siguiente, run_query_stream
+
+    fecha = {'compras': 'fecha_dte', 'ventas': 'fecha_venta'}.get(args.tabla)
+    condiciones, params = [], {}
+    if args.desde and fecha:
+        condiciones.append(f"{fecha} >= :i")
+        params["i"] = str(args.desde)
+    if args.hasta and fecha:
+        condiciones.append(f"{fecha} < :fs")
+        params["fs"] = dia_siguiente(args.hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+
+    destino = Path(args.destino)
+    ext = destino.suffix.lower()
+    if ext not in ('.parquet', '.csv'):
+        raise SystemExit(f"exportar escribe por bloques: usar .parquet o .csv (no '{ext}')")
+    destino.parent.mkdir(parents=True, exist_ok=True)
+
+    n, escritor = 0, None
+    try:
+        for chunk in run_query_stream(f"SELECT * FROM {args.tabla} {where}", params, chunksize=args.bloque):
+            if ext == '.csv':
+                chunk.to_csv(destino, mode='w' if n == 0 else 'a', header=(n == 0), index=False)
+            else:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                if escritor is None:
+                    esquema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    # Columnas todo-NULL en el primer bloque: texto, para admitir valores después
+                    esquema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                         for f in esquema])
+                    escritor = pq.ParquetWriter(destino, esquema)
+                escritor.write_table(pa.Table.from_pandas(chunk, schema=escritor.schema, preserve_index=False))
+            n += len(chunk)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    if n == 0:
+        logging.getLogger("mrp").error("Sin filas para exportar.")
+        return 1
+    logging.getLogger("mrp").info(f"✅ {n:,} filas de {args.tabla} → {destino}")
+    return 0
+
+
+def _planificar(args):
+    from .planificacion import planificar
+
+    pronostico, sugerencia = planificar(args.hasta, args.local, args.semanas, args.alfa,
+                                        dias_compras=args.dias_compras)
+    if args.pronostico and not pronostico.empty:
+        _escribir(pronostico, args.pronostico)
+    return sugerencia
+
+
+def _simular(args):
+    from .simulador import COLS_ESCENARIOS, simular
+
+    ruta = Path(args.escenarios)
+    escenarios = pd.read_excel(ruta) if ruta.suffix.lower() in ('.xlsx', '.xls') else pd.read_csv(ruta)
+    faltantes = [c for c in COLS_ESCENARIOS if c not in escenarios.columns]
+    if faltantes:
+        raise SystemExit(f"Faltan columnas en {ruta.name}: {', '.join(faltantes)}")
+    try:
+        resumen, detalle = simular(escenarios, args.desde, args.hasta, args.local)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if args.detalle and not detalle.empty:
+        _escribir(detalle, args.detalle)
+    return resumen
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m costeo", description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--log-etapas", action="store_true", help="emite los logs JSON de mrp.perf")
+    sub = ap.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("mrp", help="explosión MRP desde el Excel Ventas/Directos/Procesados")
+    p.add_argument("archivo")
+    p.add_argument("-o", "--salida", required=True)
+    p.set_defaults(ejecutar=_mrp)
+
+    p = sub.add_parser("compras", help="procesa un Excel de facturas de compras")
+    p.add_argument("archivo")
+    p.add_argument("-o", "--salida", required=True)
+    p.add_argument("--guardar", action="store_true", help="además guarda las líneas en la base")
+    p.set_defaults(ejecutar=_compras)
+
+    p = sub.add_parser("informe", help="genera el Informe 1 (rentabilidad), 2 (desviacion), 3 (precios) o el consumo teórico diario")
+    p.add_argument("informe", choices=INFORMES)
+    p.add_argument("-o", "--salida", required=True)
+    p.add_argument("--desde", type=_fecha)
+    p.add_argument("--hasta", type=_fecha)
+    p.add_argument("--local", default="Todos")
+    p.add_argument("--mes-base", help="mes muestra de la canasta (AAAA-MM)")
+    p.add_argument("--mes-comp", help="mes de comparación de precios (AAAA-MM)")
+    p.add_argument("--categoria", default="Todos")
+    p.add_argument("--cpp", action="store_true", help="desviacion: valoriza el Δ $ a costo promedio ponderado")
+    p.set_defaults(ejecutar=_informe)
+
+    p = sub.add_parser("snapshots", help="precalcula los meses cerrados de los Informes 1 y 2")
+    p.add_argument("--desde", help="primer mes (AAAA-MM); por defecto el primero con datos")
+    p.add_argument("--hasta", help="último mes (AAAA-MM); por defecto el mes anterior al actual")
+    p.add_argument("--recalcular", action="store_true", help="regenera también los meses ya guardados")
+    p.set_defaults(ejecutar=_snapshots, salida=None)
+
+    p = sub.add_parser("costos", help="recalcula completa la tabla costo_platos")
+    p.set_defaults(ejecutar=_costos, salida=None)
+
+    p = sub.add_parser("inventario", help="rearma el libro de stock teórico y sus cierres mensuales")
+    p.set_defaults(ejecutar=_inventario, salida=None)
+
+    p = sub.add_parser("cpp", help="rearma el costo promedio ponderado por SKU y local")
+    p.set_defaults(ejecutar=_cpp, salida=None)
+
+    p = sub.add_parser("equivalencias", help="valida e importa en bloque equivalencias de SKU (.xlsx/.csv)")
+    p.add_argument("archivo")
+    p.add_argument("--validar", action="store_true", help="sólo valida, no importa")
+    p.set_defaults(ejecutar=_equivalencias, salida=None)
+
+    p = sub.add_parser("funcion-consumo", help="crea en Postgres la función consumo_teorico_periodo")
+    p.set_defaults(ejecutar=_funcion_consumo, salida=None)
+
+    p = sub.add_parser("compartido", help="publica recetas, precios y catálogo en la caché compartida (Arrow)")
+    p.set_defaults(ejecutar=_compartido, salida=None)
+
+    p = sub.add_parser("particionar", help="convierte compras / ventas en tabla particionada por mes (Postgres)")
+    p.add_argument("tabla", choices=TABLAS_PARTICIONABLES)
+    p.set_defaults(ejecutar=_particionar, salida=None)
+
+    for nombre, ayuda in [("archivar", "mueve un año cerrado de compras / ventas a Parquet (zstd)"),
+                          ("restaurar", "devuelve a la base un año archivado")]:
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("anio", type=int)
+        p.add_argument("--tabla", choices=TABLAS_PARTICIONABLES)
+        p.set_defaults(ejecutar=_archivo, salida=None)
+
+    p = sub.add_parser("exportar", help="vuelca una tabla a .parquet/.csv leyendo por bloques")
+    p.add_argument("tabla", choices=TABLAS_EXPORTABLES)
+    p.add_argument("-o", "--destino", required=True)
+    p.add_argument("--desde", type=_fecha)
+    p.add_argument("--hasta", type=_fecha)
+    p.add_argument("--bloque", type=int, default=50_000, help="filas por bloque")
+    p.set_defaults(ejecutar=_exportar, salida=None)
+
+    p = sub.add_parser("planificar", help="pronóstico semanal de ventas y sugerencia de compra")
+    p.add_argument("-o", "--salida", required=True, help="sugerencia de compra por local e ingrediente")
+    p.add_argument("--pronostico", help="además escribe el pronóstico diario por plato y local")
+    p.add_argument("--hasta", type=_fecha, help="último día de historia (por defecto, la última venta)")
+    p.add_argument("--local", default="Todos")
+    p.add_argument("--semanas", type=int, default=8, help="semanas de historia")
+    p.add_argument("--alfa", type=float, default=0.5, help="suavizado (1 = naive estacional)")
+    p.add_argument("--dias-compras", type=int, default=7, help="días de compras recientes a netear")
+    p.set_defaults(ejecutar=_planificar)
+
+    p = sub.add_parser("simular", help="costo y margen de todo el menú bajo escenarios de precio")
+    p.add_argument("escenarios", help=".csv/.xlsx con escenario, alcance, valor, variacion_pct")
+    p.add_argument("-o", "--salida", required=True, help="resumen por escenario")
+    p.add_argument("--detalle", help="además escribe el detalle escenario × plato")
+    p.add_argument("--desde", type=_fecha, required=True)
+    p.add_argument("--hasta", type=_fecha, required=True)
+    p.add_argument("--local", default="Todos")
+    p.set_defaults(ejecutar=_simular)
+
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    log_perf = logging.getLogger("mrp.perf")
+    log_perf.setLevel(logging.INFO if args.log_etapas else logging.WARNING)
+    if args.log_etapas:     # JSON por línea, sin el prefijo de nivel
+        h = logging.StreamHandler()
+        h.setFormatter(logging.Formatter("%(message)s"))
+        log_perf.addHandler(h)
+        log_perf.propagate = False
+
+    if args.salida is None:
+        return args.ejecutar(args)
+    df = args.ejecutar(args)
+    if df is None or df.empty:
+        logging.getLogger("mrp").error("Sin resultados; no se escribió la salida.")
+        return 1
+    _escribir(df, args.salida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Caché de tablas de referencia compartida entre procesos del mismo host
+(réplicas de la app, workers, CLI): recetas, precios vigentes y catálogo.
+
+Cada tabla se publica como archivo Arrow IPC sin comprimir,
+<dir>/<tabla>-<lote>.arrow, y <dir>/<tabla>.json apunta al vigente.
+Publicar escribe el archivo completo y recién entonces reemplaza el puntero
+con os.replace: un lector ve la versión anterior o la nueva, nunca una a
+medias. Los lectores abren el archivo con pa.memory_map (sólo lectura): las
+páginas las comparte el page cache entre todos los procesos y abrir una
+versión nueva no consulta la base. tabla_arrow() da esa tabla sin copia;
+tabla_compartida() arma el DataFrame una vez por versión y proceso y
+devuelve una copia superficial: se pueden agregar, reemplazar o quitar
+columnas, pero los valores son de sólo lectura (las columnas numéricas
+están sobre el mapa y escribir en ellas falla).
+
+Se activa con MRP_CACHE_DIR o cache_dir en [storage] (un directorio por
+base: un puntero publicado desde otra base se ignora); sin directorio todo
+se lee de la base como siempre. Las altas que cambian estas tablas
+(persistencia, copia desde Supabase) vuelven a publicarlas; una tabla que
+todavía no está publicada la publica el primer proceso que la pide.
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+from glob import glob
+
+from . import avisos, config
+from .concurrencia import version_datos
+from .db import _storage_secrets, run_query, storage_config
+from .perf import medir
+
+TABLAS = ['recetas', 'precios', 'catalogo']
+FORMATO = 2              # sube cuando cambian las columnas publicadas: los punteros viejos se ignoran
+ARCHIVOS_RETENIDOS = 2   # el vigente y el anterior (lectores que lo están abriendo)
+
+_lock = threading.Lock()
+_mapas = {}              # tabla → (archivo, pa.Table mapeada)
+_frames = {}             # tabla → (archivo, DataFrame)
+
+
+def cache_dir():
+    return os.environ.get("MRP_CACHE_DIR", _storage_secrets().get("cache_dir", "")) or None
+
+
+def compartida_activa():
+    return cache_dir() is not None
+
+
+def _leer_base(tabla):
+    """`tabla` leída de la base: lo que se publica."""
+    if tabla == 'recetas':
+        return run_query("SELECT * FROM recetas")
+    if tabla == 'precios':
+        from .costos import precios_en_base
+        return precios_en_base()
+    from .catalogo import catalogo_en_base
+    return catalogo_en_base()
+
+
+def _base():
+    """Identifica la base configurada sin conectarse (DuckDB admite un solo proceso escritor)."""
+    backend, ruta = storage_config()
+    if backend == "duckdb":
+        return f"duckdb:{os.path.abspath(ruta)}"
+    db = config.seccion("connections").get("supabase", {})
+    return f"{backend}:{db.get('host')}:{db.get('port')}/{db.get('database')}"
+
+
+def _puntero(tabla):
+    """Puntero a la versión vigente de `tabla`; None si falta, es de otra base o de otro formato."""
+    try:
+        with open(os.path.join(cache_dir(), f"{tabla}.json")) as fh:
+            puntero = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    return puntero if puntero.get('base') == _base() and puntero.get('formato') == FORMATO else None
+
+
+def _limpiar(tabla):
+    archivos = sorted(glob(os.path.join(cache_dir(), f"{tabla}-*.arrow")), key=os.path.getmtime)
+    for viejo in archivos[:-ARCHIVOS_RETENIDOS]:
+        try:
+            os.remove(viejo)      # un proceso que lo tenga mapeado lo sigue leyendo
+        except OSError:
+            pass
+
+
+def publicar(tabla, df=None):
+    """Publica `tabla` (o `df` con ese nombre) y cambia el puntero. True si publicó."""
+    import pyarrow as pa
+
+    base = cache_dir()
+    if base is None:
+        return False
+    if df is None:
+        df = _leer_base(tabla)
+    if df.columns.empty:      # la base no respondió: se deja la versión publicada
+        return False
+    anterior = _puntero(tabla) or {}
+    archivo = f"{tabla}-{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}.arrow"
+    try:
+        os.makedirs(base, exist_ok=True)
+        with medir(f"compartido: publicar {tabla}", filas_in=len(df)) as m:
+            tbl = pa.Table.from_pandas(df, preserve_index=False)
+            tmp = os.path.join(base, archivo + ".tmp")
+            with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, tbl.schema) as escritor:
+                escritor.write_table(tbl)
+            os.replace(tmp, os.path.join(base, archivo))
+            puntero = {"archivo": archivo, "version": anterior.get("version", 0) + 1, "filas": tbl.num_rows,
+                       "base": _base(), "formato": FORMATO, "publicado": datetime.now().isoformat(timespec='seconds')}
+            tmp = os.path.join(base, f"{tabla}.json.tmp.{uuid.uuid4().hex[:8]}")
+            with open(tmp, "w") as fh:
+                json.dump(puntero, fh)
+            os.replace(tmp, os.path.join(base, f"{tabla}.json"))
+            m['bytes'] = int(tbl.nbytes)
+    except Exception as e:
+        avisos.advertencia(f"⚠️ No se pudo publicar {tabla} en la caché compartida ({e}).")
+        return False
+    _limpiar(tabla)
+    return True
+
+
+def publicar_tablas(*tablas):
+    """Vuelve a publicar `tablas` (todas si no se indican) tras un cambio de datos. No-op si está inactiva."""
+    if not compartida_activa():
+        return {}
+    return {t: publicar(t) for t in (tablas or TABLAS)}
+
+
+def _mapear(tabla):
+    """(archivo, pa.Table mapeada) de la versión vigente, publicándola si falta. None si no está disponible."""
+    import pyarrow as pa
+
+    if not compartida_activa():
+        return None
+    puntero = _puntero(tabla)
+    if puntero is None:
+        if not publicar(tabla):
+            return None
+        puntero = _puntero(tabla)
+    with _lock:
+        mapa = _mapas.get(tabla)
+    if mapa is not None and mapa[0] == puntero['archivo']:
+        return mapa
+    try:
+        with medir(f"compartido: abrir {tabla}") as m:
+            tbl = pa.ipc.open_file(pa.memory_map(os.path.join(cache_dir(), puntero['archivo']), "r")).read_all()
+            m['filas_out'] = tbl.num_rows
+    except (OSError, pa.ArrowInvalid):
+        return None               # se reemplazó mientras tanto: el llamador lee la base
+    mapa = (puntero['archivo'], tbl)
+    with _lock:
+        _mapas[tabla] = mapa
+    return mapa
+
+
+def tabla_arrow(tabla):
+    """pa.Table de la versión vigente, mapeada en memoria sin copia. None si no está disponible."""
+    mapa = _mapear(tabla)
+    return None if mapa is None else mapa[1]
+
+
+def tabla_compartida(tabla):
+    """
+    DataFrame de `tabla` desde la caché compartida, o desde la base si no está
+    activa / disponible. Copia superficial del frame del proceso: valores de sólo lectura.
+    attrs['version'] identifica los datos sin mirarlos: el archivo publicado o,
+    leída de la base, la versión de datos del proceso (sube con cada alta).
+    """
+    mapa = _mapear(tabla)
+    if mapa is None:
+        df = _leer_base(tabla)
+        df.attrs['version'] = f"base:{version_datos()}"
+        return df
+    archivo, tbl = mapa
+    with _lock:
+        frame = _frames.get(tabla)
+    if frame is None or frame[0] != archivo:
+        # split_blocks: las columnas numéricas sin nulos quedan sobre el mapa, sin copiar
+        frame = (archivo, tbl.to_pandas(split_blocks=True))
+        frame[1].attrs['version'] = archivo
+        with _lock:
+            _frames[tabla] = frame
+    return frame[1].copy(deep=False)
+
+
+def recetas():
+    """Recetario completo (SELECT * FROM recetas), compartido si la caché está activa."""
+    return tabla_compartida('recetas')
+
+
+def estado_compartidas():
+    """Por tabla: versión, filas, fecha de publicación y MB del archivo vigente."""
+    if not compartida_activa():
+        return []
+    filas = []
+    for tabla in TABLAS:
+        p = _puntero(tabla) or {}
+        ruta = os.path.join(cache_dir(), p.get('archivo', ''))
+        filas.append({'tabla': tabla, 'version': p.get('version'), 'filas': p.get('filas'),
+                      'publicado': p.get('publicado'),
+                      'MB': round(os.path.getsize(ruta) / 2**20, 2) if os.path.isfile(ruta) else None})
+    return filas
@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+from .perf import medir
+
+
+# ============================================================
+# PROCESADO DE COMPRAS
+# ============================================================
+TASAS_IMP_ADIC = {
+    '271': 0.18,
+    '27':  0.10,
+    '26':  0.21,
+    '25':  0.21,
+    '24':  0.3155,
+    '19':  0.12,
+    '18':  0.05,
+}
+
+# Columnas mínimas que debe traer el archivo fuente
+COLS_REQUERIDAS = [
+    'local', 'fecha_dte', 'rut_proveedor', 'nombre_proveedor',
+    'tipo_dte', 'folio', 'nombre_producto',
+    'cantidad', 'total_item', 'codigo_impuesto', 'iva',
+    'descuento_global', 'recargo_global', 'total',
+    'sku', 'subcat', 'conversion', 'formato', 'categoria_producto',
+]
+
+def _normalizar_columnas(df: pd.DataFrame) -> pd.DataFrame:
+    """Limpia y normaliza los nombres de columna del Excel fuente."""
+    df = df.copy()
+    df.columns = (
+        df.columns
+        .str.strip()
+        .str.lower()
+        .str.replace(r'[\s]+', '_', regex=True)
+        .str.replace(r'[áàä]', 'a', regex=True)
+        .str.replace(r'[éèë]', 'e', regex=True)
+        .str.replace(r'[íìï]', 'i', regex=True)
+        .str.replace(r'[óòö]', 'o', regex=True)
+        .str.replace(r'[úùü]', 'u', regex=True)
+        .str.replace(r'[^a-z0-9_]', '_', regex=True)
+    )
+    # Alias frecuentes
+    aliases = {
+        'categoria_producto': ['categoria_producto', 'categoria producto', 'categoria'],
+        'recargo_global':     ['recargo_global', 'recargo global'],
+        'descuento_global':   ['descuento_global', 'descuento global'],
+        'codigo_impuesto':    ['codigo_impuesto', 'codigo impuesto', 'cod_impuesto'],
+    }
+    for canonical, variants in aliases.items():
+        for v in variants:
+            v_norm = v.replace(' ', '_')
+            if v_norm in df.columns and canonical not in df.columns:
+                df = df.rename(columns={v_norm: canonical})
+    return df
+
+
+def procesar_compras(df_raw: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Recibe el DataFrame crudo del Excel de compras y devuelve
+    (df_procesado, lista_de_advertencias).
+
+    Columnas calculadas:
+        cant_conv       = cantidad × conversion
+        monto_real      = total_item  (negativo si tipo_dte == 61)
+        recargo2        = (Recargo_Global - Descuento_Global) × participación línea en folio
+        total_neto2     = monto_real + recargo2
+        imp_adic        = monto_real × tasa según codigo_impuesto
+        IVA_2           = total_neto2 × 0.19  (0 si IVA del folio == 0)
+        tootal2         = total_neto2 + imp_adic + IVA_2
+        costo_realfinal = tootal2 + despacho_distribuido + ajuste_redondeo  (0 en líneas de despacho)
+        MUC             = costo_realfinal / (cant_conv × formato)
+                          si formato == 1 → MUC = costo_realfinal / cant_conv
+    """
+    warnings = []
+    with medir("compras: normalizar y tipos", filas_in=len(df_raw)):
+        df = _normalizar_columnas(df_raw)
+
+        # ── Verificar columnas mínimas ──────────────────────────────────────────
+        faltantes = [c for c in COLS_REQUERIDAS if c not in df.columns]
+        if faltantes:
+            warnings.append(
+                f"⚠️ Columnas no encontradas tras normalizar nombres: **{', '.join(faltantes)}**\n"
+                f"Columnas recibidas: {', '.join(df.columns.tolist())}"
+            )
+        # Columnas críticas para el cálculo — si faltan el resultado será incorrecto
+        criticas = {
+            'total_item':       'monto_real será 0',
+            'recargo_global':   'recargo2 será 0 (no se distribuye recargo)',
+            'descuento_global': 'descuento no se aplicará',
+            'iva':              'IVA_2 será 0 en todos los folios',
+            'total':            'no se podrá ajustar redondeo ni distribuir despacho',
+            'conversion':       'cant_conv = cantidad (sin conversión)',
+            'formato':          'MUC calculado como por unidad en todos los casos',
+        }
+        for col, impacto in criticas.items():
+            if col not in df.columns:
+                warnings.append(f"🔴 Columna crítica **'{col}'** no encontrada → {impacto}")
+
+        # ── Tipos básicos ────────────────────────────────────────────────────────
+        df['tipo_dte']        = pd.to_numeric(df.get('tipo_dte', 33), errors='coerce').fillna(33).astype(int)
+        df['total_item']      = pd.to_numeric(df.get('total_item', 0), errors='coerce').fillna(0)
+        df['cantidad']        = pd.to_numeric(df.get('cantidad', 1), errors='coerce').fillna(1)
+        df['conversion']      = pd.to_numeric(df.get('conversion', 1), errors='coerce').fillna(1)
+        df['formato']         = pd.to_numeric(df.get('formato', 1), errors='coerce').fillna(1)
+        df['recargo_global']  = pd.to_numeric(df.get('recargo_global', 0), errors='coerce').fillna(0)
+        df['descuento_global']= pd.to_numeric(df.get('descuento_global', 0), errors='coerce').fillna(0)
+        df['iva']             = pd.to_numeric(df.get('iva', 0), errors='coerce').fillna(0)
+        df['total']           = pd.to_numeric(df.get('total', 0), errors='coerce').fillna(0)
+
+    with medir("compras: pasos 1-6 (montos, recargo, impuestos, IVA)", filas_in=len(df)):
+        # ── PASO 1: cant_conv ────────────────────────────────────────────────────
+        df['cant_conv'] = df['cantidad'] * df['conversion']
+
+        # ── PASO 2: monto_real ───────────────────────────────────────────────────
+        df['monto_real'] = np.where(df['tipo_dte'] == 61, -df['total_item'], df['total_item'])
+
+        # ── PASO 3: recargo2  (distribución proporcional por folio) ─────────────
+        # participación = monto_real_línea / suma_monto_real_folio
+        df['_tot_folio'] = df.groupby('folio')['monto_real'].transform('sum')
+        df['_recargo_neto'] = df['recargo_global'] - df['descuento_global']
+        df['_part'] = np.where(df['_tot_folio'] != 0, df['monto_real'] / df['_tot_folio'], 0)
+        df['recargo2'] = df['_part'] * df['_recargo_neto']
+        df['total_neto2'] = df['monto_real'] + df['recargo2']
+
+        # ── PASO 4: imp_adic ─────────────────────────────────────────────────────
+        cod_str = (
+            df.get('codigo_impuesto', pd.Series([''] * len(df)))
+            .fillna('')
+            .astype(str)
+            .str.strip()
+            .str.replace(r'\.0$', '', regex=True)
+            .str.replace(r'^nan$', '', regex=True)
+        )
+        tasa = cod_str.map(TASAS_IMP_ADIC).fillna(0)
+        df['imp_adic'] = df['monto_real'] * tasa
+
+        # ── PASO 5: IVA_2  (por folio: si el folio tiene IVA registrado > 0) ────
+        df['_tiene_iva'] = df.groupby('folio')['iva'].transform('max') != 0
+        df['iva_2'] = np.where(df['_tiene_iva'], df['total_neto2'] * 0.19, 0)
+
+        # ── PASO 6: tootal2 ──────────────────────────────────────────────────────
+        df['tootal2'] = df['total_neto2'] + df['imp_adic'] + df['iva_2']
+
+    with medir("compras: pasos 7-13 (despachos, redondeo, MUC)", filas_in=len(df)) as m:
+        # ── PASO 7: identificar líneas de despacho ───────────────────────────────
+        nombre_lower = df['nombre_producto'].str.lower().fillna('')
+        df['_es_despacho'] = (
+            nombre_lower.str.contains('despacho', na=False) |
+            nombre_lower.str.contains('flete',    na=False) |
+            nombre_lower.str.contains('distribucion', na=False)
+        )
+
+        # ── PASO 8: Desp_Folio = suma(monto_real de líneas despacho) × 1.19 ─────
+        df['_desp_linea'] = np.where(df['_es_despacho'], df['monto_real'] * 1.19, 0)
+        df['_desp_folio'] = df.groupby('folio')['_desp_linea'].transform('sum')
+
+        # ── PASO 9: ajuste redondeo = Total_factura - suma(tootal2) del folio ────
+        df['_suma_tootal2_folio'] = df.groupby('folio')['tootal2'].transform('sum')
+        df['_total_factura']      = df.groupby('folio')['total'].transform('max')
+        df['_diferencia']         = df['_total_factura'] - df['_suma_tootal2_folio']
+
+        # desp+red2 por folio = Desp_Folio + diferencia
+        df['_desp_red2'] = df['_desp_folio'] + df['_diferencia']
+
+        # ── PASO 10: Part_Item (excluye despachos del denominador) ───────────────
+        df['_monto_limpio'] = np.where(df['_es_despacho'], 0, df['monto_real'].abs())
+        df['_tot_limpio_folio'] = df.groupby('folio')['_monto_limpio'].transform('sum')
+        df['_part_item'] = np.where(
+            df['_tot_limpio_folio'] != 0,
+            df['_monto_limpio'] / df['_tot_limpio_folio'],
+            0
+        )
+
+        # ── PASO 11: dist_desp = part_item × desp_red2  (redondeado a entero) ───
+        df['_dist_desp'] = (df['_part_item'] * df['_desp_red2']).round(0)
+
+        # ── PASO 12: costo_realfinal ─────────────────────────────────────────────
+        df['costo_realfinal'] = np.where(
+            df['_es_despacho'],
+            0,
+            df['tootal2'] + df['_dist_desp']
+        )
+
+        # ── PASO 13: MUC ─────────────────────────────────────────────────────────
+        denominador = np.where(
+            df['formato'] == 1,
+            df['cant_conv'],
+            df['cant_conv'] * df['formato']
+        )
+        df['muc'] = np.where(
+            (denominador != 0) & (~df['_es_despacho']),
+            df['costo_realfinal'] / denominador,
+            0
+        )
+
+        # ── Limpiar columnas temporales ──────────────────────────────────────────
+        cols_temp = [c for c in df.columns if c.startswith('_')]
+        df = df.drop(columns=cols_temp)
+        m['filas_out'] = len(df)
+
+    # ── Renombrar IVA_2 para consistencia con BD ─────────────────────────────
+    df = df.rename(columns={'iva_2': 'iva_2'})  # ya en minúsculas
+
+    # ── Advertencias sobre datos ─────────────────────────────────────────────
+    sin_sku = df['sku'].isna().sum() if 'sku' in df.columns else 0
+    if sin_sku > 0:
+        warnings.append(f"⚠️ {sin_sku} líneas sin SKU asignado.")
+    sin_conv = (df['conversion'] == 0).sum()
+    if sin_conv > 0:
+        warnings.append(f"⚠️ {sin_conv} líneas con Conversion = 0.")
+
+    return df, warnings
@@ -0,0 +1,143 @@
+"""
+Informes pesados con varios usuarios a la vez: vuelo único y cupo.
+
+ejecutar_unico(fn, *args) coalesce pedidos idénticos en curso: misma
+función, mismos parámetros y misma versión de datos (version_datos, que
+cambia con cada alta; ver datos_cambiaron). El primero calcula; los que
+llegan mientras tanto esperan ese mismo resultado (cada uno recibe su
+copia y los avisos del cálculo). No guarda resultados una vez terminado.
+
+Antes de calcular, el pedido entra a una cola FIFO con a lo sumo
+limite_informes() cálculos simultáneos en el proceso (MRP_MAX_INFORMES o
+max_informes en [storage]; 2 por defecto). al_esperar(posicion) avisa la
+posición en la cola mientras se espera (0: ya se está calculando el mismo
+informe para otro usuario).
+"""
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, TimeoutError as EsperaAgotada
+
+from . import avisos
+from .db import _storage_secrets
+from .perf import medir
+
+MAX_INFORMES_DEFECTO = 2
+INTERVALO_ESPERA = 1.0   # segundos entre avisos de posición
+
+_lock = threading.Lock()
+_cupo = threading.Condition()
+_cola = deque()          # turnos esperando cupo, en orden de llegada
+_activos = 0
+_en_curso = {}           # clave → (future, turno del que calcula)
+_generacion = 0
+
+
+def limite_informes():
+    valor = os.environ.get("MRP_MAX_INFORMES", _storage_secrets().get("max_informes", MAX_INFORMES_DEFECTO))
+    try:
+        return max(1, int(valor))
+    except (TypeError, ValueError):
+        return MAX_INFORMES_DEFECTO
+
+
+def version_datos():
+    """Versión de los datos del proceso: sube con cada alta (datos_cambiaron)."""
+    return _generacion
+
+
+def datos_cambiaron():
+    global _generacion
+    with _lock:
+        _generacion += 1
+
+
+def clave_pedido(fn, args):
+    return (fn.__module__, fn.__qualname__, tuple(str(a) for a in args), version_datos())
+
+
+def posicion(turno):
+    """Posición (1 = próximo) de `turno` en la cola; 0 si ya tiene cupo o no está."""
+    with _cupo:
+        return _cola.index(turno) + 1 if turno in _cola else 0
+
+
+def _admitir(turno, al_esperar=None):
+    global _activos
+    ultima = None
+    with _cupo:
+        _cola.append(turno)
+        try:
+            while not (_cola[0] is turno and _activos < limite_informes()):
+                pos = _cola.index(turno) + 1
+                if al_esperar is not None and pos != ultima:
+                    ultima = pos
+                    al_esperar(pos)
+                _cupo.wait(INTERVALO_ESPERA)
+        except BaseException:
+            # La sesión se fue (rerun / cierre): liberar el lugar en la cola
+            _cola.remove(turno)
+            _cupo.notify_all()
+            raise
+        _cola.popleft()
+        _activos += 1
+
+
+def _liberar():
+    global _activos
+    with _cupo:
+        _activos -= 1
+        _cupo.notify_all()
+
+
+def _copia(resultado):
+    if isinstance(resultado, tuple):
+        return tuple(_copia(r) for r in resultado)
+    return resultado.copy() if hasattr(resultado, 'copy') else resultado
+
+
+def ejecutar_unico(fn, *args, al_esperar=None):
+    """fn(*args) con vuelo único entre pedidos idénticos y cupo de cálculos simultáneos."""
+    clave = clave_pedido(fn, args)
+    with _lock:
+        vuelo = _en_curso.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = (Future(), object())
+            _en_curso[clave] = vuelo
+    futuro, turno = vuelo
+
+    if not lider:
+        with medir("concurrencia: espera informe en curso"):
+            while True:
+                try:
+                    resultado, capturados = futuro.result(timeout=INTERVALO_ESPERA)
+                    break
+                except EsperaAgotada:
+                    if al_esperar is not None:
+                        al_esperar(posicion(turno))
+                except Exception:
+                    raise
+                except BaseException:
+                    # El que calculaba se fue antes de terminar: se vuelve a pedir
+                    return ejecutar_unico(fn, *args, al_esperar=al_esperar)
+        avisos.reemitir(capturados)
+        return _copia(resultado)
+
+    try:
+        with medir("concurrencia: espera de cupo"):
+            _admitir(turno, al_esperar)
+        try:
+            with avisos.capturar() as capturados:
+                resultado = fn(*args)
+        finally:
+            _liberar()
+        futuro.set_result((resultado, capturados))
+    except BaseException as e:
+        futuro.set_exception(e)
+        raise
+    finally:
+        with _lock:
+            _en_curso.pop(clave, None)
+    avisos.reemitir(capturados)
+    return _copia(resultado)
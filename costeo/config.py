@@ -0,0 +1,36 @@
+"""
+Secretos de la aplicación (conexión, [storage], ...).
+
+La app Streamlit registra st.secrets con usar_secretos(); en modo batch se lee
+el mismo .streamlit/secrets.toml (o el archivo indicado en MRP_SECRETS_FILE).
+"""
+import os
+import tomllib
+
+_secretos = None
+
+
+def usar_secretos(secretos):
+    """Reemplaza la fuente de secretos (cualquier mapping, p. ej. st.secrets)."""
+    global _secretos
+    _secretos = secretos
+
+
+def secretos():
+    global _secretos
+    if _secretos is None:
+        ruta = os.environ.get("MRP_SECRETS_FILE", os.path.join(".streamlit", "secrets.toml"))
+        try:
+            with open(ruta, "rb") as fh:
+                _secretos = tomllib.load(fh)
+        except (OSError, tomllib.TOMLDecodeError):
+            _secretos = {}
+    return _secretos
+
+
+def seccion(nombre):
+    """Sección `nombre` de los secretos como dict ({} si no existe)."""
+    try:
+        return dict(secretos().get(nombre, {}))
+    except Exception:
+        return {}
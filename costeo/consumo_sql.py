@@ -0,0 +1,137 @@
+"""
+Consumo teórico del Informe 2 calculado dentro de la base.
+
+La receta se explota con un CTE recursivo sobre recetas con las mismas reglas
+que informes.consumo_teorico / receta_plana:
+
+    - sin opcionales (es_opcion NULL cuenta como 0)
+    - G / CC / ML → /1000 (um_salida del plato y del procesado)
+    - un PRO- del plato se reemplaza por la receta del procesado:
+          coef = cant_plato × factor / rendimiento_total × cant_base × factor
+      (sin dividir por el rendimiento cuando porcion = 1); rendimiento_total
+      es MAX(rendimiento) si es > 1, si no SUM(cant_real) (0 → 1)
+    - `niveles` PRO- anidados (1, como en Python: un PRO- dentro de un
+      procesado cuenta como ingrediente)
+
+y se cruza con las ventas del período agregadas en la misma consulta: sólo
+viajan los totales por ingrediente. informe_desviacion la usa cuando está
+activado (MRP_CONSUMO_EN_BASE o consumo_en_base en [storage]).
+En Postgres, instalar_funcion_consumo() deja la misma consulta como función
+consumo_teorico_periodo(desde, hasta, local, niveles) para otros clientes.
+"""
+import os
+
+import pandas as pd
+from sqlalchemy import text
+
+from . import avisos
+from .db import _storage_secrets, get_engine, run_query
+from .particiones import anios_archivados
+from .perf import medir
+
+# {desde}, {hasta}, {niveles} y {filtro_local} se completan según dónde corre
+SQL_CONSUMO = """
+    WITH RECURSIVE rec AS (
+        SELECT codigo_venta, sku_ingrediente, nombre_ingrediente, es_procesado,
+               COALESCE(cant_real, 0) AS cant_real, rendimiento, porcion,
+               CASE WHEN UPPER(TRIM(um_salida)) IN ('G', 'CC', 'ML') THEN 0.001 ELSE 1.0 END AS factor_um
+        FROM recetas
+        WHERE COALESCE(es_opcion, 0) = 0
+    ),
+    rend AS (
+        SELECT codigo_venta,
+               CASE WHEN MAX(rendimiento) > 1 THEN MAX(rendimiento)
+                    WHEN SUM(cant_real) = 0 THEN 1
+                    ELSE SUM(cant_real) END AS rendimiento_total,
+               COALESCE(MAX(porcion), 0) AS porcion
+        FROM rec
+        WHERE es_procesado = TRUE
+        GROUP BY 1
+    ),
+    explosion (codigo_venta, sku_ingrediente, nombre_ingrediente, coef, nivel) AS (
+        SELECT codigo_venta, sku_ingrediente, nombre_ingrediente, cant_real * factor_um, 0
+        FROM rec
+        WHERE es_procesado = FALSE
+        UNION ALL
+        SELECT x.codigo_venta, b.sku_ingrediente, b.nombre_ingrediente,
+               CASE WHEN r.porcion = 1 THEN x.coef ELSE x.coef / r.rendimiento_total END
+                   * b.cant_real * b.factor_um,
+               x.nivel + 1
+        FROM explosion x
+        JOIN rend r ON r.codigo_venta = x.sku_ingrediente
+        JOIN rec b ON b.codigo_venta = x.sku_ingrediente AND b.es_procesado = TRUE
+        WHERE x.sku_ingrediente LIKE 'PRO-%' AND x.nivel < {niveles}
+    ),
+    plana AS (
+        SELECT codigo_venta, sku_ingrediente, nombre_ingrediente, coef
+        FROM explosion
+        WHERE sku_ingrediente NOT LIKE 'PRO-%' OR nivel = {niveles}
+    ),
+    vendidas AS (
+        SELECT sku_producto, SUM(cantidad_vendida) AS cant_vendida
+        FROM ventas
+        WHERE fecha_venta BETWEEN {desde} AND {hasta}
+        {filtro_local}
+        GROUP BY 1
+    )
+    SELECT CAST(p.sku_ingrediente AS TEXT) AS sku_ingrediente,
+           CAST(SUM(v.cant_vendida * p.coef) AS DOUBLE PRECISION) AS consumo_teorico,
+           CAST(MIN(p.nombre_ingrediente) AS TEXT) AS nombre_ingrediente
+    FROM vendidas v
+    JOIN plana p ON p.codigo_venta = v.sku_producto
+    GROUP BY 1
+"""
+
+FUNCION_CONSUMO = """
+    CREATE OR REPLACE FUNCTION consumo_teorico_periodo(
+        desde DATE, hasta DATE, p_local TEXT DEFAULT NULL, niveles INTEGER DEFAULT 1
+    )
+    RETURNS TABLE (sku_ingrediente TEXT, consumo_teorico DOUBLE PRECISION, nombre_ingrediente TEXT)
+    LANGUAGE sql STABLE
+    AS $fn$
+    {cuerpo}
+    $fn$
+"""
+
+
+def consumo_en_base():
+    """True si el Informe 2 debe calcular el consumo teórico en la base."""
+    valor = os.environ.get("MRP_CONSUMO_EN_BASE", _storage_secrets().get("consumo_en_base", False))
+    return str(valor).strip().lower() in ("1", "true", "si", "sí", "yes")
+
+
+def toca_archivo(fecha_i, fecha_f):
+    """True si el rango incluye años de ventas archivados (no están en la tabla)."""
+    anios = range(pd.Timestamp(fecha_i).year, pd.Timestamp(fecha_f).year + 1)
+    return any(a in anios for a in anios_archivados('ventas'))
+
+
+def consumo_teorico_sql(fecha_i, fecha_f, local, niveles=1):
+    """(sku_ingrediente, consumo_teorico, nombre_ingrediente) del período, calculado en la base."""
+    filtro_local = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(fecha_i), "f": str(fecha_f), "niveles": int(niveles)}
+    if local != "Todos":
+        params["l"] = local
+    sql = SQL_CONSUMO.format(desde=":i", hasta=":f", niveles=":niveles", filtro_local=filtro_local)
+    with medir("desviación: consumo teórico en la base") as m:
+        df = run_query(sql, params)
+        m['filas_out'] = len(df)
+    if df.empty:
+        return pd.DataFrame(columns=['sku_ingrediente', 'consumo_teorico', 'nombre_ingrediente'])
+    return df
+
+
+def instalar_funcion_consumo():
+    """Crea (o reemplaza) consumo_teorico_periodo en Postgres. False en otros backends o si falla."""
+    engine = get_engine()
+    if engine is None or engine.dialect.name != "postgresql":
+        return False
+    cuerpo = SQL_CONSUMO.format(desde="desde", hasta="hasta", niveles="niveles",
+                                filtro_local="AND (p_local IS NULL OR UPPER(local) = UPPER(p_local))")
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(FUNCION_CONSUMO.format(cuerpo=cuerpo)))
+    except Exception as e:
+        avisos.error(f"Error al crear consumo_teorico_periodo: {e}")
+        return False
+    return True
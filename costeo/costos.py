@@ -0,0 +1,224 @@
+"""
+Costo teórico por plato mantenido en la tabla costo_platos.
+
+El costo de un plato sólo depende del último precio de los SKUs de su receta,
+así que cuando entra una factura basta recalcular los platos que usan alguno
+de sus SKUs. indice_dependencias() arma el índice inverso
+sku_ingrediente → códigos de venta, transitivo a través de los PRO-
+(un insumo de PRO-SALSA alcanza a todos los platos que llevan PRO-SALSA).
+
+    save_recetario  → recalcular_costos()        (tabla completa)
+    save_compras    → recalcular_costos(skus)    (sólo platos afectados)
+    Informe 1       → leer_costos_platos()
+
+El cálculo es el mismo de siempre (calcular_costo_platos delega en
+costo_recetas): directos cant_real × MUC, procesados cant_efic × MUC,
+G/CC/ML → /1000.
+"""
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from .compartido import compartida_activa, recetas, tabla_compartida
+from .db import asegurar_tabla, get_engine, lista_in, run_query
+from .perf import medir
+from .snapshots import version_recetas
+
+ESQUEMA_COSTOS = """
+    CREATE TABLE IF NOT EXISTS costo_platos (
+        sku_producto VARCHAR, costo_unitario_teorico DOUBLE PRECISION, actualizado TIMESTAMP
+    )
+"""
+
+COLS_PRECIOS = ['sku', 'precio_unitario', 'categoria_producto', 'subcat', 'nombre_proveedor']
+
+# Índice inverso por versión de recetario (sólo se guarda el último)
+_indice_cache = {}
+
+
+def factor_um(um):
+    """Factor conversión unidades: G/CC/ML → /1000, resto → 1."""
+    if pd.isna(um): return 1
+    um = str(um).strip().upper()
+    if um in ['G', 'CC', 'ML']: return 1/1000
+    return 1
+
+
+def precios_vigentes(skus=None):
+    """
+    Precio unitario real = monto_real / cant_conv (último registro por SKU).
+    Dos compras del mismo SKU en la misma fecha: gana el precio mayor, así el
+    resultado no depende del plan de la consulta (ni de filtrar por SKUs).
+    Trae también categoria_producto, subcat y nombre_proveedor de esa misma
+    compra (los usa el simulador para acotar escenarios).
+    Con la caché compartida activa se filtra la tabla publicada.
+    """
+    if not compartida_activa():
+        return precios_en_base(skus)
+    df = tabla_compartida('precios')
+    if skus is None:
+        return df
+    return df[df['sku'].isin(list(skus))].reset_index(drop=True)
+
+
+def precios_en_base(skus=None):
+    """precios_vigentes leído de la base (lo que publica costeo.compartido)."""
+    filtro, params = "", {}
+    if skus is not None:
+        skus = list(skus)
+        if not skus:
+            return pd.DataFrame(columns=COLS_PRECIOS)
+        marcas, params = lista_in(skus)
+        filtro = f"AND sku IN ({marcas})"
+    return run_query(f"""
+        SELECT DISTINCT ON (sku) sku,
+               monto_real / NULLIF(cant_conv, 0) as precio_unitario,
+               categoria_producto, subcat, nombre_proveedor
+        FROM compras
+        WHERE cant_conv > 0 {filtro}
+        ORDER BY sku, fecha_dte DESC, precio_unitario DESC NULLS LAST
+    """, params or None)
+
+
+def costo_recetas(df_rec, df_precio):
+    """Costo unitario teórico por codigo_venta → [sku_producto, costo_unitario_teorico]."""
+    df_dir  = df_rec[df_rec['es_procesado'] == False].copy()
+    df_proc = df_rec[df_rec['es_procesado'] == True].copy()
+
+    # ---- DIRECTOS: cant_real × factor_um × precio_unitario ----
+    with medir("costo: directos", filas_in=len(df_dir)) as m:
+        dir_m = pd.merge(df_dir, df_precio, left_on='sku_ingrediente', right_on='sku', how='left')
+        dir_m['cant_real']      = pd.to_numeric(dir_m['cant_real'], errors='coerce').fillna(0)
+        dir_m['precio_unitario']= pd.to_numeric(dir_m['precio_unitario'], errors='coerce').fillna(0)
+        dir_m['factor']         = dir_m['um_salida'].apply(factor_um)
+        dir_m['costo_parcial']  = dir_m['cant_real'] * dir_m['factor'] * dir_m['precio_unitario']
+        costo_dir = dir_m.groupby('codigo_venta')['costo_parcial'].sum().reset_index()
+        m['filas_out'] = len(costo_dir)
+
+    # ---- PROCESADOS: cant_efic × factor_um × precio_unitario ----
+    with medir("costo: procesados", filas_in=len(df_proc)) as m:
+        proc_m = pd.merge(df_proc, df_precio, left_on='sku_ingrediente', right_on='sku', how='left')
+        proc_m['cant_efic']      = pd.to_numeric(proc_m['cant_efic'], errors='coerce').fillna(0)
+        proc_m['precio_unitario']= pd.to_numeric(proc_m['precio_unitario'], errors='coerce').fillna(0)
+        proc_m['factor']         = proc_m['um_salida'].apply(factor_um)
+        proc_m['costo_parcial']  = proc_m['cant_efic'] * proc_m['factor'] * proc_m['precio_unitario']
+        costo_proc = proc_m.groupby('codigo_venta')['costo_parcial'].sum().reset_index()
+        m['filas_out'] = len(costo_proc)
+
+    # ---- Combinar ----
+    partes = [c for c in (costo_dir, costo_proc) if not c.empty]
+    costo_total  = pd.concat(partes, ignore_index=True) if partes else costo_dir
+    costo_platos = costo_total.groupby('codigo_venta')['costo_parcial'].sum().reset_index()
+    costo_platos.columns = ['sku_producto', 'costo_unitario_teorico']
+    return costo_platos
+
+
+# ============================================================
+# ÍNDICE INVERSO SKU → PLATOS
+# ============================================================
+def indice_dependencias(df_rec):
+    """
+    {sku_ingrediente: frozenset(codigos de venta)} con cierre transitivo:
+    si un código (PRO-) es a su vez ingrediente, sus dependientes también
+    cuentan. Tolera ciclos. Se cachea por versión de recetario.
+    """
+    version = version_recetas(df_rec)
+    if version in _indice_cache:
+        return _indice_cache[version]
+
+    directo = {}
+    for sku, cod in df_rec[['sku_ingrediente', 'codigo_venta']].dropna().itertuples(index=False):
+        directo.setdefault(sku, set()).add(cod)
+
+    indice = {}
+    for sku, usos in directo.items():
+        alcanzados, pendientes = set(), list(usos)
+        while pendientes:
+            cod = pendientes.pop()
+            if cod in alcanzados:
+                continue
+            alcanzados.add(cod)
+            pendientes.extend(directo.get(cod, ()))
+        indice[sku] = frozenset(alcanzados)
+
+    _indice_cache.clear()
+    _indice_cache[version] = indice
+    return indice
+
+
+def platos_afectados(skus, df_rec):
+    """Códigos de venta cuyo costo puede cambiar si cambia el precio de `skus`."""
+    indice = indice_dependencias(df_rec)
+    afectados = set()
+    for sku in skus:
+        afectados |= indice.get(sku, frozenset())
+    return afectados
+
+
+# ============================================================
+# TABLA costo_platos
+# ============================================================
+def _engine_costos():
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_COSTOS):
+        return None
+    return engine
+
+
+def recalcular_costos(skus=None):
+    """
+    Recalcula costo_platos: completa si `skus` es None, o sólo los platos que
+    dependen de `skus`. Devuelve la cantidad de platos escritos (None si la
+    base no está disponible).
+    """
+    engine = _engine_costos()
+    if engine is None:
+        return None
+    df_rec = recetas()
+
+    # Sin tabla armada todavía, un recálculo parcial la dejaría incompleta
+    if skus is not None and run_query("SELECT sku_producto FROM costo_platos LIMIT 1").empty:
+        skus = None
+
+    codigos = None
+    if skus is not None:
+        if df_rec.empty:
+            return 0
+        codigos = sorted(platos_afectados(pd.Series(skus).dropna().unique(), df_rec))
+        if not codigos:
+            return 0
+        df_rec = df_rec[df_rec['codigo_venta'].isin(codigos)]
+
+    with medir("costos: recalcular platos", filas_in=len(df_rec)) as m:
+        if df_rec.empty:
+            costos = pd.DataFrame(columns=['sku_producto', 'costo_unitario_teorico'])
+        else:
+            costos = costo_recetas(df_rec, precios_vigentes(
+                None if codigos is None else df_rec['sku_ingrediente'].dropna().unique()))
+        m['filas_out'] = len(costos)
+
+    with engine.begin() as conn:
+        if codigos is None:
+            conn.execute(text("DELETE FROM costo_platos"))
+        else:
+            marcas, params = lista_in(codigos, "c")
+            conn.execute(text(f"DELETE FROM costo_platos WHERE sku_producto IN ({marcas})"), params)
+        if not costos.empty:
+            costos.assign(actualizado=datetime.now()).to_sql('costo_platos', conn, if_exists='append', index=False)
+    return len(costos)
+
+
+def leer_costos_platos():
+    """
+    Costo teórico vigente por plato desde costo_platos (la arma si está vacía).
+    None si la tabla no está disponible: el llamador calcula en vivo.
+    """
+    engine = _engine_costos()
+    if engine is None:
+        return None
+    sql = "SELECT sku_producto, costo_unitario_teorico FROM costo_platos"
+    df = run_query(sql)
+    if df.empty and recalcular_costos():
+        df = run_query(sql)
+    return df
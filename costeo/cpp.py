@@ -0,0 +1,238 @@
+"""
+Costo promedio ponderado (CPP) por SKU y local, mantenido por carga.
+
+    CPP(sku, local, fecha) = Σ monto_real / Σ cant_conv de todas las compras
+                             hasta esa fecha (cant_conv > 0)
+
+Una nota de crédito (tipo_dte 61) trae monto_real negativo y cant_conv
+positiva: descuenta su cantidad junto con su monto, como una devolución
+de la línea (una devolución al mismo precio no mueve el CPP).
+
+cpp_historial guarda una fila por (fecha, local, sku) con compras: lo del
+día (cant, monto) y lo acumulado (cant_acum, monto_acum, cpp). cpp_sku es
+el estado vigente (última fila de cada clave). Como los acumulados suman,
+el CPP de "Todos" los locales y el de un SKU de receta con equivalencias
+salen de sumar cant_acum / monto_acum: una lectura por clave, sin recorrer
+compras.
+
+save_compras → actualizar_cpp(df): sólo los SKUs de la carga, desde la
+fecha más antigua de la carga (una factura atrasada rehace sus días
+siguientes con las filas diarias ya guardadas). La copia desde Supabase y
+python -m costeo cpp lo rearman completo (años archivados desde su Parquet).
+"""
+import pandas as pd
+from sqlalchemy import text
+
+from .db import asegurar_tabla, get_engine, lista_in, run_query
+from .equivalencias import aplicar_equivalencias
+from .particiones import anios_archivados, leer_archivo
+from .perf import medir
+
+COLS_HISTORIAL = ['fecha', 'local', 'sku', 'cant', 'monto', 'cant_acum', 'monto_acum', 'cpp']
+
+ESQUEMA_CPP = [
+    """
+    CREATE TABLE IF NOT EXISTS cpp_historial (
+        fecha DATE, local VARCHAR, sku VARCHAR, cant DOUBLE PRECISION, monto DOUBLE PRECISION,
+        cant_acum DOUBLE PRECISION, monto_acum DOUBLE PRECISION, cpp DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cpp_historial_sku ON cpp_historial (sku, fecha)",
+    """
+    CREATE TABLE IF NOT EXISTS cpp_sku (
+        local VARCHAR, sku VARCHAR, fecha DATE,
+        cant_acum DOUBLE PRECISION, monto_acum DOUBLE PRECISION, cpp DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cpp_sku_sku ON cpp_sku (sku)",
+]
+
+
+def _engine_cpp():
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, *ESQUEMA_CPP):
+        return None
+    return engine
+
+
+def compras_diarias(df):
+    """(fecha, local, sku, cant, monto) del día desde líneas de compras (notas de crédito restan cant)."""
+    cant = pd.to_numeric(df['cant_conv'], errors='coerce')
+    monto = pd.to_numeric(df['monto_real'], errors='coerce')
+    ok = (cant > 0) & monto.notna() & df['sku'].notna()
+    nota = pd.to_numeric(df.get('tipo_dte', pd.Series(index=df.index, dtype=float)), errors='coerce').eq(61)
+    diario = pd.DataFrame({
+        'fecha': pd.to_datetime(df['fecha_dte'], errors='coerce').dt.normalize(),
+        'local': df['local'].astype('string').str.upper().fillna('') if 'local' in df.columns else '',
+        'sku': df['sku'].astype(str),
+        'cant': cant.where(~nota, -cant),
+        'monto': monto,
+    })[ok].dropna(subset=['fecha'])
+    return diario.groupby(['fecha', 'local', 'sku'], as_index=False)[['cant', 'monto']].sum()
+
+
+def _acumular(diario, previo=None):
+    """Acumulados por (local, sku) en orden de fecha, partiendo de `previo` (cant_acum, monto_acum)."""
+    h = diario.sort_values(['local', 'sku', 'fecha'], ignore_index=True)
+    g = h.groupby(['local', 'sku'], sort=False)
+    h['cant_acum'] = g['cant'].cumsum()
+    h['monto_acum'] = g['monto'].cumsum()
+    if previo is not None and not previo.empty:
+        base = h[['local', 'sku']].merge(previo, on=['local', 'sku'], how='left')
+        h['cant_acum'] += base['cant_acum'].fillna(0).to_numpy()
+        h['monto_acum'] += base['monto_acum'].fillna(0).to_numpy()
+    h['cpp'] = h['monto_acum'] / h['cant_acum'].where(h['cant_acum'] > 0)
+    return h[COLS_HISTORIAL]
+
+
+def _estado(historial):
+    """Última fila de cada (local, sku) → filas de cpp_sku."""
+    ult = historial.sort_values('fecha').drop_duplicates(['local', 'sku'], keep='last')
+    return ult[['local', 'sku', 'fecha', 'cant_acum', 'monto_acum', 'cpp']]
+
+
+def reconstruir_cpp():
+    """
+    Rearma cpp_historial y cpp_sku dentro de la base: sumas diarias (los años
+    archivados desde su Parquet), acumulados con una ventana y el estado con
+    DISTINCT ON. Devuelve las filas de historial.
+    """
+    engine = _engine_cpp()
+    if engine is None:
+        return None
+    archivados = sorted(anios_archivados('compras'))
+    excluir, params = "", {}
+    if archivados:
+        marcas, params = lista_in(archivados, "a")
+        excluir = f"AND EXTRACT(YEAR FROM fecha_dte) NOT IN ({marcas})"
+
+    with medir("cpp: reconstruir") as m:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM cpp_historial"))
+            conn.execute(text("DELETE FROM cpp_sku"))
+            for anio in archivados:
+                lotes = [compras_diarias(df) for df in leer_archivo(
+                    'compras', ['local', 'fecha_dte', 'sku', 'tipo_dte', 'cant_conv', 'monto_real'],
+                    f"{anio}-01-01", f"{anio}-12-31")]
+                if lotes:
+                    (pd.concat(lotes).groupby(['fecha', 'local', 'sku'], as_index=False)[['cant', 'monto']].sum()
+                     .to_sql('cpp_historial', conn, if_exists='append', index=False))
+            conn.execute(text(f"""
+                INSERT INTO cpp_historial (fecha, local, sku, cant, monto)
+                SELECT fecha_dte::date, COALESCE(UPPER(local), ''), sku,
+                       SUM(CASE WHEN tipo_dte = 61 THEN -cant_conv ELSE cant_conv END), SUM(monto_real)
+                FROM compras
+                WHERE cant_conv > 0 AND monto_real IS NOT NULL AND sku IS NOT NULL
+                {excluir}
+                GROUP BY 1, 2, 3
+            """), params)
+            conn.execute(text("""
+                UPDATE cpp_historial AS h
+                SET cant_acum = t.cant_acum, monto_acum = t.monto_acum,
+                    cpp = CASE WHEN t.cant_acum > 0 THEN t.monto_acum / t.cant_acum END
+                FROM (
+                    SELECT fecha, local, sku,
+                           SUM(cant) OVER w AS cant_acum, SUM(monto) OVER w AS monto_acum
+                    FROM cpp_historial
+                    WINDOW w AS (PARTITION BY local, sku ORDER BY fecha)
+                ) t
+                WHERE h.fecha = t.fecha AND h.local = t.local AND h.sku = t.sku
+            """))
+            conn.execute(text("""
+                INSERT INTO cpp_sku (local, sku, fecha, cant_acum, monto_acum, cpp)
+                SELECT DISTINCT ON (local, sku) local, sku, fecha, cant_acum, monto_acum, cpp
+                FROM cpp_historial
+                ORDER BY local, sku, fecha DESC
+            """))
+        m['filas_out'] = n = int(run_query("SELECT COUNT(*) AS n FROM cpp_historial")['n'].iat[0])
+    return n
+
+
+def actualizar_cpp(df):
+    """
+    Incorpora una carga de compras: rehace el historial de sus SKUs desde la
+    fecha más antigua de la carga y su estado vigente. Devuelve las filas de
+    historial escritas (None si la base no está disponible).
+    """
+    engine = _engine_cpp()
+    if engine is None or not {'fecha_dte', 'sku', 'cant_conv', 'monto_real'} <= set(df.columns):
+        return None
+    if run_query("SELECT sku FROM cpp_sku LIMIT 1").empty:
+        return reconstruir_cpp()
+    nuevo = compras_diarias(df)
+    if nuevo.empty:
+        return 0
+
+    desde = nuevo['fecha'].min()
+    skus = sorted(nuevo['sku'].unique())
+    marcas, params = lista_in(skus)
+    params["d"] = desde.date()
+    with medir("cpp: actualizar", filas_in=len(nuevo)) as m:
+        # Acumulado justo antes de `desde` y días ya guardados desde `desde` (sólo estos SKUs)
+        previo = run_query(f"""
+            SELECT DISTINCT ON (local, sku) local, sku, fecha, cant_acum, monto_acum
+            FROM cpp_historial
+            WHERE sku IN ({marcas}) AND fecha < :d
+            ORDER BY local, sku, fecha DESC
+        """, params)
+        guardado = run_query(f"""
+            SELECT fecha, local, sku, cant, monto FROM cpp_historial
+            WHERE sku IN ({marcas}) AND fecha >= :d
+        """, params)
+        partes = [nuevo] + ([guardado.assign(fecha=pd.to_datetime(guardado['fecha']))] if not guardado.empty else [])
+        diario = pd.concat(partes, ignore_index=True).groupby(
+            ['fecha', 'local', 'sku'], as_index=False)[['cant', 'monto']].sum()
+        historial = _acumular(diario, previo)
+        estado = _estado(pd.concat([previo.assign(fecha=pd.to_datetime(previo['fecha'])), historial],
+                                   ignore_index=True))
+        estado = estado.assign(cpp=estado['monto_acum'] / estado['cant_acum'].where(estado['cant_acum'] > 0))
+        m['filas_out'] = len(historial)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM cpp_historial WHERE sku IN ({marcas}) AND fecha >= :d"), params)
+        conn.execute(text(f"DELETE FROM cpp_sku WHERE sku IN ({marcas})"), params)
+        historial.to_sql('cpp_historial', conn, if_exists='append', index=False)
+        estado.to_sql('cpp_sku', conn, if_exists='append', index=False)
+    return len(historial)
+
+
+def costo_promedio(fecha=None, local="Todos"):
+    """
+    CPP por SKU de receta (equivalencias aplicadas) → [sku, cpp]. Sin `fecha`,
+    el vigente (cpp_sku); con `fecha`, el acumulado al cierre de ese día.
+    Con "Todos" pondera todos los locales.
+    """
+    vacio = pd.DataFrame(columns=['sku', 'cpp'])
+    engine = _engine_cpp()
+    if engine is None:
+        return vacio
+    if run_query("SELECT sku FROM cpp_sku LIMIT 1").empty and not reconstruir_cpp():
+        return vacio
+    filtro_local = "AND local = UPPER(:l)" if local != "Todos" else ""
+    params = {"l": local} if local != "Todos" else {}
+    if fecha is None:
+        df = run_query(f"SELECT sku, cant_acum, monto_acum FROM cpp_sku WHERE 1 = 1 {filtro_local}", params or None)
+    else:
+        params["f"] = pd.Timestamp(fecha).date()
+        df = run_query(f"""
+            SELECT DISTINCT ON (local, sku) sku, cant_acum, monto_acum
+            FROM cpp_historial
+            WHERE fecha <= :f {filtro_local}
+            ORDER BY local, sku, fecha DESC
+        """, params)
+    if df.empty:
+        return vacio
+    df['sku'] = aplicar_equivalencias(df['sku']).to_numpy()
+    df = df.groupby('sku', as_index=False)[['cant_acum', 'monto_acum']].sum()
+    df['cpp'] = df['monto_acum'] / df['cant_acum'].where(df['cant_acum'] > 0)
+    return df[['sku', 'cpp']]
+
+
+def valorizar_cpp(informe, fecha, local="Todos"):
+    """Informe 2 valorizado a CPP al cierre de `fecha`: agrega cpp y recalcula desviacion_dinero."""
+    if informe.empty:
+        return informe
+    cpp = costo_promedio(fecha, local).set_index('sku')['cpp']
+    informe = informe.assign(cpp=informe['sku_ingrediente'].astype(str).map(cpp).to_numpy())
+    informe['desviacion_dinero'] = informe['desviacion_cant'] * informe['cpp'].fillna(0)
+    return informe.sort_values('desviacion_dinero', ascending=False)
@@ -0,0 +1,220 @@
+import functools
+import os
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from . import avisos, config
+from .perf import _bytes_df, medir, registrar
+
+
+# ============================================================
+# BASE DE DATOS
+# Backend configurable:
+#   "postgres" (por defecto) → Supabase, credenciales en secrets ["connections"]["supabase"]
+#   "duckdb"                 → archivo local embebido, mismo esquema y mismo SQL
+# Se elige con MRP_BACKEND / MRP_DUCKDB_PATH o con la sección [storage] de secrets.toml
+# ============================================================
+DUCKDB_PATH_DEFAULT = "data/mrp_local.duckdb"
+
+# Tablas operativas; el backend local las crea vacías si no existen
+TABLAS_OPERATIVAS = ['compras', 'ventas', 'recetas', 'sku_equivalencias']
+
+ESQUEMA_LOCAL = [
+    """
+    CREATE TABLE IF NOT EXISTS compras (
+        local VARCHAR, fecha_dte TIMESTAMP, rut_proveedor VARCHAR, nombre_proveedor VARCHAR,
+        tipo_dte INTEGER, folio VARCHAR, nombre_producto VARCHAR, sku VARCHAR, subcat VARCHAR,
+        codigo_impuesto VARCHAR, cantidad DOUBLE, conversion DOUBLE, formato DOUBLE,
+        categoria_producto VARCHAR, cant_conv DOUBLE, monto_real DOUBLE, recargo2 DOUBLE,
+        total_neto2 DOUBLE, imp_adic DOUBLE, iva_2 DOUBLE, tootal2 DOUBLE,
+        costo_realfinal DOUBLE, muc DOUBLE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ventas (
+        local VARCHAR, fecha_venta DATE, categoria_menu VARCHAR, nombre_producto VARCHAR,
+        sku_producto VARCHAR, cantidad_vendida DOUBLE, monto_venta_real DOUBLE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS recetas (
+        codigo_venta VARCHAR, nombre_plato VARCHAR, sku_ingrediente VARCHAR,
+        nombre_ingrediente VARCHAR, cant_real DOUBLE, cant_efic DOUBLE, rendimiento DOUBLE,
+        um_salida VARCHAR, es_procesado BOOLEAN, es_opcion DOUBLE, porcion INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS sku_equivalencias (
+        sku_compra VARCHAR PRIMARY KEY, sku_receta VARCHAR, descripcion VARCHAR
+    )
+    """,
+]
+
+
+def _storage_secrets():
+    return config.seccion("storage")
+
+
+def storage_config():
+    """Devuelve (backend, ruta_duckdb). Variables de entorno mandan sobre secrets."""
+    cfg = _storage_secrets()
+    backend = os.environ.get("MRP_BACKEND", cfg.get("backend", "postgres")).strip().lower()
+    ruta    = os.environ.get("MRP_DUCKDB_PATH", cfg.get("duckdb_path", DUCKDB_PATH_DEFAULT))
+    return backend, ruta
+
+
+def _engine_postgres():
+    db = config.seccion("connections")["supabase"]
+    conn_str = (
+        f"postgresql+psycopg2://{db['user']}:{db['password']}"
+        f"@{db['host']}:{db['port']}/{db['database']}?sslmode=require"
+    )
+    return create_engine(
+        conn_str,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        connect_args={"options": "-c statement_timeout=30000"}
+    )
+
+
+def _engine_duckdb(ruta):
+    # Requiere duckdb + duckdb-engine (dialecto SQLAlchemy "duckdb://")
+    if ruta != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    engine = create_engine(f"duckdb:///{ruta}")
+    with engine.connect() as conn:
+        for ddl in ESQUEMA_LOCAL:
+            conn.execute(text(ddl))
+        conn.commit()
+    return engine
+
+
+@functools.cache
+def get_engine():
+    backend, ruta = storage_config()
+    try:
+        if backend == "duckdb":
+            return _engine_duckdb(ruta)
+        if backend != "postgres":
+            raise ValueError(f"backend desconocido '{backend}' (usar 'postgres' o 'duckdb')")
+        return _engine_postgres()
+    except Exception as e:
+        avisos.error(f"❌ Error de conexión: {e}")
+        return None
+
+
+def copiar_postgres_a_local(ruta=None, chunksize=50_000):
+    """
+    Copia las tablas operativas desde Supabase al archivo DuckDB local
+    (reemplaza su contenido). Permite correr los informes sobre una copia
+    de producción sin servidor.
+    """
+    ruta = ruta or storage_config()[1]
+    origen  = _engine_postgres()
+    destino = _engine_duckdb(ruta)
+    copiadas = {}
+    for tabla in TABLAS_OPERATIVAS:
+        with destino.connect() as dst:
+            dst.execute(text(f"DELETE FROM {tabla}"))
+            dst.commit()
+        n = 0
+        for chunk in run_query_stream(f"SELECT * FROM {tabla}", chunksize=chunksize, engine=origen):
+            # Primer bloque recrea la tabla con las columnas de origen; equivalencias
+            # conserva su PRIMARY KEY local (la usa el ON CONFLICT del alta)
+            modo = 'replace' if n == 0 and tabla != 'sku_equivalencias' else 'append'
+            chunk.to_sql(tabla, destino, if_exists=modo, index=False)
+            n += len(chunk)
+        copiadas[tabla] = n
+    origen.dispose()
+    destino.dispose()
+    return copiadas
+
+
+_tablas_ok = set()        # (engine, ddls) ya creados
+_tablas_avisadas = set()  # (engine, ddls) cuyo fallo ya se avisó
+
+
+def asegurar_tabla(engine, *ddls):
+    """
+    Corre los CREATE ... IF NOT EXISTS `ddls` una vez por engine (tablas
+    auxiliares que el núcleo crea al usarlas). False si la base no lo permite;
+    un fallo no se recuerda (pool agotado, timeout): se reintenta en el próximo uso.
+    """
+    clave = (engine, ddls)
+    if clave in _tablas_ok:
+        return True
+    try:
+        with engine.begin() as conn:
+            for ddl in ddls:
+                conn.execute(text(ddl))
+    except Exception as e:
+        if clave not in _tablas_avisadas:
+            _tablas_avisadas.add(clave)
+            avisos.advertencia(f"⚠️ No se pudieron crear tablas auxiliares ({e}); se reintenta en el próximo uso.")
+        return False
+    _tablas_ok.add(clave)
+    return True
+
+
+def lista_in(valores, prefijo="s"):
+    """(marcas, params) para `col IN (marcas)`: ':s0, :s1, ...' y {'s0': v0, ...}."""
+    params = {f"{prefijo}{k}": v for k, v in enumerate(valores)}
+    return ', '.join(f":{p}" for p in params), params
+
+
+def dia_siguiente(fecha):
+    """
+    Cota exclusiva 'AAAA-MM-DD' del día siguiente. Los filtros por día sobre
+    fecha_dte (TIMESTAMP) se escriben `fecha_dte >= :i AND fecha_dte < :fs`
+    en vez de `fecha_dte::date BETWEEN`: sin castear la columna aplican los
+    índices y la poda de particiones.
+    """
+    return (pd.Timestamp(fecha) + pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+def _etiqueta_sql(sql):
+    return "sql: " + " ".join(sql.split())[:70]
+
+
+def run_query(sql, params=None):
+    engine = get_engine()
+    if engine is None:
+        return pd.DataFrame()
+    with medir(_etiqueta_sql(sql)) as m:
+        try:
+            with engine.connect() as conn:
+                df = pd.read_sql(text(sql), conn, params=params or {})
+        except Exception as e:
+            avisos.error(f"Error en consulta: {e}")
+            return pd.DataFrame()
+        m['filas_out'] = len(df)
+        m['bytes'] = _bytes_df(df)
+        return df
+
+
+def run_query_stream(sql, params=None, chunksize=50_000, engine=None):
+    """
+    Variante de run_query para resultados grandes: entrega DataFrames de hasta
+    `chunksize` filas leídos con cursor del lado del servidor (yield_per), de
+    modo que ni psycopg2 ni pandas retienen el resultado completo. La memoria
+    máxima queda acotada por el bloque; quien agrega debe consumirlo bloque a bloque.
+
+    A diferencia de run_query, un error a mitad de lectura se propaga: un
+    resultado parcial no debe confundirse con uno vacío.
+    """
+    engine = engine or get_engine()
+    if engine is None:
+        return
+    t0 = time.perf_counter()
+    filas = bytes_ = 0
+    try:
+        with engine.connect().execution_options(yield_per=chunksize) as conn:
+            for chunk in pd.read_sql(text(sql), conn, params=params or {}, chunksize=chunksize):
+                filas += len(chunk)
+                bytes_ += _bytes_df(chunk)
+                yield chunk
+    finally:
+        registrar(_etiqueta_sql(sql) + " [stream]", (time.perf_counter() - t0) * 1000,
+                  filas_out=filas, bytes=bytes_)
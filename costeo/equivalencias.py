@@ -0,0 +1,262 @@
+"""
+Equivalencias de SKU resueltas de forma transitiva.
+
+sku_equivalencias guarda saltos de un paso (sku_compra → sku_receta); una
+cadena A → B → C se resuelve aquí a A → C y B → C. El cierre se calcula una
+vez por cambio y queda en la tabla sku_equiv_cierre (mismas columnas
+sku_compra / sku_receta, para usarla en un solo LEFT JOIN) y en memoria
+como dict (mapa_equivalencias) para los DataFrames. Cada reconstrucción
+deja una marca nueva en sku_equiv_marca: un proceso vuelve a leer el cierre
+cuando cambia su versión de datos (costeo.concurrencia) o, pasados
+REVALIDAR_SEG, si la marca de la base ya no es la suya (lo cambió otro worker).
+
+Los ciclos (A → B → A) no tienen destino final: sus SKUs conservan la
+equivalencia directa, como antes, y se avisa para corregirlos.
+
+Importación masiva (Excel / CSV): validar_equivalencias revisa todas las
+filas de una vez contra lo ya guardado y importar_equivalencias hace el
+upsert en una sola transacción, con INSERT de varias filas por sentencia.
+"""
+import time
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from . import avisos
+from .concurrencia import datos_cambiaron, version_datos
+from .db import asegurar_tabla, get_engine, run_query
+from .perf import medir
+
+ESQUEMA_CIERRE = """
+    CREATE TABLE IF NOT EXISTS sku_equiv_cierre (
+        sku_compra VARCHAR, sku_receta VARCHAR, saltos INTEGER
+    )
+"""
+
+ESQUEMA_MARCA = """
+    CREATE TABLE IF NOT EXISTS sku_equiv_marca (
+        marca VARCHAR, actualizado TIMESTAMP
+    )
+"""
+
+COLS_EQUIVALENCIAS = ['sku_compra', 'sku_receta', 'descripcion']
+
+# Filas por sentencia en la importación masiva
+FILAS_POR_INSERT = 500
+
+# Segundos que se usa el cierre en memoria sin comparar la marca de la base
+REVALIDAR_SEG = 10
+
+# Cierre en memoria por base (URL del engine): (versión de datos, verificado, marca, mapa)
+_mapa_cache = {}
+
+
+def cierre(df_equiv):
+    """
+    (df_cierre, ciclos): df_cierre con sku_compra, sku_receta (destino final)
+    y saltos; ciclos es la lista de ciclos encontrados (listas de SKUs).
+    """
+    directo = dict(zip(df_equiv['sku_compra'], df_equiv['sku_receta']))
+    filas, ciclos, vistos_ciclo = [], [], set()
+    for sku, destino in directo.items():
+        camino, visto = [sku], {sku}
+        while destino in directo and destino not in visto:
+            camino.append(destino)
+            visto.add(destino)
+            destino = directo[destino]
+        if destino in visto:
+            # Cadena que entra en un ciclo: queda el salto directo
+            ciclo = camino[camino.index(destino):]
+            if len(ciclo) > 1 and frozenset(ciclo) not in vistos_ciclo:
+                vistos_ciclo.add(frozenset(ciclo))
+                ciclos.append(ciclo)
+            filas.append((sku, directo[sku], 1))
+        else:
+            filas.append((sku, destino, len(camino)))
+    return pd.DataFrame(filas, columns=['sku_compra', 'sku_receta', 'saltos']), ciclos
+
+
+def reconstruir_cierre():
+    """Recalcula el cierre desde sku_equivalencias, lo persiste y lo deja en memoria."""
+    engine = get_engine()
+    if engine is None:
+        return None
+    df_cierre, ciclos = cierre(run_query("SELECT sku_compra, sku_receta FROM sku_equivalencias"))
+    for ciclo in ciclos:
+        avisos.advertencia(f"⚠️ Equivalencias en ciclo: {' → '.join(ciclo + ciclo[:1])} — se usa el salto directo.")
+    marca = None
+    if asegurar_tabla(engine, ESQUEMA_CIERRE, ESQUEMA_MARCA):
+        marca = uuid.uuid4().hex
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM sku_equiv_cierre"))
+            if not df_cierre.empty:
+                df_cierre.to_sql('sku_equiv_cierre', conn, if_exists='append', index=False)
+            conn.execute(text("DELETE FROM sku_equiv_marca"))
+            conn.execute(text("INSERT INTO sku_equiv_marca (marca, actualizado) VALUES (:m, :a)"),
+                         {"m": marca, "a": datetime.now()})
+    datos_cambiaron()
+    _mapa_cache[str(engine.url)] = (version_datos(), time.monotonic(), marca,
+                                    dict(zip(df_cierre['sku_compra'], df_cierre['sku_receta'])))
+    return df_cierre
+
+
+def _marca_en_base():
+    df = run_query("SELECT marca FROM sku_equiv_marca")
+    return None if df.empty else df['marca'].iat[0]
+
+
+def mapa_equivalencias():
+    """{sku_compra: sku_receta final}; se lee una vez y se reutiliza hasta que cambia (aquí u otro proceso)."""
+    engine = get_engine()
+    if engine is None:
+        return {}
+    clave = str(engine.url)
+    entrada = _mapa_cache.get(clave)
+    if entrada is not None and entrada[0] == version_datos() and time.monotonic() - entrada[1] < REVALIDAR_SEG:
+        return entrada[3]
+    tabla_ok = asegurar_tabla(engine, ESQUEMA_CIERRE, ESQUEMA_MARCA)
+    marca = _marca_en_base() if tabla_ok else None
+    if entrada is not None and entrada[2] == marca:
+        _mapa_cache[clave] = (version_datos(), time.monotonic(), marca, entrada[3])
+        return entrada[3]
+    df = run_query("SELECT sku_compra, sku_receta FROM sku_equiv_cierre") if tabla_ok else pd.DataFrame()
+    if df.empty and marca is None:
+        reconstruir_cierre()          # nunca armado (un cierre vacío con marca es válido)
+    else:
+        _mapa_cache[clave] = (version_datos(), time.monotonic(), marca,
+                              dict(zip(df['sku_compra'], df['sku_receta'])))
+    return _mapa_cache[clave][3] if clave in _mapa_cache else {}
+
+
+def tabla_equivalencias():
+    """Tabla para el LEFT JOIN de equivalencias: el cierre si está disponible."""
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_CIERRE, ESQUEMA_MARCA):
+        return "sku_equivalencias"
+    mapa_equivalencias()
+    return "sku_equiv_cierre"
+
+
+def aplicar_equivalencias(skus):
+    """Serie de SKUs de compra → SKU de receta final (los sin equivalencia quedan igual)."""
+    skus = pd.Series(skus)
+    return skus.map(mapa_equivalencias()).fillna(skus)
+
+
+def guardar_equivalencia(sku_compra, sku_receta, descripcion=""):
+    engine = get_engine()
+    if engine is None:
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(
+                "INSERT INTO sku_equivalencias (sku_compra, sku_receta, descripcion) "
+                "VALUES (:c, :r, :d) "
+                "ON CONFLICT (sku_compra) DO UPDATE SET sku_receta = :r, descripcion = :d"
+            ), {"c": sku_compra, "r": sku_receta, "d": descripcion})
+    except Exception as e:
+        avisos.error(f"Error: {e}")
+        return False
+    reconstruir_cierre()
+    return True
+
+
+def eliminar_equivalencia(sku_compra):
+    engine = get_engine()
+    if engine is None:
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM sku_equivalencias WHERE sku_compra = :c"), {"c": sku_compra})
+    except Exception as e:
+        avisos.error(f"Error: {e}")
+        return False
+    reconstruir_cierre()
+    return True
+
+
+# ============================================================
+# IMPORTACIÓN MASIVA
+# ============================================================
+def validar_equivalencias(df):
+    """
+    Revisa un archivo de equivalencias (columnas sku_compra, sku_receta y
+    opcionalmente descripcion) → (df_ok, problemas). df_ok trae la columna
+    accion ('nueva', 'reemplaza' o 'sin cambios'); problemas lista las filas
+    rechazadas con su motivo: SKU vacío, origen = destino, origen repetido
+    con destinos distintos o equivalencia que cierra un ciclo.
+    """
+    df = df.copy()
+    df.columns = df.columns.astype(str).str.strip().str.lower().str.replace(r'\s+', '_', regex=True)
+    faltan = [c for c in COLS_EQUIVALENCIAS[:2] if c not in df.columns]
+    if faltan:
+        raise ValueError(f"faltan columnas: {', '.join(faltan)}")
+    if 'descripcion' not in df.columns:
+        df['descripcion'] = ""
+    df = df[COLS_EQUIVALENCIAS].astype('string').apply(lambda c: c.str.strip())
+    df['descripcion'] = df['descripcion'].fillna("")
+    df = df.drop_duplicates(['sku_compra', 'sku_receta'])
+
+    motivo = pd.Series(None, index=df.index, dtype=object)
+
+    def marcar(cond, texto):
+        motivo.mask(motivo.isna() & cond.fillna(False).astype(bool), texto, inplace=True)
+
+    marcar(df['sku_compra'].fillna("").eq("") | df['sku_receta'].fillna("").eq(""), "SKU vacío")
+    marcar(df['sku_compra'] == df['sku_receta'], "origen = destino")
+    marcar(df['sku_compra'].duplicated(keep=False), "origen repetido con destinos distintos")
+
+    # Ciclos: cierre de lo guardado más las filas válidas del archivo
+    guardadas = run_query("SELECT sku_compra, sku_receta FROM sku_equivalencias")
+    if guardadas.empty:
+        guardadas = pd.DataFrame(columns=['sku_compra', 'sku_receta'])
+    validas = df.loc[motivo.isna(), ['sku_compra', 'sku_receta']]
+    previas = guardadas[~guardadas['sku_compra'].isin(validas['sku_compra'])]
+    union = pd.concat([previas, validas], ignore_index=True) if not previas.empty else validas
+    en_ciclo = {sku: ciclo for ciclo in cierre(union)[1] for sku in ciclo}
+    ciclo = df['sku_compra'].map(lambda s: ' → '.join(en_ciclo[s] + en_ciclo[s][:1]) if s in en_ciclo else None)
+    motivo = motivo.fillna(("ciclo: " + ciclo.dropna()).reindex(df.index))
+
+    problemas = df[motivo.notna()].assign(motivo=motivo[motivo.notna()])
+    ok = df[motivo.isna()]
+    actual = ok['sku_compra'].map(dict(zip(guardadas['sku_compra'], guardadas['sku_receta'])))
+    cambia = (actual != ok['sku_receta']).fillna(True).to_numpy(dtype=bool)
+    ok = ok.assign(accion=np.select([actual.isna().to_numpy(), cambia], ['nueva', 'reemplaza'], 'sin cambios'),
+                   sku_receta_actual=actual)
+    return ok.reset_index(drop=True), problemas.reset_index(drop=True)
+
+
+def importar_equivalencias(df_ok):
+    """
+    Upsert de las filas validadas en una transacción (INSERT ... ON CONFLICT
+    de hasta FILAS_POR_INSERT filas por sentencia) y un solo recálculo del
+    cierre. Devuelve las filas escritas, o None si falló.
+    """
+    engine = get_engine()
+    if engine is None:
+        return None
+    filas = df_ok[df_ok['accion'] != 'sin cambios'] if 'accion' in df_ok.columns else df_ok
+    registros = filas[COLS_EQUIVALENCIAS].to_dict('records')
+    if not registros:
+        return 0
+    try:
+        with medir("equivalencias: importar", filas_in=len(registros)), engine.begin() as conn:
+            for i in range(0, len(registros), FILAS_POR_INSERT):
+                lote = registros[i:i + FILAS_POR_INSERT]
+                valores = ', '.join(f"(:c{k}, :r{k}, :d{k})" for k in range(len(lote)))
+                params = {}
+                for k, r in enumerate(lote):
+                    params.update({f"c{k}": r['sku_compra'], f"r{k}": r['sku_receta'], f"d{k}": r['descripcion']})
+                conn.execute(text(
+                    f"INSERT INTO sku_equivalencias (sku_compra, sku_receta, descripcion) VALUES {valores} "
+                    "ON CONFLICT (sku_compra) DO UPDATE "
+                    "SET sku_receta = EXCLUDED.sku_receta, descripcion = EXCLUDED.descripcion"
+                ), params)
+    except Exception as e:
+        avisos.error(f"Error al importar equivalencias: {e}")
+        return None
+    reconstruir_cierre()
+    return len(registros)
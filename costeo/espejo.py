@@ -0,0 +1,234 @@
+import json
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from . import avisos
+from .db import _storage_secrets, dia_siguiente, get_engine, run_query_stream
+from .perf import medir
+
+
+# ============================================================
+# ESPEJO PARQUET (lecturas analíticas)
+# Copia local de compras/ventas particionada por mes y local (hive:
+# <dir>/<tabla>/mes=YYYY-MM/local_p=LOCAL/part-*.parquet). Se alimenta con
+# cada save_compras/save_ventas; los informes la leen con poda de columnas
+# y particiones. Se activa con MRP_PARQUET_DIR o [storage] parquet_dir, y
+# sólo se usa una vez reconstruida completa desde la base.
+# ============================================================
+COLS_ESPEJO = {
+    'compras': [
+        'local', 'fecha_dte', 'rut_proveedor', 'nombre_proveedor', 'tipo_dte',
+        'folio', 'nombre_producto', 'sku', 'subcat', 'codigo_impuesto',
+        'cantidad', 'conversion', 'formato', 'categoria_producto',
+        'cant_conv', 'monto_real', 'recargo2', 'total_neto2',
+        'imp_adic', 'iva_2', 'tootal2', 'costo_realfinal', 'muc'
+    ],
+    'ventas': [
+        'local', 'fecha_venta', 'categoria_menu', 'nombre_producto',
+        'sku_producto', 'cantidad_vendida', 'monto_venta_real'
+    ],
+}
+FORMATO_ESPEJO = 2       # sube cuando cambia la clave de partición: los espejos viejos se ignoran
+FECHA_ESPEJO = {'compras': 'fecha_dte', 'ventas': 'fecha_venta'}
+NUM_ESPEJO = {
+    'compras': ['tipo_dte', 'cantidad', 'conversion', 'formato', 'cant_conv', 'monto_real',
+                'recargo2', 'total_neto2', 'imp_adic', 'iva_2', 'tootal2', 'costo_realfinal', 'muc'],
+    'ventas':  ['cantidad_vendida', 'monto_venta_real'],
+}
+
+
+def espejo_dir():
+    return os.environ.get("MRP_PARQUET_DIR", _storage_secrets().get("parquet_dir", "")) or None
+
+
+def estado_espejo(tabla):
+    base = espejo_dir()
+    if not base:
+        return {}
+    try:
+        with open(os.path.join(base, tabla, "_estado.json")) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_estado_espejo(tabla, **cambios):
+    estado = estado_espejo(tabla)
+    estado.update(cambios, actualizado=datetime.now().isoformat(timespec='seconds'))
+    ruta = os.path.join(espejo_dir(), tabla)
+    os.makedirs(ruta, exist_ok=True)
+    tmp = os.path.join(ruta, "_estado.json.tmp")
+    with open(tmp, "w") as fh:
+        json.dump(estado, fh)
+    os.replace(tmp, os.path.join(ruta, "_estado.json"))
+
+
+def espejo_activo(tabla):
+    estado = estado_espejo(tabla)
+    return bool(estado.get("inicializado")) and estado.get("formato") == FORMATO_ESPEJO
+
+
+def _tabla_espejo(df, tabla):
+    """Normaliza tipos (esquema fijo entre lotes) y agrega las claves de partición."""
+    import pyarrow as pa
+
+    cols = COLS_ESPEJO[tabla]
+    out = df.reindex(columns=cols).copy()
+    fecha = FECHA_ESPEJO[tabla]
+    out[fecha] = pd.to_datetime(out[fecha], errors='coerce')
+    out = out.dropna(subset=[fecha])
+    for c in cols:
+        if c in NUM_ESPEJO[tabla]:
+            out[c] = pd.to_numeric(out[c], errors='coerce').astype('float64')
+        elif c != fecha:
+            out[c] = out[c].astype('string')
+    if tabla == 'ventas':
+        out[fecha] = out[fecha].dt.date
+    out['mes'] = pd.to_datetime(out[fecha]).dt.strftime('%Y-%m')
+    # Misma normalización que los filtros SQL: UPPER(local) = UPPER(:l)
+    out['local_p'] = out['local'].fillna('').str.upper()
+    return pa.Table.from_pandas(out, preserve_index=False)
+
+
+def _particionado():
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+    return pads.partitioning(pa.schema([("mes", pa.string()), ("local_p", pa.string())]), flavor="hive")
+
+
+def _escribir_espejo(df, tabla):
+    import pyarrow.dataset as pads
+    import uuid
+
+    if df.empty:
+        return 0
+    tbl = _tabla_espejo(df, tabla)
+    lote = f"{datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+    pads.write_dataset(
+        tbl, os.path.join(espejo_dir(), tabla), format="parquet",
+        partitioning=_particionado(),
+        basename_template=f"part-{lote}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return tbl.num_rows
+
+
+def sync_espejo(tabla, df):
+    """Agrega al espejo el lote recién guardado en la base (no-op si el espejo no está activo)."""
+    if not espejo_activo(tabla):
+        return
+    try:
+        n = _escribir_espejo(df, tabla)
+        _guardar_estado_espejo(tabla, filas=estado_espejo(tabla).get("filas", 0) + n)
+    except Exception as e:
+        # La base manda: un espejo desfasado se invalida y los informes vuelven a SQL
+        _guardar_estado_espejo(tabla, inicializado=False)
+        avisos.advertencia(f"⚠️ Espejo Parquet de {tabla} desactivado ({e}). Reconstrúyelo desde Gestión de Datos.")
+
+
+def reconstruir_espejo(tabla, chunksize=100_000):
+    """Reescribe el espejo completo de `tabla` leyendo la base por bloques."""
+    import shutil
+
+    engine = get_engine()
+    if engine is None:
+        return 0
+    ruta = os.path.join(espejo_dir(), tabla)
+    shutil.rmtree(ruta, ignore_errors=True)
+    _guardar_estado_espejo(tabla, inicializado=False, filas=0)
+    n = 0
+    for chunk in run_query_stream(f"SELECT * FROM {tabla}", chunksize=chunksize, engine=engine):
+        n += _escribir_espejo(chunk, tabla)
+    _guardar_estado_espejo(tabla, inicializado=True, filas=n, formato=FORMATO_ESPEJO)
+    return n
+
+
+def resincronizar_espejo(tabla, fecha_i, fecha_f, chunksize=100_000):
+    """
+    Rehace desde la base los meses de `tabla` entre fecha_i y fecha_f (tras
+    archivar o restaurar un año). No-op si el espejo no está activo.
+    """
+    import shutil
+
+    import pyarrow.dataset as pads
+
+    if not espejo_activo(tabla):
+        return
+    fecha = FECHA_ESPEJO[tabla]
+    ruta = os.path.join(espejo_dir(), tabla)
+    try:
+        with medir(f"parquet: resincronizar {tabla} {fecha_i}..{fecha_f}") as m:
+            quitadas = 0
+            for mes in pd.period_range(fecha_i, fecha_f, freq='M').strftime('%Y-%m'):
+                dir_mes = os.path.join(ruta, f"mes={mes}")
+                if os.path.isdir(dir_mes):
+                    quitadas += pads.dataset(dir_mes, format="parquet").count_rows()
+                    shutil.rmtree(dir_mes)
+            n = 0
+            for chunk in run_query_stream(f"SELECT * FROM {tabla} WHERE {fecha} >= :i AND {fecha} < :fs",
+                                          {"i": str(fecha_i), "fs": dia_siguiente(fecha_f)}, chunksize=chunksize):
+                n += _escribir_espejo(chunk, tabla)
+            m['filas_out'] = n
+        _guardar_estado_espejo(tabla, filas=estado_espejo(tabla).get("filas", 0) - quitadas + n)
+    except Exception as e:
+        _guardar_estado_espejo(tabla, inicializado=False)
+        avisos.advertencia(f"⚠️ Espejo Parquet de {tabla} desactivado ({e}). Reconstrúyelo desde Gestión de Datos.")
+
+
+def _dataset_filtrado(tabla, fecha_i, fecha_f, local, filtro):
+    """Dataset del espejo y expresión de poda (mes/local por partición, fecha por fila)."""
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+
+    ds = pads.dataset(os.path.join(espejo_dir(), tabla), format="parquet",
+                      partitioning=_particionado(), exclude_invalid_files=True)
+    fecha = FECHA_ESPEJO[tabla]
+    expr = None
+
+    def _and(a, b):
+        return b if a is None else a & b
+
+    if fecha_i is not None:
+        fi = pd.Timestamp(fecha_i)
+        expr = _and(expr, pads.field("mes") >= fi.strftime('%Y-%m'))
+        lim = fi.date() if tabla == 'ventas' else fi.to_pydatetime()
+        expr = _and(expr, pads.field(fecha) >= pa.scalar(lim))
+    if fecha_f is not None:
+        ff = pd.Timestamp(fecha_f)
+        expr = _and(expr, pads.field("mes") <= ff.strftime('%Y-%m'))
+        if tabla == 'ventas':
+            expr = _and(expr, pads.field(fecha) <= pa.scalar(ff.date()))
+        else:
+            # fecha_dte::date <= f  ≡  fecha_dte < f + 1 día
+            expr = _and(expr, pads.field(fecha) < pa.scalar((ff + pd.Timedelta(days=1)).to_pydatetime()))
+    if local != "Todos":
+        expr = _and(expr, pads.field("local_p") == str(local).upper())
+    if filtro is not None:
+        expr = _and(expr, filtro)
+    return ds, expr
+
+
+def leer_espejo(tabla, columnas, fecha_i=None, fecha_f=None, local="Todos", filtro=None):
+    """
+    Lee el espejo con poda: sólo `columnas`, sólo las particiones de mes/local
+    que cubren el rango, y filtro de fecha por fila equivalente al BETWEEN del SQL.
+    `filtro` permite añadir una expresión pyarrow adicional (p.ej. subcat).
+    """
+    ds, expr = _dataset_filtrado(tabla, fecha_i, fecha_f, local, filtro)
+    with medir(f"parquet: {tabla} {columnas}") as m:
+        tbl = ds.to_table(columns=columnas, filter=expr)
+        m['bytes'] = int(tbl.nbytes)
+        df = tbl.to_pandas()
+        m['filas_out'] = len(df)
+    return df
+
+
+def leer_espejo_lotes(tabla, columnas, fecha_i=None, fecha_f=None, local="Todos", filtro=None,
+                      filas_lote=100_000):
+    """Como leer_espejo, pero entrega DataFrames de hasta `filas_lote` filas (memoria acotada)."""
+    ds, expr = _dataset_filtrado(tabla, fecha_i, fecha_f, local, filtro)
+    for lote in ds.to_batches(columns=columnas, filter=expr, batch_size=filas_lote):
+        if lote.num_rows:
+            yield lote.to_pandas()
@@ -0,0 +1,541 @@
+import numpy as np
+import pandas as pd
+
+from . import avisos, snapshots
+from .costos import costo_recetas, factor_um, leer_costos_platos, precios_vigentes
+from .db import dia_siguiente, get_engine, run_query
+from .catalogo import catalogo
+from .compartido import recetas
+from .consumo_sql import consumo_en_base, consumo_teorico_sql, toca_archivo
+from .equivalencias import aplicar_equivalencias, mapa_equivalencias, tabla_equivalencias
+from .espejo import espejo_activo, leer_espejo, leer_espejo_lotes
+from .perf import medir
+
+
+# ============================================================
+# CÁLCULO DE COSTO TEÓRICO POR PLATO (Informe 1)
+# Directos: CantReal × MUC
+# Procesados: CantEfic × MUC  (usando último precio por SKU)
+# ============================================================
+def calcular_costo_platos(engine, fecha_i, fecha_f, local):
+    """
+    Devuelve DataFrame con costo teórico por código de venta (plato).
+    Precio unitario = monto_real / cant_conv (último registro por SKU).
+    Aplica factor_um para convertir unidades del recetario a unidades de compra.
+    """
+    df_precio = precios_vigentes()
+    if df_precio.empty:
+        return pd.DataFrame()
+
+    # Recetario completo
+    df_rec = recetas()
+    if df_rec.empty:
+        return pd.DataFrame()
+    return costo_recetas(df_rec, df_precio)
+
+
+# ============================================================
+# INFORME 1: RENTABILIDAD POR PRODUCTO / CATEGORÍA
+# ============================================================
+def _ventas_rentabilidad(fecha_i, fecha_f, local):
+    filtro_local_r = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(fecha_i), "f": str(fecha_f)}
+    if local != "Todos":
+        params["l"] = local
+
+    q_v = f"""
+        SELECT sku_producto, nombre_producto, categoria_menu,
+               SUM(cantidad_vendida) as cant,
+               SUM(monto_venta_real) as venta
+        FROM ventas
+        WHERE fecha_venta BETWEEN :i AND :f
+        {filtro_local_r}
+        GROUP BY 1, 2, 3
+    """
+
+    if espejo_activo('ventas'):
+        df_v = leer_espejo('ventas', ['sku_producto', 'nombre_producto', 'categoria_menu',
+                                      'cantidad_vendida', 'monto_venta_real'], fecha_i, fecha_f, local)
+        df_v = (df_v.groupby(['sku_producto', 'nombre_producto', 'categoria_menu'], dropna=False)
+                [['cantidad_vendida', 'monto_venta_real']].sum(min_count=1).reset_index()
+                .rename(columns={'cantidad_vendida': 'cant', 'monto_venta_real': 'venta'}))
+    else:
+        df_v = run_query(q_v, params)
+    return df_v
+
+
+def ventas_por_plato(fecha_i, fecha_f, local):
+    """Ventas del período por plato (cant, venta): meses cerrados desde snapshot + tramos en vivo."""
+    meses_snap, tramos = snapshots.plan_periodo(fecha_i, fecha_f, 'ventas')
+    if not meses_snap:
+        return _ventas_rentabilidad(fecha_i, fecha_f, local)
+    partes = [snapshots.leer_ventas(meses_snap, local)]
+    partes += [_ventas_rentabilidad(fi, ff, local) for fi, ff in tramos]
+    return snapshots.sumar(partes, ['sku_producto', 'nombre_producto', 'categoria_menu'], ['cant', 'venta'])
+
+
+def informe_rentabilidad(fecha_i, fecha_f, local):
+    engine = get_engine()
+    if engine is None:
+        return pd.DataFrame()
+
+    df_v = ventas_por_plato(fecha_i, fecha_f, local)
+    if df_v.empty:
+        avisos.advertencia("No hay ventas para el período/local seleccionado.")
+        return pd.DataFrame()
+
+    # Tabla costo_platos mantenida por save_compras / save_recetario; en vivo si no está
+    with medir("costo teórico por plato") as m:
+        costo_platos = leer_costos_platos()
+        if costo_platos is None:
+            costo_platos = calcular_costo_platos(engine, fecha_i, fecha_f, local)
+        m['filas_out'] = len(costo_platos)
+    if costo_platos.empty:
+        avisos.advertencia("No se pudo calcular el costo teórico. Verifica recetario y MUC en compras.")
+        return pd.DataFrame()
+
+    with medir("rentabilidad: merge y margen", filas_in=len(df_v)) as m:
+        df = pd.merge(df_v, costo_platos, on='sku_producto', how='left')
+        df['costo_unitario_teorico'] = df['costo_unitario_teorico'].fillna(0)
+        df['costo_total'] = df['cant'] * df['costo_unitario_teorico']
+        df['venta'] = df['venta'].fillna(0)
+        df['rentabilidad'] = df['venta'] - df['costo_total']
+        df['margen_pct'] = df.apply(
+            lambda x: (x['rentabilidad'] / x['venta'] * 100) if x['venta'] > 0 else 0, axis=1)
+        m['filas_out'] = len(df)
+
+    return df.sort_values('venta', ascending=False)
+
+
+# ============================================================
+# INFORME 2: DESVIACIÓN REAL VS TEÓRICO
+# ============================================================
+def _compras_directo_espejo(fecha_i, fecha_f, local):
+    """
+    Equivalente sobre el espejo Parquet de la consulta de compras 'Directo' de Informe 2.
+    Agrega lote a lote (el histórico completo puede no caber en memoria).
+    """
+    import pyarrow.dataset as pads
+
+    partes = []
+    with medir("parquet: compras directo por lotes") as m:
+        for lote in leer_espejo_lotes('compras', ['sku', 'cant_conv', 'muc'], fecha_i, fecha_f, local,
+                                      filtro=pads.field('subcat') == 'Directo'):
+            partes.append(lote.groupby('sku', dropna=False).agg(
+                cant_conv=('cant_conv', 'sum'),
+                suma_muc=('muc', 'sum'),
+                n_muc=('muc', 'count')
+            ).reset_index())
+        m['filas_out'] = sum(len(p) for p in partes)
+    return _compras_directo_combinadas(partes)
+
+
+def _compras_directo_sumas(fecha_i, fecha_f, local):
+    """Compras 'Directo' por SKU de compra con SUM(muc) y COUNT(muc), combinables entre tramos."""
+    filtro_local = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(fecha_i), "fs": dia_siguiente(fecha_f)}
+    if local != "Todos":
+        params["l"] = local
+    return run_query(f"""
+        SELECT sku, SUM(cant_conv) AS cant_conv, SUM(muc) AS suma_muc, COUNT(muc) AS n_muc
+        FROM compras
+        WHERE fecha_dte >= :i AND fecha_dte < :fs
+          AND subcat = 'Directo'
+        {filtro_local}
+        GROUP BY 1
+    """, params)
+
+
+def _compras_directo_combinadas(partes):
+    """Aplica equivalencias a sumas por SKU de compra y arma cant_real_comprada / muc_promedio."""
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    df['sku'] = aplicar_equivalencias(df['sku']).to_numpy()
+    df = df.groupby('sku', dropna=False)[['cant_conv', 'suma_muc', 'n_muc']].sum(min_count=1).reset_index()
+    # AVG(muc) = SUM(muc) / COUNT(muc), exacto al combinar meses
+    df['muc_promedio'] = df['suma_muc'] / df['n_muc'].where(df['n_muc'] > 0)
+    return df.rename(columns={'cant_conv': 'cant_real_comprada'})[['sku', 'cant_real_comprada', 'muc_promedio']]
+
+
+def _ventas_desviacion(fecha_i, fecha_f, local):
+    # Ventas del período — casteamos fechas a string para evitar problemas de tipo con SQLAlchemy
+    filtro_local_v = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(fecha_i), "f": str(fecha_f)}
+    if local != "Todos":
+        params["l"] = local
+
+    q_v = f"""
+        SELECT sku_producto, SUM(cantidad_vendida) as cant_vendida
+        FROM ventas
+        WHERE fecha_venta BETWEEN :i AND :f
+        {filtro_local_v}
+        GROUP BY 1
+    """
+    if espejo_activo('ventas'):
+        df_v = leer_espejo('ventas', ['sku_producto', 'cantidad_vendida'], fecha_i, fecha_f, local)
+        df_v = (df_v.groupby('sku_producto', dropna=False)['cantidad_vendida'].sum(min_count=1)
+                .reset_index().rename(columns={'cantidad_vendida': 'cant_vendida'}))
+    else:
+        df_v = run_query(q_v, params)
+    return df_v
+
+
+def consumo_teorico(df_v, df_rec):
+    """
+    Consumo teórico por ingrediente (kg/lt/un) para las ventas df_v
+    (sku_producto, cant_vendida) con el recetario df_rec (tabla recetas):
+    Σ cant_vendida × coef sobre receta_plana(df_rec).
+    Es lineal en las ventas: el de un período es la suma del de sus meses.
+    """
+    with medir("desviación: consumo teórico", filas_in=len(df_v)) as m:
+        plana = receta_plana(df_rec)
+        cruce = df_v[['sku_producto', 'cant_vendida']].merge(
+            plana, left_on='sku_producto', right_on='codigo_venta', how='inner')
+        cruce['consumo_parcial'] = cruce['cant_vendida'] * cruce['coef']
+        cons_teo = _consolidar_consumo([cruce[['sku_ingrediente', 'nombre_ingrediente', 'consumo_parcial']]],
+                                       'consumo_parcial')
+        m['filas_out'] = len(cons_teo)
+    return cons_teo
+
+
+def _consolidar_consumo(partes, col):
+    partes = [df for df in partes if not df.empty]
+    if not partes:
+        return pd.DataFrame(columns=['sku_ingrediente', 'consumo_teorico', 'nombre_ingrediente'])
+    todo = pd.concat(partes, ignore_index=True)
+    return todo.groupby('sku_ingrediente').agg(
+        consumo_teorico=(col, 'sum'),
+        nombre_ingrediente=('nombre_ingrediente', 'first')
+    ).reset_index()
+
+
+# ============================================================
+# CONSUMO TEÓRICO DIARIO (fecha × ingrediente)
+# Matriz de ventas diarias (fechas × platos) por receta aplanada
+# (platos × ingredientes, PRO- ya explotados) en una sola multiplicación
+# ============================================================
+# Receta aplanada por versión de recetario (sólo se guarda la última)
+_receta_plana_cache = {}
+
+
+def receta_plana(df_rec):
+    """
+    Coeficientes de consumo por unidad vendida: (codigo_venta, sku_ingrediente,
+    nombre_ingrediente, coef), sin opcionales y con los PRO- explotados un
+    nivel con rendimiento / porción. consumo = Σ cant_vendida × coef
+    (consumo_teorico); consumo_sql repite estas reglas dentro de la base.
+    """
+    version = snapshots.version_recetas(df_rec)
+    if version in _receta_plana_cache:
+        return _receta_plana_cache[version]
+
+    rec = df_rec.copy()
+    rec['es_opcion'] = pd.to_numeric(rec['es_opcion'], errors='coerce').fillna(0)
+    rec['cant_real'] = pd.to_numeric(rec['cant_real'], errors='coerce').fillna(0)
+    rec = rec[rec['es_opcion'] == 0].copy()
+    rec['factor_um'] = rec['um_salida'].map(factor_um)
+    rec['es_pro'] = rec['sku_ingrediente'].str.startswith('PRO-', na=False)
+    df_dir  = rec[rec['es_procesado'] == False]
+    df_proc = rec[rec['es_procesado'] == True]
+
+    directos = df_dir[~df_dir['es_pro']].assign(coef=lambda d: d['cant_real'] * d['factor_um'])
+    partes = [directos[['codigo_venta', 'sku_ingrediente', 'nombre_ingrediente', 'coef']]]
+
+    dir_pro = df_dir[df_dir['es_pro']].drop_duplicates(['codigo_venta', 'sku_ingrediente'])
+    if not dir_pro.empty and not df_proc.empty:
+        rend = df_proc.groupby('codigo_venta').agg(
+            rendimiento_explicito=('rendimiento', 'max'),
+            rendimiento_suma=('cant_real', 'sum'),
+            porcion=('porcion', 'first')
+        )
+        explicito = pd.to_numeric(rend['rendimiento_explicito'], errors='coerce')
+        rend['rendimiento_total'] = explicito.where(explicito > 1, rend['rendimiento_suma']).replace(0, 1)
+        rend['porcion'] = pd.to_numeric(rend['porcion'], errors='coerce').fillna(0).astype(int)
+
+        plato = dir_pro[['codigo_venta', 'sku_ingrediente', 'cant_real', 'factor_um']].rename(
+            columns={'codigo_venta': 'plato', 'sku_ingrediente': 'pro', 'cant_real': 'cant_plato', 'factor_um': 'um_plato'})
+        plato = plato.join(rend[['rendimiento_total', 'porcion']], on='pro', how='inner')
+        base = df_proc[['codigo_venta', 'sku_ingrediente', 'nombre_ingrediente', 'cant_real', 'factor_um']]
+        exp = plato.merge(base, left_on='pro', right_on='codigo_venta', how='inner')
+        por_plato = exp['cant_plato'] * exp['um_plato']
+        por_plato = por_plato.where(exp['porcion'] == 1, por_plato / exp['rendimiento_total'])
+        exp['coef'] = por_plato * exp['cant_real'] * exp['factor_um']
+        partes.append(exp.drop(columns='codigo_venta').rename(columns={'plato': 'codigo_venta'})
+                      [['codigo_venta', 'sku_ingrediente', 'nombre_ingrediente', 'coef']])
+
+    plana = pd.concat(partes, ignore_index=True)
+    _receta_plana_cache.clear()
+    _receta_plana_cache[version] = plana
+    return plana
+
+
+def _ventas_diarias(fecha_i, fecha_f, local):
+    """Ventas por (fecha_venta, sku_producto) del rango."""
+    if espejo_activo('ventas'):
+        df = leer_espejo('ventas', ['fecha_venta', 'sku_producto', 'cantidad_vendida'], fecha_i, fecha_f, local)
+        return (df.groupby(['fecha_venta', 'sku_producto'], dropna=False)['cantidad_vendida'].sum(min_count=1)
+                .reset_index().rename(columns={'cantidad_vendida': 'cant_vendida'}))
+    filtro_local = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(fecha_i), "f": str(fecha_f)}
+    if local != "Todos":
+        params["l"] = local
+    return run_query(f"""
+        SELECT fecha_venta, sku_producto, SUM(cantidad_vendida) as cant_vendida
+        FROM ventas
+        WHERE fecha_venta BETWEEN :i AND :f
+        {filtro_local}
+        GROUP BY 1, 2
+    """, params)
+
+
+def consumo_diario(fecha_i, fecha_f, local):
+    """
+    Devuelve (matriz, nombres): matriz con una fila por día del rango (días
+    sin ventas en 0) y una columna por sku_ingrediente; nombres es
+    sku_ingrediente → nombre_ingrediente. Sumar las filas da el consumo
+    teórico del período del Informe 2.
+    """
+    df_rec = recetas()
+    df_v = _ventas_diarias(fecha_i, fecha_f, local)
+    if df_rec.empty or df_v.empty:
+        return pd.DataFrame(), pd.Series(dtype=object)
+
+    with medir("consumo diario: receta aplanada", filas_in=len(df_rec)) as m:
+        plana = receta_plana(df_rec)
+        plana = plana[plana['codigo_venta'].isin(df_v['sku_producto'])]
+        m['filas_out'] = len(plana)
+
+    with medir("consumo diario: ventas × receta", filas_in=len(df_v)) as m:
+        dias = pd.date_range(pd.Timestamp(fecha_i), pd.Timestamp(fecha_f), freq='D')
+        i_dia = dias.get_indexer(pd.to_datetime(df_v['fecha_venta']))
+        i_pla, platos = pd.factorize(df_v['sku_producto'])
+        V = np.zeros((len(dias), len(platos)))
+        ok = (i_dia >= 0) & (i_pla >= 0)      # -1: día fuera de rango o venta sin sku_producto
+        np.add.at(V, (i_dia[ok], i_pla[ok]), pd.to_numeric(df_v['cant_vendida'], errors='coerce').fillna(0).to_numpy()[ok])
+
+        j_ing, ingredientes = pd.factorize(plana['sku_ingrediente'])
+        F = np.zeros((len(platos), len(ingredientes)))
+        np.add.at(F, (platos.get_indexer(plana['codigo_venta']), j_ing), plana['coef'].to_numpy())
+
+        matriz = pd.DataFrame(V @ F, index=pd.Index(dias.date, name='fecha'), columns=ingredientes)
+        matriz = matriz[sorted(matriz.columns)]
+        m['filas_out'] = matriz.size
+
+    nombres = plana.drop_duplicates('sku_ingrediente').set_index('sku_ingrediente')['nombre_ingrediente']
+    return matriz, nombres
+
+
+def _consumo_periodo(fecha_i, fecha_f, local):
+    """Consumo teórico del Informe 2 (vacío si no hay recetario o ventas)."""
+    if consumo_en_base() and not espejo_activo('ventas') and not toca_archivo(fecha_i, fecha_f):
+        # Explosión y cruce con ventas dentro de la base: sólo viajan los totales por ingrediente
+        return consumo_teorico_sql(fecha_i, fecha_f, local)
+
+    # Recetario completo
+    df_rec = recetas()
+
+    # Meses cerrados desde snapshot (misma versión de recetario) + tramos en vivo
+    version = snapshots.version_recetas(df_rec)
+    meses_snap, tramos = snapshots.plan_periodo(fecha_i, fecha_f, 'consumo', version)
+    if meses_snap and not df_rec.empty:
+        partes = [snapshots.leer_consumo(meses_snap, local, version)]
+        for fi, ff in tramos:
+            df_v = _ventas_desviacion(fi, ff, local)
+            if not df_v.empty:
+                partes.append(consumo_teorico(df_v, df_rec))
+        return _consolidar_consumo(partes, 'consumo_teorico')
+    df_v = _ventas_desviacion(fecha_i, fecha_f, local)
+    if df_rec.empty or df_v.empty:
+        return pd.DataFrame()
+    return consumo_teorico(df_v, df_rec)
+
+
+def informe_desviacion(fecha_i, fecha_f, local):
+    engine = get_engine()
+    if engine is None:
+        return pd.DataFrame()
+
+    cons_teo = _consumo_periodo(fecha_i, fecha_f, local)
+    if cons_teo.empty:
+        return pd.DataFrame()
+
+    # Compras reales del período — fecha_dte es timestamp, cant_conv ya está en unidades
+    filtro_local_c  = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    filtro_local_c2 = "AND UPPER(c.local) = UPPER(:l)" if local != "Todos" else ""
+    params_c = {"i": str(fecha_i), "fs": dia_siguiente(fecha_f)}
+    if local != "Todos":
+        params_c["l"] = local
+    tabla_eq = tabla_equivalencias()
+
+    q_c = f"""
+        SELECT
+            COALESCE(e.sku_receta, c.sku) as sku,
+            SUM(c.cant_conv) AS cant_real_comprada,
+            AVG(c.muc) AS muc_promedio
+        FROM compras c
+        LEFT JOIN {tabla_eq} e ON c.sku = e.sku_compra
+        WHERE c.fecha_dte >= :i AND c.fecha_dte < :fs
+          AND c.subcat = 'Directo'
+        {filtro_local_c2}
+        GROUP BY 1
+    """
+    usar_espejo_c = espejo_activo('compras')
+    meses_snap_c, tramos_c = snapshots.plan_periodo(fecha_i, fecha_f, 'compras')
+    if meses_snap_c:
+        partes = [snapshots.leer_compras(meses_snap_c, local)]
+        partes += [_compras_directo_sumas(fi, ff, local) for fi, ff in tramos_c]
+        df_c = _compras_directo_combinadas(partes)
+    elif usar_espejo_c:
+        df_c = _compras_directo_espejo(fecha_i, fecha_f, local)
+    else:
+        df_c = run_query(q_c, params_c)
+
+    # Fallback: si el período no tiene compras, mostrar histórico completo
+    if df_c.empty and usar_espejo_c:
+        df_c = _compras_directo_espejo(None, None, local)
+        if not df_c.empty:
+            avisos.advertencia("⚠️ Sin compras en el período seleccionado — mostrando totales históricos.")
+    elif df_c.empty:
+        q_c2 = f"""
+            SELECT
+                COALESCE(e.sku_receta, c.sku) as sku,
+                SUM(c.cant_conv) AS cant_real_comprada,
+                AVG(c.muc) AS muc_promedio
+            FROM compras c
+            LEFT JOIN {tabla_eq} e ON c.sku = e.sku_compra
+            WHERE c.subcat = 'Directo'
+            {filtro_local_c2}
+            GROUP BY 1
+        """
+        df_c = run_query(q_c2, params_c)
+        if not df_c.empty:
+            avisos.advertencia("⚠️ Sin compras en el período seleccionado — mostrando totales históricos.")
+
+    # Equivalencias ya aplicadas en SQL — no necesita remapeo en Python
+
+    # Nombre canónico y subcat desde catalogo_sku — incluir equivalencias para SKUs que solo existen como destino
+    cat = catalogo()
+    nombres = pd.Series(cat['nombre'].to_numpy(), index=cat['sku'].astype(str))
+    subcats = pd.Series(cat['subcat'].to_numpy(), index=cat['sku'].astype(str))
+
+    # Fallback de nombres via equivalencias (destino final ← primer origen con nombre)
+    mapa_eq = mapa_equivalencias()
+    if mapa_eq:
+        eq = pd.DataFrame({'sku_compra': list(mapa_eq), 'sku_receta': list(mapa_eq.values())})
+        eq = eq[eq['sku_compra'].isin(nombres.index) & ~eq['sku_receta'].isin(nombres.index)]
+        eq = eq.drop_duplicates('sku_receta')
+        nombres = pd.concat([nombres, pd.Series(eq['sku_compra'].map(nombres).to_numpy(), index=eq['sku_receta'])])
+
+    with medir("desviación: armado final", filas_in=len(cons_teo)) as m:
+        informe = pd.merge(
+            cons_teo, df_c,
+            left_on='sku_ingrediente', right_on='sku', how='outer'
+        )
+        informe = informe.fillna(0)
+
+        # Eliminar filas que son SKUs originales ya consolidados via equivalencias
+        # (aparecen solo en compras con consumo_teorico=0 porque ya fueron mapeados a su sku_receta)
+        skus_compra_equiv = set(mapa_eq)
+        informe = informe[~(
+            (informe['consumo_teorico'] == 0) &
+            (informe['sku'].isin(skus_compra_equiv))
+        )].copy()
+        informe['subcat'] = (informe['sku_ingrediente'].astype(str).map(subcats)
+                             .fillna(informe['sku'].astype(str).map(subcats)).fillna(''))
+
+        # SKU final: unificar sku_ingrediente y sku en una sola columna
+        sin_ing = informe['sku_ingrediente'].isin([0, '']) | informe['sku_ingrediente'].isna()
+        informe['sku_final'] = informe['sku_ingrediente'].where(~sin_ing, informe['sku'])
+
+        # Nombre final: recetario primero, compras como fallback para ingredientes sin receta
+        nom = informe['nombre_ingrediente']
+        con_nombre = ~(nom.isin([0, '']) | nom.isna()) & (nom.astype(str).str.strip() != '')
+        sku_txt = informe['sku_final'].astype(str)
+        informe['nombre_final'] = nom.where(con_nombre, sku_txt.map(nombres).fillna(sku_txt))
+
+        informe['desviacion_cant']   = informe['cant_real_comprada'] - informe['consumo_teorico']
+        informe['desviacion_dinero'] = informe['desviacion_cant'] * informe['muc_promedio']
+
+        # Renombrar para consistencia con el resto del informe
+        informe['sku_ingrediente']   = informe['sku_final']
+        informe['nombre_ingrediente']= informe['nombre_final']
+        m['filas_out'] = len(informe)
+
+    return informe.sort_values('desviacion_dinero', ascending=False)
+
+
+# ============================================================
+# INFORME 3: VARIACIÓN DE PRECIO DE COMPRAS (canasta fija)
+# Cantidades del mes muestra valorizadas al precio medio del mes de comparación
+# ============================================================
+def informe_variacion_precios(mes_base, mes_comp, categoria="Todos"):
+    mes_base = pd.Timestamp(mes_base).to_period('M')
+    mes_comp = pd.Timestamp(mes_comp).to_period('M')
+    params = {
+        "bi": mes_base.start_time.strftime('%Y-%m-%d'), "bs": (mes_base + 1).start_time.strftime('%Y-%m-%d'),
+        "ci": mes_comp.start_time.strftime('%Y-%m-%d'), "cs": (mes_comp + 1).start_time.strftime('%Y-%m-%d'),
+    }
+    filtro_cat3 = ""
+    if categoria != 'Todos':
+        filtro_cat3 = "AND categoria_producto = :cat"
+        params["cat"] = categoria
+
+    q_ing = f"""
+        WITH equiv AS (
+            SELECT sku_compra, sku_receta FROM {tabla_equivalencias()}
+        ),
+        base AS (
+            SELECT
+                COALESCE(e.sku_receta, c.sku) as sku,
+                MIN(c.nombre_producto) as nombre,
+                MIN(c.subcat) as subcat,
+                MIN(c.categoria_producto) as categoria,
+                SUM(c.cant_conv) as cant_base,
+                SUM(c.costo_realfinal) / NULLIF(SUM(c.cant_conv), 0) as precio_base
+            FROM compras c
+            LEFT JOIN equiv e ON c.sku = e.sku_compra
+            WHERE c.fecha_dte >= :bi AND c.fecha_dte < :bs
+              AND c.subcat IN ('Directo','Indirecto')
+              AND c.costo_realfinal > 0
+              {filtro_cat3}
+            GROUP BY 1
+        ),
+        comp AS (
+            SELECT
+                COALESCE(e.sku_receta, c.sku) as sku,
+                SUM(c.costo_realfinal) / NULLIF(SUM(c.cant_conv), 0) as precio_comp
+            FROM compras c
+            LEFT JOIN equiv e ON c.sku = e.sku_compra
+            WHERE c.fecha_dte >= :ci AND c.fecha_dte < :cs
+              AND c.subcat IN ('Directo','Indirecto')
+              AND c.costo_realfinal > 0
+            GROUP BY 1
+        )
+        SELECT
+            b.sku, b.nombre, b.subcat, b.categoria,
+            b.cant_base, b.precio_base,
+            c.precio_comp,
+            b.cant_base * b.precio_base as impacto_base,
+            b.cant_base * COALESCE(c.precio_comp, b.precio_base) as impacto_comp
+        FROM base b
+        LEFT JOIN comp c ON b.sku = c.sku
+        ORDER BY b.sku
+    """
+    df3 = run_query(q_ing, params)
+    if df3.empty:
+        avisos.advertencia("Sin datos para el mes seleccionado.")
+        return df3
+
+    df3['precio_base']  = pd.to_numeric(df3['precio_base'],  errors='coerce').fillna(0)
+    df3['precio_comp']  = pd.to_numeric(df3['precio_comp'],  errors='coerce').fillna(df3['precio_base'])
+    df3['cant_base']    = pd.to_numeric(df3['cant_base'],    errors='coerce').fillna(0)
+    df3['impacto_base'] = pd.to_numeric(df3['impacto_base'], errors='coerce').fillna(0)
+    df3['impacto_comp'] = df3['cant_base'] * df3['precio_comp']
+    df3['delta_dinero'] = df3['impacto_comp'] - df3['impacto_base']
+    df3['delta_pct']    = df3.apply(
+        lambda r: (r['delta_dinero'] / r['impacto_base'] * 100) if r['impacto_base'] > 0 else None, axis=1
+    )
+    df3['sin_precio_comp'] = df3['precio_comp'] == df3['precio_base']
+    return df3
@@ -0,0 +1,327 @@
+"""
+Libro de inventario teórico por SKU y local, con cierres mensuales.
+
+stock_movimientos guarda un movimiento por (fecha, local, sku, tipo):
+  compra  — cant_conv de las compras 'Directo' (SKU de compra, sin equivalencias)
+  consumo — consumo teórico de las ventas (negativo), con la receta aplanada
+            del Informe 2 (informes.receta_plana, copiada en stock_coeficientes)
+stock_saldos guarda el saldo acumulado al cierre de cada mes (mes = día 1).
+
+El saldo a una fecha es el último cierre anterior a su mes más los
+movimientos desde el día 1 de ese mes: un cierre + a lo sumo un mes de
+movimientos, sin recorrer la historia. Las equivalencias se aplican al leer.
+
+    save_compras / save_ventas → registrar_compras / registrar_consumo
+                                 (agregan movimientos y rehacen los cierres
+                                 desde el primer mes tocado)
+    save_recetario / copia     → reconstruir_inventario()
+
+Los años archivados (costeo.particiones) se rearman desde su Parquet.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+from .compartido import recetas
+from .db import asegurar_tabla, get_engine, lista_in, run_query
+from .equivalencias import aplicar_equivalencias
+from .informes import informe_desviacion, receta_plana
+from .particiones import anios_archivados, leer_archivo
+from .perf import medir
+
+COLS_MOVIMIENTOS = ['fecha', 'local', 'sku', 'tipo', 'cantidad']
+
+ESQUEMA_INVENTARIO = [
+    """
+    CREATE TABLE IF NOT EXISTS stock_movimientos (
+        fecha DATE, local VARCHAR, sku VARCHAR, tipo VARCHAR, cantidad DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_stock_movimientos_fecha ON stock_movimientos (fecha)",
+    """
+    CREATE TABLE IF NOT EXISTS stock_saldos (
+        mes DATE, local VARCHAR, sku VARCHAR, saldo DOUBLE PRECISION
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_stock_saldos_mes ON stock_saldos (mes)",
+    """
+    CREATE TABLE IF NOT EXISTS stock_coeficientes (
+        codigo_venta VARCHAR, sku_ingrediente VARCHAR, coef DOUBLE PRECISION
+    )
+    """,
+]
+
+
+def _engine_inventario():
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, *ESQUEMA_INVENTARIO):
+        return None
+    return engine
+
+
+def _inicio_mes(fecha):
+    return pd.Timestamp(fecha).to_period('M').start_time
+
+
+# ============================================================
+# MOVIMIENTOS
+# ============================================================
+def movimientos_compras(df):
+    """Movimientos 'compra' desde líneas de compras (local, fecha_dte, sku, subcat, cant_conv)."""
+    df = df[df['subcat'] == 'Directo'].dropna(subset=['sku'])
+    mov = pd.DataFrame({
+        'fecha': pd.to_datetime(df['fecha_dte'], errors='coerce').dt.normalize(),
+        'local': df['local'].astype('string').str.upper().fillna(''),
+        'sku': df['sku'].astype(str),
+        'cantidad': pd.to_numeric(df['cant_conv'], errors='coerce'),
+    }).dropna(subset=['fecha', 'cantidad'])
+    mov = mov.groupby(['fecha', 'local', 'sku'], as_index=False)['cantidad'].sum()
+    return mov.assign(tipo='compra')[COLS_MOVIMIENTOS]
+
+
+def movimientos_consumo(df_v, plana):
+    """
+    Movimientos 'consumo' (negativos) desde ventas (local, fecha_venta,
+    sku_producto, cantidad_vendida) × receta aplanada.
+    """
+    ventas = pd.DataFrame({
+        'fecha': pd.to_datetime(df_v['fecha_venta'], errors='coerce'),
+        'local': df_v['local'].astype('string').str.upper().fillna(''),
+        'codigo_venta': df_v['sku_producto'],
+        'cant': pd.to_numeric(df_v['cantidad_vendida'], errors='coerce'),
+    }).dropna(subset=['fecha', 'codigo_venta', 'cant'])
+    ventas = ventas.groupby(['fecha', 'local', 'codigo_venta'], as_index=False)['cant'].sum()
+    exp = ventas.merge(plana[['codigo_venta', 'sku_ingrediente', 'coef']], on='codigo_venta', how='inner')
+    exp['cantidad'] = -exp['cant'] * exp['coef']
+    mov = exp.groupby(['fecha', 'local', 'sku_ingrediente'], as_index=False)['cantidad'].sum()
+    return mov.rename(columns={'sku_ingrediente': 'sku'}).assign(tipo='consumo')[COLS_MOVIMIENTOS]
+
+
+# ============================================================
+# CIERRES MENSUALES
+# ============================================================
+SQL_CIERRES = """
+    INSERT INTO stock_saldos (mes, local, sku, saldo)
+    WITH previo AS (
+        SELECT local, sku, saldo FROM stock_saldos
+        WHERE mes = (SELECT MAX(mes) FROM stock_saldos WHERE mes < :m)
+    ),
+    mensual AS (
+        SELECT DATE_TRUNC('month', fecha)::date AS mes, local, sku, SUM(cantidad) AS cantidad
+        FROM stock_movimientos
+        WHERE fecha >= :m
+        GROUP BY 1, 2, 3
+    ),
+    meses AS (
+        SELECT CAST(g AS DATE) AS mes
+        FROM generate_series(CAST(:m AS TIMESTAMP),
+                             (SELECT CAST(MAX(mes) AS TIMESTAMP) FROM mensual),
+                             INTERVAL '1 month') AS t(g)
+    ),
+    claves AS (
+        SELECT local, sku FROM mensual
+        UNION
+        SELECT local, sku FROM previo
+    )
+    SELECT me.mes, c.local, c.sku,
+           COALESCE(p.saldo, 0)
+             + SUM(COALESCE(mo.cantidad, 0)) OVER (PARTITION BY c.local, c.sku ORDER BY me.mes)
+    FROM claves c
+    CROSS JOIN meses me
+    LEFT JOIN mensual mo ON mo.local = c.local AND mo.sku = c.sku AND mo.mes = me.mes
+    LEFT JOIN previo p ON p.local = c.local AND p.sku = c.sku
+"""
+
+
+def _recalcular_saldos(engine, desde_mes=None):
+    """
+    Rehace stock_saldos desde `desde_mes` (o toda la historia): cierre del mes
+    anterior + acumulado mensual de movimientos, un cierre por mes para cada
+    (local, sku), sin huecos hasta el último mes con movimientos.
+    """
+    if desde_mes is None:
+        ini = run_query("SELECT MIN(fecha) AS i FROM stock_movimientos")
+        if ini.empty or pd.isna(ini['i'].iloc[0]):
+            with engine.begin() as conn:
+                conn.execute(text("DELETE FROM stock_saldos"))
+            return 0
+        desde_mes = ini['i'].iloc[0]
+        borrar = "DELETE FROM stock_saldos"
+    else:
+        borrar = "DELETE FROM stock_saldos WHERE mes >= :m"
+    params = {"m": str(_inicio_mes(desde_mes).date())}
+    with medir("inventario: cierres mensuales") as m:
+        with engine.begin() as conn:
+            conn.execute(text(borrar), params)
+            conn.execute(text(SQL_CIERRES), params)
+        m['filas_out'] = _contar("stock_saldos WHERE mes >= :m", params)
+    return m['filas_out']
+
+
+def _registrar(engine, mov):
+    if mov.empty:
+        return 0
+    with engine.begin() as conn:
+        mov.to_sql('stock_movimientos', conn, if_exists='append', index=False)
+    _recalcular_saldos(engine, mov['fecha'].min())
+    return len(mov)
+
+
+def _contar(desde, params=None):
+    df = run_query(f"SELECT COUNT(*) AS n FROM {desde}", params)
+    return int(df['n'].iloc[0]) if not df.empty else 0
+
+
+def _libro_vacio():
+    return run_query("SELECT fecha FROM stock_movimientos LIMIT 1").empty
+
+
+# ============================================================
+# API
+# ============================================================
+def reconstruir_inventario():
+    """
+    Rearma el libro completo dentro de la base: compras y consumo (ventas ×
+    stock_coeficientes, la receta aplanada vigente) en dos INSERT ... SELECT,
+    y luego los cierres. Devuelve los movimientos escritos (None si la base
+    no está disponible).
+    """
+    engine = _engine_inventario()
+    if engine is None:
+        return None
+    df_rec = recetas()
+    coef = pd.DataFrame(columns=['codigo_venta', 'sku_ingrediente', 'coef'])
+    if not df_rec.empty:
+        coef = receta_plana(df_rec).groupby(['codigo_venta', 'sku_ingrediente'], as_index=False)['coef'].sum()
+
+    # Años archivados: se leen del Parquet (la base conserva sólo algunas compras de ellos)
+    arch_c, arch_v = sorted(anios_archivados('compras')), sorted(anios_archivados('ventas'))
+    marcas_c, params_c = lista_in(arch_c, "c")
+    marcas_v, params_v = lista_in(arch_v, "v")
+    params = {**params_c, **params_v}
+    excluir_c = f"AND EXTRACT(YEAR FROM fecha_dte) NOT IN ({marcas_c})" if arch_c else ""
+    excluir_v = f"AND EXTRACT(YEAR FROM v.fecha_venta) NOT IN ({marcas_v})" if arch_v else ""
+
+    with medir("inventario: movimientos", filas_in=len(coef)) as m:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM stock_movimientos"))
+            conn.execute(text("DELETE FROM stock_coeficientes"))
+            if not coef.empty:
+                coef.to_sql('stock_coeficientes', conn, if_exists='append', index=False)
+            conn.execute(text(f"""
+                INSERT INTO stock_movimientos (fecha, local, sku, tipo, cantidad)
+                SELECT fecha_dte::date, COALESCE(UPPER(local), ''), sku, 'compra', SUM(cant_conv)
+                FROM compras
+                WHERE subcat = 'Directo' AND sku IS NOT NULL AND cant_conv IS NOT NULL
+                {excluir_c}
+                GROUP BY 1, 2, 3
+            """), params)
+            conn.execute(text(f"""
+                INSERT INTO stock_movimientos (fecha, local, sku, tipo, cantidad)
+                SELECT v.fecha_venta, COALESCE(UPPER(v.local), ''), k.sku_ingrediente, 'consumo',
+                       -SUM(v.cantidad_vendida * k.coef)
+                FROM ventas v
+                JOIN stock_coeficientes k ON k.codigo_venta = v.sku_producto
+                WHERE v.fecha_venta IS NOT NULL AND v.cantidad_vendida IS NOT NULL
+                {excluir_v}
+                GROUP BY 1, 2, 3
+            """), params)
+            for anio in arch_c:
+                for df in leer_archivo('compras', ['local', 'fecha_dte', 'sku', 'subcat', 'cant_conv'],
+                                       f"{anio}-01-01", f"{anio}-12-31"):
+                    movimientos_compras(df).to_sql('stock_movimientos', conn, if_exists='append', index=False)
+            for anio in arch_v if not coef.empty else []:
+                for df in leer_archivo('ventas', ['local', 'fecha_venta', 'sku_producto', 'cantidad_vendida'],
+                                       f"{anio}-01-01", f"{anio}-12-31"):
+                    movimientos_consumo(df, coef).to_sql('stock_movimientos', conn, if_exists='append', index=False)
+        n = m['filas_out'] = _contar("stock_movimientos")
+
+    _recalcular_saldos(engine)
+    return n
+
+
+def registrar_compras(df):
+    """Agrega al libro las compras recién guardadas (o lo rearma si está vacío)."""
+    engine = _engine_inventario()
+    if engine is None or not {'fecha_dte', 'sku', 'subcat', 'cant_conv'} <= set(df.columns):
+        return None
+    if _libro_vacio():
+        return reconstruir_inventario()
+    return _registrar(engine, movimientos_compras(df.assign(local=df.get('local'))))
+
+
+def registrar_consumo(df_v):
+    """Agrega al libro el consumo teórico de las ventas recién guardadas (o lo rearma si está vacío)."""
+    engine = _engine_inventario()
+    if engine is None:
+        return None
+    if _libro_vacio():
+        return reconstruir_inventario()
+    df_rec = recetas()
+    if df_rec.empty:
+        return 0
+    return _registrar(engine, movimientos_consumo(df_v.assign(local=df_v.get('local')), receta_plana(df_rec)))
+
+
+def saldos(fecha, local="Todos"):
+    """
+    Stock teórico al cierre de `fecha` por SKU de receta (equivalencias
+    aplicadas): [sku, saldo]. Con "Todos" suma los locales.
+    """
+    vacio = pd.DataFrame(columns=['sku', 'saldo'])
+    engine = _engine_inventario()
+    if engine is None:
+        return vacio
+    if _libro_vacio() and not reconstruir_inventario():
+        return vacio
+
+    fecha = pd.Timestamp(fecha).normalize()
+    mes = _inicio_mes(fecha)
+    filtro_local = "AND local = UPPER(:l)" if local != "Todos" else ""
+    params = {"m": mes.date(), "f": fecha.date()}
+    if local != "Todos":
+        params["l"] = local
+
+    with medir("inventario: saldo a fecha") as m:
+        # Último cierre antes del mes de `fecha`; los cierres existen para todos
+        # los meses con historia, así que basta escanear desde el día 1 del mes
+        cierre = run_query(f"""
+            SELECT sku, SUM(saldo) AS saldo FROM stock_saldos
+            WHERE mes = (SELECT MAX(mes) FROM stock_saldos WHERE mes < :m)
+            {filtro_local}
+            GROUP BY 1
+        """, params)
+        tramo = run_query(f"""
+            SELECT sku, SUM(cantidad) AS saldo FROM stock_movimientos
+            WHERE fecha >= :m AND fecha <= :f
+            {filtro_local}
+            GROUP BY 1
+        """, params)
+        partes = [p for p in (cierre, tramo) if not p.empty]
+        if not partes:
+            return vacio
+        df = pd.concat(partes, ignore_index=True)
+        df['sku'] = aplicar_equivalencias(df['sku']).to_numpy()
+        df = df.groupby('sku', as_index=False)['saldo'].sum()
+        m['filas_out'] = len(df)
+    return df
+
+
+def agregar_stock(informe, fecha_i, fecha_f, local="Todos"):
+    """
+    Agrega al Informe 2 stock_inicial (cierre del día anterior a fecha_i) y
+    stock_final (cierre de fecha_f) por sku_ingrediente.
+    """
+    if informe.empty:
+        return informe
+    ini = saldos(pd.Timestamp(fecha_i) - pd.Timedelta(days=1), local)
+    fin = saldos(fecha_f, local)
+    sku = informe['sku_ingrediente'].astype(str)
+    return informe.assign(
+        stock_inicial=sku.map(ini.set_index('sku')['saldo']).fillna(0).to_numpy(),
+        stock_final=sku.map(fin.set_index('sku')['saldo']).fillna(0).to_numpy(),
+    )
+
+
+def informe_desviacion_stock(fecha_i, fecha_f, local="Todos"):
+    """Informe 2 con stock inicial y final, como lo muestran la app y la CLI."""
+    return agregar_stock(informe_desviacion(fecha_i, fecha_f, local), fecha_i, fecha_f, local)
@@ -0,0 +1,85 @@
+import pandas as pd
+
+from .perf import medir
+
+
+# ============================================================
+# LÓGICA MRP (código 1 preservado íntegramente)
+# ============================================================
+def process_bom(df_v, df_d, df_p):
+    df_v.columns = df_v.columns.str.strip()
+    df_d.columns = df_d.columns.str.strip()
+    df_p.columns = df_p.columns.str.strip()
+
+    df_v = df_v.rename(columns={'SKU': 'SKU_VENTA', 'Cantidad': 'CANT_VENTA'})
+    skus_vendidos = set(df_v['SKU_VENTA'].astype(str).str.strip().str.upper())
+
+    def validar_opcion(row):
+        es_op = str(row['EsOpcion']).strip()
+        if pd.isna(row['EsOpcion']) or es_op in ["", "0", "4"]:
+            return True
+        return str(row['SKU']).strip().upper() in skus_vendidos
+
+    with medir("bom: filtro opciones", filas_in=len(df_d)) as m:
+        df_d_ready = df_d[df_d.apply(validar_opcion, axis=1)].copy()
+        m['filas_out'] = len(df_d_ready)
+    with medir("bom: merge ventas × directos", filas_in=len(df_v)) as m:
+        m1 = pd.merge(df_v, df_d_ready, left_on='SKU_VENTA', right_on='CODIGO VENTA', how='inner')
+        m['filas_out'] = len(m1)
+
+    es_proc = m1['SKU'].str.startswith('PRO-', na=False)
+    df_insumos_directos = m1[~es_proc].copy()
+    df_procesados_a_explotar = m1[es_proc].copy()
+
+    if not df_procesados_a_explotar.empty:
+        with medir("bom: explosión procesados", filas_in=len(df_procesados_a_explotar)) as m:
+            rendimientos = df_p.groupby('Codigo Venta')['CantReceta'].sum().reset_index()
+            rendimientos = rendimientos.rename(columns={'CantReceta': 'TOTAL_RECETA_AUTO'})
+
+            df_p_clean = df_p.rename(columns={
+                'Codigo Venta': 'COD_P',
+                'Ingrediente': 'NOM_P',
+                'CantEfic': 'CE_P',
+                'CantReceta': 'CR_P',
+                'Porcion': 'MARK_P',
+                'UM Salida': 'UM_P',
+                'SKU Ingrediente': 'SKU_P'
+            })
+            df_p_final = pd.merge(df_p_clean, rendimientos, left_on='COD_P', right_on='Codigo Venta', how='left')
+            m2 = pd.merge(df_procesados_a_explotar, df_p_final, left_on='SKU', right_on='COD_P', how='left')
+
+            def calcular_m2(row):
+                if row['MARK_P'] == 1:
+                    return row['CANT_VENTA'] * row['CantReal'] * row['CE_P']
+                else:
+                    divisor = row['TOTAL_RECETA_AUTO'] if row['TOTAL_RECETA_AUTO'] > 0 else 1
+                    return row['CANT_VENTA'] * row['CantReal'] * (row['CE_P'] / divisor)
+
+            m2['CANT_OUT'] = m2.apply(calcular_m2, axis=1)
+            exp_f = m2[['SKU_P', 'NOM_P', 'CANT_OUT', 'UM_P']].rename(
+                columns={'SKU_P': 'SKU_FIN', 'NOM_P': 'ING_FIN', 'UM_P': 'UM_FIN'})
+            m['filas_out'] = len(exp_f)
+    else:
+        exp_f = pd.DataFrame()
+
+    df_insumos_directos['CANT_OUT'] = (
+        df_insumos_directos['CANT_VENTA'] * df_insumos_directos['CantReal']
+    )
+    dir_out = df_insumos_directos[['SKU', 'Ingrediente', 'CANT_OUT', 'UM']].rename(
+        columns={'SKU': 'SKU_FIN', 'Ingrediente': 'ING_FIN', 'UM': 'UM_FIN'})
+
+    with medir("bom: consolidar y formatear") as m:
+        consolidado = pd.concat([dir_out, exp_f], ignore_index=True)
+        resumen = consolidado.groupby(['SKU_FIN', 'UM_FIN'], as_index=False).agg(
+            {'CANT_OUT': 'sum', 'ING_FIN': 'first'})
+
+        def formatear(row):
+            um = str(row['UM_FIN']).upper()
+            if um in ['G', 'ML', 'CC']:
+                return row['CANT_OUT'] / 1000
+            return row['CANT_OUT']
+
+        resumen['TOTAL'] = resumen.apply(formatear, axis=1)
+        m['filas_out'] = len(resumen)
+    return resumen[['SKU_FIN', 'ING_FIN', 'UM_FIN', 'TOTAL']].rename(
+        columns={'SKU_FIN': 'SKU', 'ING_FIN': 'Insumo', 'UM_FIN': 'UM', 'TOTAL': 'Total Kg/L/Un'})
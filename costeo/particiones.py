@@ -0,0 +1,385 @@
+"""
+Particiones mensuales de compras / ventas y archivo de años cerrados.
+
+Postgres: particionar() convierte la tabla en particionada por rango de
+fecha (una partición por mes + DEFAULT) y save_compras / save_ventas crean
+las particiones de los meses que cargan (asegurar_particiones). Los filtros
+de fecha de los informes van sobre la columna sin castear (ver
+db.dia_siguiente), así el planificador poda los meses fuera del rango.
+DuckDB no tiene particionado declarativo: ahí sólo aplica el archivo.
+
+Archivo: archivar(anio) mueve un año cerrado a Parquet (zstd, mismo
+esquema y particiones mes/local del espejo) y lo saca de la tabla caliente
+(DROP de las particiones del año en Postgres, DELETE en el resto). Antes
+se generan los snapshots del año, que siguen sirviendo los Informes 1 y 2;
+de compras queda en la tabla la última compra de cada SKU, para que el
+precio vigente, costo_platos y el catálogo no cambien. archivo_anios
+registra lo archivado; restaurar(anio) lo devuelve a la base. El resto de
+las consultas en vivo (Informe 3, exportar) ven sólo lo que queda en la base,
+y el espejo Parquet se rehace para ese año en ambos sentidos.
+"""
+import os
+import shutil
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from . import avisos
+from .db import _storage_secrets, asegurar_tabla, dia_siguiente, get_engine, run_query, run_query_stream
+from .perf import medir
+
+ARCHIVO_DIR_DEFAULT = "data/archivo"
+TABLAS_PARTICIONABLES = {'compras': 'fecha_dte', 'ventas': 'fecha_venta'}
+MESES_ADELANTE = 3
+
+ESQUEMA_ARCHIVO = """
+    CREATE TABLE IF NOT EXISTS archivo_anios (
+        tabla VARCHAR, anio INTEGER, filas BIGINT, conservadas BIGINT, ruta VARCHAR, archivado TIMESTAMP
+    )
+"""
+
+
+def archivo_dir():
+    return os.environ.get("MRP_ARCHIVO_DIR", _storage_secrets().get("archivo_dir", ARCHIVO_DIR_DEFAULT))
+
+
+def _es_postgres(engine):
+    return engine is not None and engine.dialect.name == 'postgresql'
+
+
+# ============================================================
+# PARTICIONES MENSUALES (Postgres)
+# ============================================================
+def _nombre_particion(tabla, mes):
+    return f"{tabla}_p{mes.year}_{mes.month:02d}"
+
+
+def _ddl_particion(tabla, mes):
+    return (f"CREATE TABLE IF NOT EXISTS {_nombre_particion(tabla, mes)} PARTITION OF {tabla} "
+            f"FOR VALUES FROM ('{mes.start_time:%Y-%m-%d}') TO ('{(mes + 1).start_time:%Y-%m-%d}')")
+
+
+def particiones(tabla):
+    """Nombres de las particiones de `tabla` (vacío si no está particionada)."""
+    engine = get_engine()
+    if not _es_postgres(engine):
+        return []
+    df = run_query("""
+        SELECT c.relname AS particion
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :t
+        ORDER BY 1
+    """, {"t": tabla})
+    return [] if df.empty else df['particion'].tolist()
+
+
+def es_particionada(tabla):
+    engine = get_engine()
+    if not _es_postgres(engine):
+        return False
+    return not run_query("""
+        SELECT 1 AS x FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = :t
+    """, {"t": tabla}).empty
+
+
+def _indices_y_restricciones(conn, tabla):
+    """Índices de `tabla` (con la PK / UNIQUE que respaldan) y sus claves foráneas, para recrearlos."""
+    indices = conn.execute(text("""
+        SELECT ic.relname AS nombre, pg_get_indexdef(ix.indexrelid) AS ddl, ix.indisunique AS unico,
+               con.conname AS restriccion, pg_get_constraintdef(con.oid) AS definicion
+        FROM pg_index ix
+        JOIN pg_class ic ON ic.oid = ix.indexrelid
+        JOIN pg_class t ON t.oid = ix.indrelid
+        LEFT JOIN pg_constraint con ON con.conindid = ix.indexrelid AND con.conrelid = t.oid
+        WHERE t.relname = :t
+        ORDER BY 1
+    """), {"t": tabla}).mappings().all()
+    foraneas = conn.execute(text("""
+        SELECT con.conname AS restriccion, pg_get_constraintdef(con.oid) AS definicion
+        FROM pg_constraint con
+        JOIN pg_class t ON t.oid = con.conrelid
+        WHERE t.relname = :t AND con.contype = 'f'
+        ORDER BY 1
+    """), {"t": tabla}).mappings().all()
+    return indices, foraneas
+
+
+def _recrear(conn, tabla, indices, foraneas):
+    """
+    Recrea índices y restricciones en la tabla particionada, cada uno en su
+    savepoint. Un UNIQUE / PK sin la columna de partición no se puede: queda
+    como índice común sobre las mismas columnas. Devuelve lo que no se pasó igual.
+    """
+    perdidos = []
+
+    def intentar(ddl):
+        try:
+            with conn.begin_nested():
+                conn.execute(text(ddl))
+            return True
+        except Exception:
+            return False
+
+    for ix in indices:
+        if ix['restriccion']:
+            ddl = f"ALTER TABLE {tabla} ADD CONSTRAINT {ix['restriccion']} {ix['definicion']}"
+        else:
+            ddl = ix['ddl']
+        if intentar(ddl):
+            continue
+        comun = ix['ddl'].replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1)
+        if ix['unico'] and intentar(comun):
+            perdidos.append(f"{ix['restriccion'] or ix['nombre']} (queda sin UNIQUE: no incluye la fecha)")
+        else:
+            perdidos.append(ix['restriccion'] or ix['nombre'])
+    for fk in foraneas:
+        if not intentar(f"ALTER TABLE {tabla} ADD CONSTRAINT {fk['restriccion']} {fk['definicion']}"):
+            perdidos.append(fk['restriccion'])
+    return perdidos
+
+
+def particionar(tabla):
+    """
+    Convierte `tabla` en particionada por mes (Postgres), con particiones
+    desde el primer mes con datos hasta MESES_ADELANTE después del actual.
+    Reescribe la tabla en una transacción y recrea sus índices, restricciones
+    y claves foráneas (avisa lo que no pudo pasar igual). True si quedó particionada.
+    """
+    engine = get_engine()
+    if tabla not in TABLAS_PARTICIONABLES or not _es_postgres(engine):
+        avisos.advertencia("El particionado mensual sólo aplica a compras / ventas en Postgres.")
+        return False
+    if es_particionada(tabla):
+        return True
+    col = TABLAS_PARTICIONABLES[tabla]
+    rango = run_query(f"SELECT MIN({col}) AS i FROM {tabla}")
+    hoy = pd.Timestamp(date.today()).to_period('M')
+    ini = hoy if rango.empty or pd.isna(rango['i'].iat[0]) else pd.Timestamp(rango['i'].iat[0]).to_period('M')
+    meses = pd.period_range(min(ini, hoy), hoy + MESES_ADELANTE, freq='M')
+    try:
+        with medir(f"particionar: {tabla}", filas_in=len(meses)):
+            with engine.begin() as conn:
+                indices, foraneas = _indices_y_restricciones(conn, tabla)
+                conn.execute(text(f"ALTER TABLE {tabla} RENAME TO {tabla}_heap"))
+                conn.execute(text(f"CREATE TABLE {tabla} (LIKE {tabla}_heap INCLUDING DEFAULTS "
+                                  f"INCLUDING CONSTRAINTS) PARTITION BY RANGE ({col})"))
+                for mes in meses:
+                    conn.execute(text(_ddl_particion(tabla, mes)))
+                conn.execute(text(f"CREATE TABLE {tabla}_default PARTITION OF {tabla} DEFAULT"))
+                conn.execute(text(f"INSERT INTO {tabla} SELECT * FROM {tabla}_heap"))
+                conn.execute(text(f"DROP TABLE {tabla}_heap"))
+                # Con la heap borrada, los nombres de índices y restricciones quedan libres
+                perdidos = _recrear(conn, tabla, indices, foraneas)
+    except Exception as e:
+        avisos.error(f"Error al particionar {tabla}: {e}")
+        return False
+    avisos.exito(f"✅ {tabla} particionada por mes ({len(meses)} particiones + default).")
+    if perdidos:
+        avisos.advertencia(f"⚠️ No se pasaron igual a {tabla} particionada: {', '.join(perdidos)}.")
+    return True
+
+
+def _meses_sin_particion(tabla, meses):
+    existentes = set(particiones(tabla))
+    return sorted(m for m in meses if _nombre_particion(tabla, m) not in existentes)
+
+
+def asegurar_particiones(tabla, fechas):
+    """Crea las particiones mensuales que falten para `fechas` (no-op si la tabla no está particionada)."""
+    if fechas is None or not es_particionada(tabla):
+        return
+    meses = set(pd.to_datetime(pd.Series(fechas), errors='coerce').dropna().dt.to_period('M'))
+    for mes in _meses_sin_particion(tabla, meses):
+        try:
+            with get_engine().begin() as conn:
+                conn.execute(text(_ddl_particion(tabla, mes)))
+        except Exception:
+            # La DEFAULT ya tiene filas de ese mes: la carga también cae ahí
+            avisos.advertencia(f"⚠️ No se creó la partición {_nombre_particion(tabla, mes)}; "
+                               f"las filas de {mes} quedan en {tabla}_default.")
+
+
+# ============================================================
+# ARCHIVO DE AÑOS CERRADOS (Parquet)
+# ============================================================
+def anios_archivados(tabla):
+    """{anio: ruta} de los años de `tabla` que están en el archivo."""
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_ARCHIVO):
+        return {}
+    df = run_query("SELECT anio, ruta FROM archivo_anios WHERE tabla = :t", {"t": tabla})
+    return {} if df.empty else dict(zip(df['anio'].astype(int), df['ruta']))
+
+
+def resumen_archivo():
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_ARCHIVO):
+        return pd.DataFrame()
+    return run_query("SELECT tabla, anio, filas, conservadas, ruta, archivado FROM archivo_anios ORDER BY 1, 2")
+
+
+def _rango_anio(anio):
+    return {"i": f"{anio}-01-01", "fs": dia_siguiente(f"{anio}-12-31")}
+
+
+def _exportar_anio(tabla, anio, destino, chunksize=100_000):
+    """Escribe las filas del año en `destino` (dataset Parquet zstd, particiones mes/local)."""
+    import pyarrow.dataset as pads
+
+    from .espejo import _particionado, _tabla_espejo
+
+    col = TABLAS_PARTICIONABLES[tabla]
+    tmp = destino + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    opciones = pads.ParquetFileFormat().make_write_options(compression='zstd')
+    n = 0
+    for k, chunk in enumerate(run_query_stream(
+            f"SELECT * FROM {tabla} WHERE {col} >= :i AND {col} < :fs", _rango_anio(anio), chunksize=chunksize)):
+        tbl = _tabla_espejo(chunk, tabla)
+        pads.write_dataset(tbl, tmp, format="parquet", partitioning=_particionado(),
+                           basename_template=f"part-{k}-{{i}}.parquet", file_options=opciones,
+                           existing_data_behavior="overwrite_or_ignore")
+        n += tbl.num_rows
+    if n:
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(tmp, destino)
+    return n
+
+
+def _ultimas_compras(anio):
+    """Última compra de cada SKU cuando cae en `anio` (la que define el precio vigente)."""
+    return run_query("""
+        SELECT * FROM (
+            SELECT DISTINCT ON (sku) *, monto_real / NULLIF(cant_conv, 0) AS precio_unitario_
+            FROM compras
+            WHERE cant_conv > 0
+            ORDER BY sku, fecha_dte DESC, precio_unitario_ DESC NULLS LAST
+        ) t
+        WHERE fecha_dte >= :i AND fecha_dte < :fs
+    """, _rango_anio(anio)).drop(columns='precio_unitario_', errors='ignore')
+
+
+def _quitar_anio(conn, tabla, anio):
+    """Saca el año de la tabla caliente: DROP de sus particiones (si hay) y DELETE del resto."""
+    col = TABLAS_PARTICIONABLES[tabla]
+    existentes = set(particiones(tabla))
+    for mes in pd.period_range(f"{anio}-01", f"{anio}-12", freq='M'):
+        nombre = _nombre_particion(tabla, mes)
+        if nombre in existentes:
+            conn.execute(text(f"ALTER TABLE {tabla} DETACH PARTITION {nombre}"))
+            conn.execute(text(f"DROP TABLE {nombre}"))
+    conn.execute(text(f"DELETE FROM {tabla} WHERE {col} >= :i AND {col} < :fs"), _rango_anio(anio))
+
+
+def archivar(anio, tablas=('compras', 'ventas'), hoy=None):
+    """
+    Archiva el año cerrado `anio` de `tablas`. Devuelve {tabla: filas archivadas}.
+    ValueError si el año no está cerrado.
+    """
+    from .espejo import resincronizar_espejo
+    from .snapshots import generar_snapshots
+
+    anio = int(anio)
+    if anio >= (hoy or date.today()).year:
+        raise ValueError(f"{anio} no es un año cerrado")
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, ESQUEMA_ARCHIVO):
+        return {}
+
+    # Los meses archivados se sirven desde snapshot en los Informes 1 y 2
+    generar_snapshots(f"{anio}-01", f"{anio}-12", hoy=hoy)
+
+    hechos = {}
+    for tabla in tablas:
+        if anio in anios_archivados(tabla):
+            continue
+        destino = os.path.join(archivo_dir(), tabla, f"anio={anio}")
+        with medir(f"archivo: {tabla} {anio}") as m:
+            n = _exportar_anio(tabla, anio, destino)
+            m['filas_out'] = n
+        if not n:
+            continue
+        conservar = _ultimas_compras(anio) if tabla == 'compras' else pd.DataFrame()
+        with engine.begin() as conn:
+            _quitar_anio(conn, tabla, anio)
+            if not conservar.empty:
+                conservar.to_sql(tabla, conn, if_exists='append', index=False)
+            conn.execute(text(
+                "INSERT INTO archivo_anios (tabla, anio, filas, conservadas, ruta, archivado) "
+                "VALUES (:t, :a, :n, :c, :r, :g)"
+            ), {"t": tabla, "a": anio, "n": n, "c": len(conservar), "r": destino, "g": datetime.now()})
+        hechos[tabla] = n
+        resincronizar_espejo(tabla, f"{anio}-01-01", f"{anio}-12-31")
+    return hechos
+
+
+def leer_archivo(tabla, columnas, fecha_i=None, fecha_f=None, filas_lote=100_000):
+    """DataFrames (por lotes) de las filas archivadas de `tabla` en el rango, con poda por mes."""
+    import pyarrow.dataset as pads
+
+    from .espejo import FECHA_ESPEJO, _particionado
+
+    fecha = FECHA_ESPEJO[tabla]
+    for anio, ruta in sorted(anios_archivados(tabla).items()):
+        if (fecha_i is not None and anio < pd.Timestamp(fecha_i).year) or \
+           (fecha_f is not None and anio > pd.Timestamp(fecha_f).year) or not os.path.isdir(ruta):
+            continue
+        ds = pads.dataset(ruta, format="parquet", partitioning=_particionado())
+        expr = None
+        if fecha_i is not None:
+            expr = pads.field("mes") >= pd.Timestamp(fecha_i).strftime('%Y-%m')
+        if fecha_f is not None:
+            fin = pads.field("mes") <= pd.Timestamp(fecha_f).strftime('%Y-%m')
+            expr = fin if expr is None else expr & fin
+        for lote in ds.to_batches(columns=columnas, filter=expr, batch_size=filas_lote):
+            if lote.num_rows:
+                df = lote.to_pandas()
+                if fecha in df.columns and (fecha_i is not None or fecha_f is not None):
+                    f = pd.to_datetime(df[fecha])
+                    ok = pd.Series(True, index=df.index)
+                    if fecha_i is not None:
+                        ok &= f >= pd.Timestamp(fecha_i)
+                    if fecha_f is not None:
+                        ok &= f < pd.Timestamp(dia_siguiente(fecha_f))
+                    df = df[ok]
+                yield df
+
+
+def restaurar(anio, tablas=('compras', 'ventas')):
+    """Devuelve a la base un año archivado (reemplaza las filas conservadas). {tabla: filas}."""
+    from .espejo import COLS_ESPEJO, resincronizar_espejo
+
+    engine = get_engine()
+    if engine is None:
+        return {}
+    anio = int(anio)
+    hechos = {}
+    for tabla in tablas:
+        if anio not in anios_archivados(tabla):
+            continue
+        col = TABLAS_PARTICIONABLES[tabla]
+        meses = pd.period_range(f"{anio}-01", f"{anio}-12", freq='M')
+        faltan = _meses_sin_particion(tabla, meses) if es_particionada(tabla) else []
+        n = 0
+        try:
+            with engine.begin() as conn:
+                # Primero las filas conservadas, que quedaron en la DEFAULT: mientras
+                # estén ahí Postgres no deja crear las particiones de sus meses
+                conn.execute(text(f"DELETE FROM {tabla} WHERE {col} >= :i AND {col} < :fs"), _rango_anio(anio))
+                for mes in faltan:
+                    conn.execute(text(_ddl_particion(tabla, mes)))
+                for df in leer_archivo(tabla, COLS_ESPEJO[tabla], f"{anio}-01-01", f"{anio}-12-31"):
+                    df.to_sql(tabla, conn, if_exists='append', index=False)
+                    n += len(df)
+                conn.execute(text("DELETE FROM archivo_anios WHERE tabla = :t AND anio = :a"), {"t": tabla, "a": anio})
+        except Exception as e:
+            avisos.error(f"Error al restaurar {tabla} {anio}: {e}")
+            continue
+        hechos[tabla] = n
+        resincronizar_espejo(tabla, f"{anio}-01-01", f"{anio}-12-31")
+    return hechos
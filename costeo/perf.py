@@ -0,0 +1,93 @@
+import contextvars
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+
+# ============================================================
+# INSTRUMENTACIÓN
+# medir(etapa) cronometra un bloque y registra filas de entrada/salida y
+# bytes; cada etapa sale como log JSON (logger "mrp.perf") y, si hay una
+# traza activa (iniciar_traza), se acumula para el expander "Performance"
+# de la app. Handler y nivel del logger los configuran app.py y cli.main.
+# ============================================================
+log_perf = logging.getLogger("mrp.perf")
+
+_traza_actual = contextvars.ContextVar("traza_actual", default=None)
+_nivel_etapa  = contextvars.ContextVar("nivel_etapa", default=0)
+
+
+def _filas(obj):
+    return int(len(obj)) if obj is not None else None
+
+
+def _bytes_df(df):
+    return int(df.memory_usage(index=False, deep=True).sum()) if isinstance(df, pd.DataFrame) else None
+
+
+@contextmanager
+def medir(etapa, filas_in=None):
+    """
+    Cronometra el bloque. El registro entregado admite 'filas_out' y 'bytes':
+
+        with medir("merge directos", filas_in=len(df)) as m:
+            out = ...
+            m['filas_out'] = len(out)
+    """
+    traza = _traza_actual.get()
+    nivel = _nivel_etapa.get()
+    reg = {'etapa': etapa, 'nivel': nivel, 'filas_in': filas_in, 'filas_out': None, 'bytes': None}
+    if traza is not None:
+        traza['etapas'].append(reg)
+    token = _nivel_etapa.set(nivel + 1)
+    t0 = time.perf_counter()
+    try:
+        yield reg
+    finally:
+        reg['ms'] = round((time.perf_counter() - t0) * 1000, 2)
+        _nivel_etapa.reset(token)
+        _emitir(traza, reg)
+
+
+def registrar(etapa, ms, filas_in=None, filas_out=None, bytes=None):
+    """Registra una etapa cronometrada por fuera de medir (p. ej. un stream consumido por bloques)."""
+    traza = _traza_actual.get()
+    reg = {'etapa': etapa, 'nivel': _nivel_etapa.get(), 'filas_in': filas_in,
+           'filas_out': filas_out, 'bytes': bytes, 'ms': round(ms, 2)}
+    if traza is not None:
+        traza['etapas'].append(reg)
+    _emitir(traza, reg)
+
+
+def _emitir(traza, reg):
+    log_perf.info(json.dumps({
+        'evento': 'etapa', 'traza': traza['nombre'] if traza else None, **reg
+    }, ensure_ascii=False, default=str))
+
+
+def incorporar_etapas(etapas):
+    """Agrega a la traza activa etapas medidas en otro hilo (p. ej. un informe precalculado)."""
+    traza = _traza_actual.get()
+    if traza is not None:
+        traza['etapas'].extend(etapas)
+
+
+def iniciar_traza(nombre):
+    """Activa una traza para el resto del rerun; se cierra con cerrar_traza."""
+    traza = {'nombre': nombre, 'etapas': [], 't0': time.perf_counter()}
+    _traza_actual.set(traza)
+    _nivel_etapa.set(0)
+    return traza
+
+
+def cerrar_traza(traza):
+    """Desactiva la traza y emite su log resumen. Devuelve el total en ms."""
+    _traza_actual.set(None)
+    total_ms = round((time.perf_counter() - traza['t0']) * 1000, 2)
+    log_perf.info(json.dumps({
+        'evento': 'traza', 'traza': traza['nombre'], 'ms': total_ms, 'etapas': len(traza['etapas'])
+    }, ensure_ascii=False))
+    return total_ms
@@ -0,0 +1,214 @@
+"""
+Altas en la base. Cada función devuelve True si guardó y avisa el resultado
+por costeo.avisos.
+
+    save_recetario   reemplaza la tabla recetas
+    save_compras     append (antes crea las particiones de sus meses, si está particionada)
+    save_ventas      append (ídem)
+
+Confirmada el alta, corre el mantenimiento de cada una:
+
+    recetario   caché compartida (recetas, catálogo), costo_platos, catalogo_sku,
+                libro de inventario
+    compras     espejo Parquet, snapshots de sus meses, caché compartida (precios,
+                catálogo), costo_platos y catalogo_sku de sus SKUs, inventario,
+                CPP (costeo.cpp), estadísticas de precio (costeo.anomalias)
+    ventas      espejo Parquet, snapshots de sus meses, inventario
+
+Un paso que falla se avisa como advertencia y no corta los demás. Al final la
+versión de datos (costeo.concurrencia) sube siempre: los informes
+precalculados o en curso con la versión anterior ya no se reutilizan.
+"""
+import pandas as pd
+from sqlalchemy import text
+
+from . import avisos
+from .anomalias import actualizar_estadisticas
+from .catalogo import actualizar_catalogo
+from .compartido import publicar_tablas
+from .concurrencia import datos_cambiaron
+from .costos import recalcular_costos
+from .cpp import actualizar_cpp
+from .db import get_engine
+from .espejo import sync_espejo
+from .inventario import reconstruir_inventario, registrar_compras, registrar_consumo
+from .particiones import asegurar_particiones
+from .recetario import indexar_recetas
+from .snapshots import invalidar_snapshots
+
+
+# ============================================================
+# PERSISTENCIA
+# ============================================================
+def _mantener(*pasos):
+    """
+    Corre los pasos de mantenimiento de un alta ya confirmada: (acción, fn,
+    *args). Uno que falla se avisa y no corta los siguientes; la versión de
+    datos sube siempre, aunque falle alguno.
+    """
+    try:
+        for accion, fn, *args in pasos:
+            try:
+                fn(*args)
+            except Exception as e:
+                avisos.advertencia(f"⚠️ Los datos se guardaron, pero no se pudo {accion} ({e}).")
+    finally:
+        datos_cambiaron()
+
+
+def save_recetario(df_directos, df_procesados):
+    engine = get_engine()
+    if engine is None:
+        return False
+
+    df_dir = df_directos.copy()
+    df_dir.columns = df_dir.columns.str.strip()
+    df_dir = df_dir.rename(columns={
+        'CODIGO VENTA': 'codigo_venta', 'Plato': 'nombre_plato',
+        'SKU': 'sku_ingrediente', 'Ingrediente': 'nombre_ingrediente',
+        'CantReal': 'cant_real', 'Eficiencia': 'rendimiento',
+        'UM': 'um_salida', 'EsOpcion': 'es_opcion'
+    })
+    df_dir['es_procesado'] = False
+    df_dir['cant_efic'] = None
+    df_dir['porcion'] = 0
+
+    df_proc = df_procesados.copy()
+    df_proc.columns = df_proc.columns.str.strip()
+    # Detectar columna porcion con cualquier variación de nombre o espacios
+    col_porcion = next((c for c in df_proc.columns if c.strip().lower() == 'porcion'), None)
+    rename_map = {
+        'Codigo Venta': 'codigo_venta', 'Ingrediente Proc': 'nombre_plato',
+        'SKU Ingrediente': 'sku_ingrediente', 'Ingrediente': 'nombre_ingrediente',
+        'CantReceta': 'cant_real', 'CantEfic': 'cant_efic',
+        'UM Salida': 'um_salida', 'Eficiencia': 'rendimiento'
+    }
+    if col_porcion:
+        rename_map[col_porcion] = 'porcion'
+    df_proc = df_proc.rename(columns=rename_map)
+    df_proc['es_procesado'] = True
+    df_proc['es_opcion'] = 0
+    if 'porcion' not in df_proc.columns:
+        df_proc['porcion'] = 0
+
+    cols_base = ['codigo_venta', 'nombre_plato', 'sku_ingrediente', 'nombre_ingrediente',
+                 'cant_real', 'cant_efic', 'rendimiento', 'um_salida', 'es_procesado', 'es_opcion', 'porcion']
+
+    df_final = pd.concat([df_dir, df_proc], ignore_index=True)
+    cols = [c for c in cols_base if c in df_final.columns]
+    df_final['rendimiento'] = pd.to_numeric(df_final['rendimiento'], errors='coerce').fillna(1)
+    df_final['cant_real'] = pd.to_numeric(df_final['cant_real'], errors='coerce').fillna(0)
+    df_final['cant_efic'] = pd.to_numeric(df_final['cant_efic'], errors='coerce').fillna(0)
+
+    # Consolidar duplicados: mismo ingrediente en el mismo plato → sumar cantidades
+    df_final = df_final[cols].copy()
+    agg_dict = {
+        'nombre_plato':      'first',
+        'nombre_ingrediente':'first',
+        'cant_real':         'sum',
+        'cant_efic':         'sum',
+        'rendimiento':       'first',
+        'um_salida':         'first',
+        'es_opcion':         'first'
+    }
+    if 'porcion' in df_final.columns:
+        agg_dict['porcion'] = 'first'
+
+    df_agg = df_final.groupby(
+        ['codigo_venta', 'sku_ingrediente', 'es_procesado'],
+        as_index=False
+    ).agg(agg_dict)
+
+    # cols final solo con columnas que existen en df_agg
+    cols = [c for c in cols_base if c in df_agg.columns]
+
+    duplicados = len(df_final) - len(df_agg)
+    if duplicados > 0:
+        avisos.advertencia(f"⚠️ Se consolidaron {duplicados} filas duplicadas (mismo SKU en mismo plato).")
+
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("DROP VIEW IF EXISTS vista_costo_recetas CASCADE"))
+            conn.commit()
+        df_agg[cols].to_sql('recetas', engine, if_exists='replace', index=False)
+        indexar_recetas(engine)
+        avisos.exito(f"✅ Recetario sincronizado — {len(df_agg)} filas únicas cargadas.")
+    except Exception as e:
+        avisos.error(f"Error al guardar recetario: {e}")
+        return False
+    _mantener(
+        ("publicar el recetario en la caché compartida", publicar_tablas, 'recetas'),
+        ("recalcular costo_platos", recalcular_costos),
+        ("actualizar catalogo_sku", actualizar_catalogo),
+        ("publicar el catálogo en la caché compartida", publicar_tablas, 'catalogo'),
+        ("reconstruir el libro de inventario", reconstruir_inventario),
+    )
+    return True
+
+
+def save_compras(df: pd.DataFrame):
+    """Guarda el DataFrame ya procesado en la tabla compras de Supabase."""
+    engine = get_engine()
+    if engine is None:
+        return False
+    cols_req = [
+        'local', 'fecha_dte', 'rut_proveedor', 'nombre_proveedor', 'tipo_dte',
+        'folio', 'nombre_producto', 'sku', 'subcat', 'codigo_impuesto',
+        'cantidad', 'conversion', 'formato', 'categoria_producto',
+        'cant_conv', 'monto_real', 'recargo2', 'total_neto2',
+        'imp_adic', 'iva_2', 'tootal2', 'costo_realfinal', 'muc'
+    ]
+    # Sólo guardar columnas que existen en el df
+    cols_ok = [c for c in cols_req if c in df.columns]
+    asegurar_particiones('compras', df.get('fecha_dte'))
+    try:
+        df[cols_ok].to_sql('compras', engine, if_exists='append', index=False)
+        avisos.exito(f"✅ {len(df)} registros de compras guardados en la base de datos.")
+    except Exception as e:
+        avisos.error(f"Error al guardar compras: {e}")
+        return False
+    pasos = [
+        ("actualizar el espejo Parquet", sync_espejo, 'compras', df[cols_ok]),
+        ("invalidar los snapshots", invalidar_snapshots, 'compras', df.get('fecha_dte')),
+        ("publicar los precios en la caché compartida", publicar_tablas, 'precios'),
+    ]
+    if 'sku' in df.columns:
+        pasos += [
+            ("recalcular costo_platos", recalcular_costos, df['sku']),
+            ("actualizar catalogo_sku", actualizar_catalogo, df['sku']),
+            ("publicar el catálogo en la caché compartida", publicar_tablas, 'catalogo'),
+        ]
+    _mantener(
+        *pasos,
+        ("registrar las compras en el inventario", registrar_compras, df),
+        ("actualizar el costo promedio ponderado", actualizar_cpp, df),
+        ("actualizar las estadísticas de precio", actualizar_estadisticas, df),
+    )
+    return True
+
+
+def save_ventas(df):
+    engine = get_engine()
+    if engine is None:
+        return False
+    df.columns = df.columns.str.strip().str.lower()
+    df = df.rename(columns={
+        'fecha_pura': 'fecha_venta', 'cat_menu': 'categoria_menu',
+        'nombre': 'nombre_producto', 'id_producto': 'sku_producto',
+        'cantidad': 'cantidad_vendida', 'venta_real': 'monto_venta_real'
+    })
+    df['fecha_venta'] = pd.to_datetime(df['fecha_venta'], dayfirst=True, errors='coerce').dt.date
+    df = df.dropna(subset=['fecha_venta'])
+    asegurar_particiones('ventas', df['fecha_venta'])
+    try:
+        df.to_sql('ventas', engine, if_exists='append', index=False, method='multi')
+        avisos.exito(f"✅ {len(df)} registros de ventas cargados.")
+    except Exception as e:
+        avisos.error(f"Error al guardar ventas: {e}")
+        return False
+    _mantener(
+        ("actualizar el espejo Parquet", sync_espejo, 'ventas', df),
+        ("invalidar los snapshots", invalidar_snapshots, 'ventas', df['fecha_venta']),
+        ("registrar el consumo en el inventario", registrar_consumo, df),
+    )
+    return True
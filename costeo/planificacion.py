@@ -0,0 +1,169 @@
+"""
+Planificación: pronóstico de ventas por plato y local, y sugerencia de compra.
+
+Pronóstico: suavizado exponencial estacional semanal. Para cada serie
+(local, plato) y cada día de la semana, el pronóstico es el promedio
+ponderado de ese mismo día en las últimas `semanas` semanas, con pesos
+α(1-α)^antigüedad normalizados (α = 1 equivale al naive estacional: mismo
+día de la semana pasada). Todas las series se calculan a la vez sobre un
+arreglo series × semanas × 7.
+
+Requerimiento: el pronóstico se explota con la receta aplanada
+(informes.receta_plana, mismo criterio que el Informe 2) en una sola
+multiplicación locales × platos · platos × ingredientes.
+
+Neteo contra compras recientes: de lo comprado ('Directo', con equivalencias)
+en los últimos `dias_compras` días se descuenta el consumo teórico de esos
+mismos días; lo que queda es el disponible estimado.
+
+    sugerido = max(requerido − max(disponible, 0), 0)
+"""
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from .compartido import recetas
+from .costos import precios_vigentes
+from .db import dia_siguiente, run_query
+from .equivalencias import aplicar_equivalencias
+from .informes import receta_plana
+from .perf import medir
+
+
+def _ventas_ventana(desde, hasta, local):
+    filtro_local = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(desde), "f": str(hasta)}
+    if local != "Todos":
+        params["l"] = local
+    return run_query(f"""
+        SELECT COALESCE(UPPER(local), '') AS local, fecha_venta, sku_producto,
+               MIN(nombre_producto) AS nombre_producto, SUM(cantidad_vendida) AS cant
+        FROM ventas
+        WHERE fecha_venta BETWEEN :i AND :f
+        {filtro_local}
+        GROUP BY 1, 2, 3
+    """, params)
+
+
+def _compras_recientes(desde, hasta, local):
+    filtro_local = "AND UPPER(local) = UPPER(:l)" if local != "Todos" else ""
+    params = {"i": str(desde), "fs": dia_siguiente(hasta)}
+    if local != "Todos":
+        params["l"] = local
+    df = run_query(f"""
+        SELECT COALESCE(UPPER(local), '') AS local, sku, SUM(cant_conv) AS comprado
+        FROM compras
+        WHERE fecha_dte >= :i AND fecha_dte < :fs
+          AND subcat = 'Directo'
+        {filtro_local}
+        GROUP BY 1, 2
+    """, params)
+    if df.empty:
+        return pd.DataFrame(columns=['local', 'sku_ingrediente', 'comprado'])
+    df['sku_ingrediente'] = aplicar_equivalencias(df['sku']).to_numpy()
+    return df.groupby(['local', 'sku_ingrediente'], as_index=False)['comprado'].sum()
+
+
+def pesos_suavizado(semanas, alfa):
+    """Pesos por semana (la más antigua primero) que suman 1."""
+    w = alfa * (1 - alfa) ** np.arange(semanas - 1, -1, -1, dtype=float)
+    return w / w.sum()
+
+
+def planificar(hasta=None, local="Todos", semanas=8, alfa=0.5, horizonte=7, dias_compras=7):
+    """
+    Devuelve (pronostico, sugerencia):
+      pronostico — local, sku_producto, nombre_producto, fecha, cant_pronosticada
+                   para los `horizonte` días siguientes a `hasta`.
+      sugerencia — por local e ingrediente: requerido, comprado y consumo de los
+                   últimos `dias_compras` días, disponible, sugerido y monto.
+    `hasta` es el último día de historia (por defecto, la última venta).
+    """
+    if hasta is None:
+        ult = run_query("SELECT MAX(fecha_venta) AS f FROM ventas")
+        if ult.empty or pd.isna(ult['f'].iloc[0]):
+            return pd.DataFrame(), pd.DataFrame()
+        hasta = ult['f'].iloc[0]
+    hasta = pd.Timestamp(hasta).normalize()
+    desde = hasta - timedelta(days=7 * semanas - 1)
+
+    df_v = _ventas_ventana(desde.date(), hasta.date(), local).dropna(subset=['sku_producto'])
+    df_rec = recetas()
+    if df_v.empty or df_rec.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    # ---- Pronóstico: series × semanas × día de la semana ----
+    with medir("planificación: pronóstico", filas_in=len(df_v)) as m:
+        i_serie, series = pd.factorize(pd.MultiIndex.from_frame(df_v[['local', 'sku_producto']]))
+        dia = (pd.to_datetime(df_v['fecha_venta']) - desde).dt.days.to_numpy()
+        Y = np.zeros((len(series), semanas, 7))
+        np.add.at(Y, (i_serie, dia // 7, dia % 7), pd.to_numeric(df_v['cant'], errors='coerce').fillna(0).to_numpy())
+
+        por_dia = np.einsum('swd,w->sd', Y, pesos_suavizado(semanas, alfa))    # (series, 7)
+        futuros = pd.date_range(hasta + timedelta(days=1), periods=horizonte, freq='D')
+        P = por_dia[:, np.arange(horizonte) % 7]                              # (series, horizonte)
+
+        nombres_v = df_v.groupby(['local', 'sku_producto'])['nombre_producto'].first()
+        locales_s = series.get_level_values(0).to_numpy()
+        platos_s = series.get_level_values(1).to_numpy()
+        pronostico = pd.DataFrame({
+            'local': np.repeat(locales_s, horizonte),
+            'sku_producto': np.repeat(platos_s, horizonte),
+            'nombre_producto': np.repeat(nombres_v.reindex(series).to_numpy(), horizonte),
+            'fecha': np.tile(futuros.date, len(series)),
+            'cant_pronosticada': P.ravel(),
+        })
+        m['filas_out'] = len(pronostico)
+
+    # ---- Explosión: (locales × platos) · (platos × ingredientes) ----
+    with medir("planificación: explosión requerimiento") as m:
+        plana = receta_plana(df_rec)
+        plana = plana[plana['codigo_venta'].isin(platos_s)]
+        i_loc, locales = pd.factorize(locales_s)
+        i_pla, platos = pd.factorize(platos_s)
+        platos = pd.Index(platos)
+        j_ing, ingredientes = pd.factorize(plana['sku_ingrediente'])
+        F = np.zeros((len(platos), len(ingredientes)))
+        np.add.at(F, (platos.get_indexer(plana['codigo_venta']), j_ing), plana['coef'].to_numpy())
+
+        Q_pron = np.zeros((len(locales), len(platos)))
+        np.add.at(Q_pron, (i_loc, i_pla), P.sum(axis=1))
+        # Ventas de los últimos dias_compras días, para el consumo que ya se llevó lo comprado
+        ult = np.arange(7 * semanas)[-dias_compras:]
+        Q_rec = np.zeros((len(locales), len(platos)))
+        np.add.at(Q_rec, (i_loc, i_pla), Y.reshape(len(series), -1)[:, ult].sum(axis=1))
+
+        requerido = Q_pron @ F
+        consumo_rec = Q_rec @ F
+        sug = pd.DataFrame({
+            'local': np.repeat(locales, len(ingredientes)),
+            'sku_ingrediente': np.tile(ingredientes.to_numpy(), len(locales)),
+            'requerido': requerido.ravel(),
+            'consumo_reciente': consumo_rec.ravel(),
+        })
+        sug = sug[(sug['requerido'] > 0) | (sug['consumo_reciente'] > 0)]
+        m['filas_out'] = len(sug)
+
+    # ---- Neteo contra compras recientes y valorización ----
+    with medir("planificación: neteo y valorización") as m:
+        inicio_compras = hasta - timedelta(days=dias_compras - 1)
+        compras = _compras_recientes(inicio_compras.date(), hasta.date(), local)
+        sug = sug.merge(compras, on=['local', 'sku_ingrediente'], how='left')
+        sug['comprado'] = sug['comprado'].fillna(0)
+        sug['disponible'] = sug['comprado'] - sug['consumo_reciente']
+        sug['sugerido'] = (sug['requerido'] - sug['disponible'].clip(lower=0)).clip(lower=0)
+
+        nombres = plana.drop_duplicates('sku_ingrediente').set_index('sku_ingrediente')['nombre_ingrediente']
+        sug.insert(2, 'nombre_ingrediente', sug['sku_ingrediente'].map(nombres))
+        precios = precios_vigentes()
+        if not precios.empty:
+            sug = sug.merge(precios[['sku', 'precio_unitario']].rename(columns={'sku': 'sku_ingrediente'}),
+                            on='sku_ingrediente', how='left')
+        else:
+            sug['precio_unitario'] = np.nan
+        sug['monto_estimado'] = sug['sugerido'] * sug['precio_unitario'].fillna(0)
+        sug = sug.sort_values(['local', 'monto_estimado'], ascending=[True, False], ignore_index=True)
+        m['filas_out'] = len(sug)
+
+    return pronostico, sug
@@ -0,0 +1,151 @@
+"""
+Precarga al arrancar y precálculo especulativo de informes.
+
+calentar() abre conexiones del pool y carga las cachés en memoria del
+proceso (catálogo, equivalencias, receta aplanada, índice de dependencias)
+y las tablas que lee el Informe 1 (precios, costo_platos), para que el
+primer usuario después de un deploy no pague todo eso.
+iniciar_calentamiento() lo corre una vez por proceso en un hilo aparte.
+
+anticipar(fn, *args) empieza a calcular un informe en segundo plano (la app
+lo llama al cambiar los filtros si está activado el precálculo);
+obtener(fn, *args) devuelve ese resultado si ya está (o espera a que
+termine) y si no calcula en el momento. Los avisos del cálculo se muestran
+al obtenerlo y sus etapas se suman a la traza activa. Los resultados
+vencen a los TTL_ANTICIPO segundos y dejan de valer al guardar datos
+(van con la versión de datos de costeo.concurrencia). Tanto el precálculo
+como el cálculo en el momento pasan por concurrencia.ejecutar_unico: se
+suman a un cálculo idéntico en curso y respetan el cupo de informes.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import avisos
+from .compartido import recetas
+from .concurrencia import clave_pedido, ejecutar_unico, version_datos
+from .db import get_engine
+from .perf import cerrar_traza, incorporar_etapas, iniciar_traza, medir
+
+CONEXIONES_CALENTAR = 3
+TTL_ANTICIPO = 300       # segundos
+MAX_ANTICIPOS = 8
+
+_log = logging.getLogger("mrp")
+_lock = threading.Lock()
+_calentamiento = None
+_ejecutor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="mrp-anticipo")
+_anticipos = {}          # clave → (creado, future)
+
+
+# ============================================================
+# PRECARGA AL ARRANCAR
+# ============================================================
+def calentar(conexiones=CONEXIONES_CALENTAR):
+    """Abre `conexiones` del pool y carga las cachés del proceso. Devuelve {etapa: ms}."""
+    from .catalogo import catalogo
+    from .costos import indice_dependencias, leer_costos_platos, precios_vigentes
+    from .equivalencias import mapa_equivalencias
+    from .informes import receta_plana
+
+    engine = get_engine()
+    if engine is None:
+        return {}
+    tiempos = {}
+
+    def paso(etapa, fn):
+        t0 = time.perf_counter()
+        try:
+            with medir(f"precarga: {etapa}"):
+                fn()
+        except Exception as e:
+            _log.warning(f"Precarga {etapa}: {e}")
+        tiempos[etapa] = round((time.perf_counter() - t0) * 1000, 2)
+
+    def abrir_conexiones():
+        abiertas = []
+        try:
+            for _ in range(conexiones):
+                conn = engine.connect()
+                abiertas.append(conn)
+                conn.exec_driver_sql("SELECT 1")
+        finally:
+            for conn in abiertas:
+                conn.close()          # vuelven al pool ya establecidas
+
+    def recetario():
+        df_rec = recetas()
+        if not df_rec.empty:
+            receta_plana(df_rec)
+            indice_dependencias(df_rec)
+
+    with avisos.capturar() as capturados:
+        paso("conexiones", abrir_conexiones)
+        paso("recetario", recetario)
+        paso("precios", precios_vigentes)
+        paso("costo_platos", leer_costos_platos)
+        paso("catálogo", catalogo)
+        paso("equivalencias", mapa_equivalencias)
+    for _, msg in capturados:
+        _log.info(f"Precarga: {msg}")
+    return tiempos
+
+
+def iniciar_calentamiento():
+    """Lanza calentar() en un hilo, una sola vez por proceso."""
+    global _calentamiento
+    with _lock:
+        if _calentamiento is None:
+            _calentamiento = threading.Thread(target=calentar, name="mrp-calentamiento")
+            _calentamiento.start()
+    return _calentamiento
+
+
+# ============================================================
+# PRECÁLCULO ESPECULATIVO
+# ============================================================
+def _calcular(fn, args):
+    traza = iniciar_traza(f"anticipo {fn.__name__}")
+    try:
+        with avisos.capturar() as capturados:
+            resultado = ejecutar_unico(fn, *args)
+    finally:
+        cerrar_traza(traza)     # el hilo del ejecutor se reutiliza: no dejarle la traza puesta
+    return resultado, capturados, traza['etapas']
+
+
+def _vigente(clave, entrada):
+    creado, futuro = entrada
+    return (clave[-1] == version_datos() and time.monotonic() - creado < TTL_ANTICIPO
+            and not (futuro.done() and futuro.exception()))
+
+
+def anticipar(fn, *args):
+    """Empieza a calcular fn(*args) en segundo plano si no está ya calculado o en curso."""
+    clave = clave_pedido(fn, args)
+    with _lock:
+        for vieja in [c for c, e in _anticipos.items() if not _vigente(c, e)]:
+            del _anticipos[vieja]
+        if clave in _anticipos:
+            return
+        while len(_anticipos) >= MAX_ANTICIPOS:
+            _anticipos.pop(next(iter(_anticipos)))
+        _anticipos[clave] = (time.monotonic(), _ejecutor.submit(_calcular, fn, args))
+
+
+def obtener(fn, *args, al_esperar=None):
+    """
+    Resultado de fn(*args): el precalculado si ya está; si no, calculado
+    ahora (o esperando el mismo cálculo en curso). al_esperar(posicion)
+    como en concurrencia.ejecutar_unico.
+    """
+    clave = clave_pedido(fn, args)
+    with _lock:
+        entrada = _anticipos.get(clave)
+    if entrada is None or not _vigente(clave, entrada) or not entrada[1].done():
+        return ejecutar_unico(fn, *args, al_esperar=al_esperar)
+    resultado, capturados, etapas = entrada[1].result()
+    avisos.reemitir(capturados)
+    incorporar_etapas(etapas)
+    return resultado.copy() if hasattr(resultado, 'copy') else resultado
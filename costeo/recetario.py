@@ -0,0 +1,81 @@
+"""
+Navegación del recetario por páginas, con búsqueda en la base.
+
+Paginación por clave (keyset): cada página pide las filas siguientes a la
+última clave mostrada, (codigo_venta, sku_ingrediente, es_procesado), sobre
+el índice idx_recetas_clave. No usa OFFSET ni COUNT(*), así el costo de una
+página no depende del tamaño de la tabla. es_procesado completa la clave:
+un mismo SKU puede estar como directo y como procesado en el mismo plato.
+"""
+import functools
+
+from sqlalchemy import text
+
+from .db import get_engine, run_query
+from .perf import medir
+
+COLS_NAVEGADOR = ['codigo_venta', 'nombre_plato', 'sku_ingrediente', 'nombre_ingrediente',
+                  'cant_real', 'cant_efic', 'um_salida', 'es_procesado']
+CLAVE = ['codigo_venta', 'sku_ingrediente', 'es_procesado']
+
+INDICE_RECETAS = "CREATE INDEX IF NOT EXISTS idx_recetas_clave ON recetas (codigo_venta, sku_ingrediente, es_procesado)"
+
+
+def indexar_recetas(engine=None):
+    """Crea idx_recetas_clave (save_recetario reemplaza la tabla y con ella el índice)."""
+    engine = engine or get_engine()
+    if engine is None:
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(INDICE_RECETAS))
+        return True
+    except Exception:
+        return False
+
+
+@functools.cache
+def _asegurar_indice(engine):
+    return indexar_recetas(engine)
+
+
+def _patron(texto):
+    """'%texto%' en minúsculas, con % y _ del usuario escapados."""
+    t = texto.strip().lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{t}%"
+
+
+def pagina_recetario(despues=None, plato="", ingrediente="", filas=50):
+    """
+    Una página del recetario → (df, cursor_siguiente). `despues` es la clave
+    de la última fila de la página anterior (None para la primera); `plato`
+    busca en código y nombre del plato, `ingrediente` en SKU y nombre del
+    ingrediente. cursor_siguiente es None en la última página.
+    """
+    engine = get_engine()
+    if engine is not None:
+        _asegurar_indice(engine)
+    filtros, params = [], {"n": filas + 1}
+    if despues is not None:
+        filtros.append("(codigo_venta, sku_ingrediente, es_procesado) > (:c, :s, :p)")
+        params.update(c=despues[0], s=despues[1], p=bool(despues[2]))
+    if plato.strip():
+        filtros.append("(LOWER(codigo_venta) LIKE :qp ESCAPE '\\' OR LOWER(nombre_plato) LIKE :qp ESCAPE '\\')")
+        params["qp"] = _patron(plato)
+    if ingrediente.strip():
+        filtros.append("(LOWER(sku_ingrediente) LIKE :qi ESCAPE '\\' OR LOWER(nombre_ingrediente) LIKE :qi ESCAPE '\\')")
+        params["qi"] = _patron(ingrediente)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    with medir("recetario: página") as m:
+        df = run_query(f"""
+            SELECT {', '.join(COLS_NAVEGADOR)}
+            FROM recetas
+            {where}
+            ORDER BY codigo_venta, sku_ingrediente, es_procesado
+            LIMIT :n
+        """, params)
+        m['filas_out'] = len(df)
+    if len(df) <= filas:
+        return df, None
+    df = df.iloc[:filas]
+    return df, tuple(df[CLAVE].iloc[-1])
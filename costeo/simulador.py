@@ -0,0 +1,166 @@
+"""
+Simulador de shocks de precio sobre todo el menú.
+
+Cada escenario es un conjunto de variaciones porcentuales sobre el último
+precio por SKU, acotadas por alcance:
+
+    escenario           alcance     valor          variacion_pct
+    Lácteos +15%        categoria   Lácteos        15
+    Proveedor 03 +8%    proveedor   Proveedor 03   8
+    Mix                 todos                      3
+    Mix                 sku         INS-0042       -10
+
+Las filas con el mismo nombre de escenario se componen (multiplicativo).
+El costo teórico usa el mismo criterio que calcular_costo_platos (directos
+cant_real, procesados cant_efic, G/CC/ML → /1000) como una matriz
+platos × SKUs; todos los escenarios se resuelven en un solo producto matricial:
+
+    costos (escenarios × platos) = (M ⊙ p₀) · Rᵀ
+"""
+import numpy as np
+import pandas as pd
+
+from .compartido import recetas
+from .costos import precios_vigentes
+from .informes import ventas_por_plato
+from .perf import medir
+
+ALCANCES = ('todos', 'categoria', 'proveedor', 'subcat', 'sku')
+COLS_ESCENARIOS = ['escenario', 'alcance', 'valor', 'variacion_pct']
+
+
+def matriz_recetas(df_rec):
+    """
+    (codigos, skus, R) con R[plato, sku] = cantidad × factor_um, sumando filas
+    repetidas. Mismo criterio que calcular_costo_platos.
+    """
+    es_proc = df_rec['es_procesado'].isin([True])
+    es_dir  = df_rec['es_procesado'].isin([False])
+    rec = df_rec[es_proc | es_dir]
+    cant = np.where(
+        es_proc[es_proc | es_dir],
+        pd.to_numeric(rec['cant_efic'], errors='coerce').fillna(0),
+        pd.to_numeric(rec['cant_real'], errors='coerce').fillna(0),
+    )
+    um = rec['um_salida'].astype('string').str.strip().str.upper()
+    factor = np.where(um.isin(['G', 'CC', 'ML']).fillna(False), 1 / 1000, 1.0)
+
+    i_cod, codigos = pd.factorize(rec['codigo_venta'])
+    i_sku, skus = pd.factorize(rec['sku_ingrediente'])
+    R = np.zeros((len(codigos), len(skus)))
+    validos = (i_cod >= 0) & (i_sku >= 0)
+    np.add.at(R, (i_cod[validos], i_sku[validos]), (cant * factor)[validos])
+    return pd.Index(codigos), pd.Index(skus), R
+
+
+def multiplicadores(escenarios, atributos):
+    """
+    Matriz M (escenarios × SKUs) de factores de precio. `atributos` trae una
+    fila por SKU (en el orden de la matriz) con categoria_producto, subcat,
+    nombre_proveedor y sku.
+    """
+    esc = escenarios.copy()
+    esc['escenario'] = esc['escenario'].astype(str).str.strip()
+    esc = esc[esc['escenario'] != '']
+    esc['alcance'] = esc['alcance'].fillna('todos').astype(str).str.strip().str.lower()
+    desconocidos = sorted(set(esc['alcance']) - set(ALCANCES))
+    if desconocidos:
+        raise ValueError(f"alcance desconocido: {', '.join(desconocidos)} (usar {', '.join(ALCANCES)})")
+    esc['variacion_pct'] = pd.to_numeric(esc['variacion_pct'], errors='coerce').fillna(0)
+
+    nombres = pd.Index(esc['escenario'].drop_duplicates())
+    columna = {'categoria': 'categoria_producto', 'proveedor': 'nombre_proveedor',
+               'subcat': 'subcat', 'sku': 'sku'}
+    claves = {a: atributos[c].astype('string').str.strip().str.upper().fillna('').to_numpy()
+              for a, c in columna.items()}
+
+    M = np.ones((len(nombres), len(atributos)))
+    for fila in esc.itertuples(index=False):
+        e = nombres.get_loc(fila.escenario)
+        factor = 1 + fila.variacion_pct / 100
+        if fila.alcance == 'todos':
+            M[e] *= factor
+        else:
+            M[e, claves[fila.alcance] == str(fila.valor).strip().upper()] *= factor
+    return nombres, M
+
+
+def simular(escenarios, fecha_i, fecha_f, local="Todos"):
+    """
+    Devuelve (resumen, detalle):
+      resumen — una fila por escenario: costo teórico total del período, margen
+                y variación contra el escenario base (precios vigentes).
+      detalle — escenario × plato: costo unitario base / escenario y margen.
+    Venta y cantidades salen de las ventas del período (platos sin venta
+    quedan con margen vacío).
+    """
+    df_rec = recetas()
+    df_precio = precios_vigentes()
+    if df_rec.empty or df_precio.empty:
+        return pd.DataFrame(), pd.DataFrame()
+
+    with medir("simulador: matriz recetas", filas_in=len(df_rec)) as m:
+        codigos, skus, R = matriz_recetas(df_rec)
+        atributos = pd.DataFrame({'sku': skus}).merge(df_precio, on='sku', how='left')
+        p0 = pd.to_numeric(atributos['precio_unitario'], errors='coerce').fillna(0).to_numpy()
+        m['filas_out'] = R.size
+
+    # Platos del menú: los PRO- son sub-recetas, no se venden
+    es_plato = ~codigos.astype(str).str.startswith('PRO-')
+    codigos, R = codigos[es_plato], R[es_plato]
+
+    with medir("simulador: escenarios × SKUs × recetas", filas_in=len(escenarios)) as m:
+        nombres, M = multiplicadores(escenarios, atributos)
+        costo_base = R @ p0                      # (platos,)
+        costos = (M * p0) @ R.T                  # (escenarios × platos)
+        m['filas_out'] = costos.size
+
+    df_v = ventas_por_plato(fecha_i, fecha_f, local)
+    platos = pd.DataFrame({'sku_producto': codigos, 'costo_base': costo_base})
+    if not df_v.empty:
+        ventas = df_v.groupby('sku_producto', dropna=False).agg(
+            nombre_producto=('nombre_producto', 'first'), categoria_menu=('categoria_menu', 'first'),
+            cant=('cant', 'sum'), venta=('venta', 'sum')
+        ).reset_index()
+        platos = platos.merge(ventas, on='sku_producto', how='left')
+    else:
+        platos = platos.assign(nombre_producto=None, categoria_menu=None, cant=np.nan, venta=np.nan)
+    cant = platos['cant'].fillna(0).to_numpy()
+    venta = platos['venta'].fillna(0).to_numpy()
+    precio = np.divide(venta, cant, out=np.full(len(cant), np.nan), where=cant > 0)
+
+    with medir("simulador: márgenes y resumen") as m:
+        costo_total = costos @ cant              # (escenarios,)
+        costo_total_base = float(costo_base @ cant)
+        venta_total = float(venta.sum())
+
+        def _margen(costo_total_):
+            return (venta_total - costo_total_) / venta_total * 100 if venta_total > 0 else np.nan
+
+        resumen = pd.DataFrame({
+            'escenario': nombres,
+            'costo_total': costo_total,
+            'delta_costo': costo_total - costo_total_base,
+            'delta_costo_pct': (costo_total / costo_total_base - 1) * 100 if costo_total_base else np.nan,
+            'margen_pct': [_margen(c) for c in costo_total],
+            'platos_afectados': (~np.isclose(costos, costo_base)).sum(axis=1),
+        })
+        resumen['delta_margen_pp'] = resumen['margen_pct'] - _margen(costo_total_base)
+
+        n_esc, n_pla = costos.shape
+        detalle = pd.DataFrame({
+            'escenario': np.repeat(nombres.to_numpy(), n_pla),
+            'sku_producto': np.tile(platos['sku_producto'].to_numpy(), n_esc),
+            'nombre_producto': np.tile(platos['nombre_producto'].to_numpy(), n_esc),
+            'categoria_menu': np.tile(platos['categoria_menu'].to_numpy(), n_esc),
+            'cant': np.tile(cant, n_esc),
+            'precio_venta': np.tile(precio, n_esc),
+            'costo_base': np.tile(costo_base, n_esc),
+            'costo_escenario': costos.ravel(),
+        })
+        detalle['delta_costo'] = detalle['costo_escenario'] - detalle['costo_base']
+        detalle['margen_base_pct'] = (1 - detalle['costo_base'] / detalle['precio_venta']) * 100
+        detalle['margen_escenario_pct'] = (1 - detalle['costo_escenario'] / detalle['precio_venta']) * 100
+        m['filas_out'] = len(detalle)
+
+    return resumen, detalle
@@ -0,0 +1,348 @@
+"""
+Snapshots de meses cerrados para Informe 1 y 2.
+
+Un mes anterior al mes en curso no cambia una vez cargadas sus compras y
+ventas, así que se guardan por (mes, local) las partes de los informes que
+dependen del período:
+
+    snap_ventas   ventas por plato (cant, venta)                       → Informe 1
+    snap_consumo  consumo teórico por ingrediente, por versión de recetario → Informe 2
+    snap_compras  compras 'Directo' por SKU de compra (cant, SUM/COUNT muc) → Informe 2
+
+Precios (último MUC), nombres, subcategorías y equivalencias se siguen
+resolviendo en vivo, de modo que los snapshots no quedan obsoletos cuando
+cambian. Un rango se arma con los meses cerrados que tienen snapshot y se
+calcula en vivo sólo lo restante (bordes del rango, mes abierto, meses sin
+snapshot). generar_snapshots() es el proceso nocturno (python -m costeo
+snapshots); save_compras / save_ventas invalidan los meses que tocan.
+Los meses de años archivados (costeo.particiones) conservan sus snapshots
+de ventas y compras; el consumo se recalcula leyendo las ventas del archivo.
+"""
+from datetime import date, datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from .compartido import recetas
+from .db import asegurar_tabla, dia_siguiente, get_engine, lista_in, run_query
+from .particiones import anios_archivados, leer_archivo
+from .perf import medir
+
+TIPOS = ('ventas', 'consumo', 'compras')
+
+ESQUEMA_SNAPSHOTS = [
+    """
+    CREATE TABLE IF NOT EXISTS snap_meses (
+        tipo VARCHAR, mes DATE, version_recetas VARCHAR, filas BIGINT, generado TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS snap_ventas (
+        mes DATE, local VARCHAR, sku_producto VARCHAR, nombre_producto VARCHAR,
+        categoria_menu VARCHAR, cant DOUBLE PRECISION, venta DOUBLE PRECISION
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS snap_consumo (
+        mes DATE, local VARCHAR, version_recetas VARCHAR, sku_ingrediente VARCHAR,
+        nombre_ingrediente VARCHAR, consumo_teorico DOUBLE PRECISION
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS snap_compras (
+        mes DATE, local VARCHAR, sku VARCHAR, cant_conv DOUBLE PRECISION,
+        suma_muc DOUBLE PRECISION, n_muc BIGINT
+    )
+    """,
+]
+
+# Local normalizado igual que el filtro de los informes: UPPER(local) = UPPER(:l)
+_LOCAL_SQL = "COALESCE(UPPER(local), '')"
+
+
+def _engine_snapshots():
+    engine = get_engine()
+    if engine is None or not asegurar_tabla(engine, *ESQUEMA_SNAPSHOTS):
+        return None
+    return engine
+
+
+_huellas = {}    # (attrs['version'], filas, columnas) → huella
+
+
+def version_recetas(df_rec):
+    """
+    Huella del contenido del recetario: cambia con cualquier alta o edición.
+    Se calcula una vez por versión de los datos (attrs['version'] de
+    compartido.recetas()); un frame sin versión se huellea cada vez.
+    """
+    if df_rec is None or df_rec.empty:
+        return ''
+    version = df_rec.attrs.get('version')
+    clave = (version, len(df_rec), tuple(df_rec.columns)) if version is not None else None
+    huella = _huellas.get(clave) if clave is not None else None
+    if huella is None:
+        df = df_rec.astype(str)
+        df = df.sort_values(list(df.columns), kind='mergesort')
+        huella = f"{int(pd.util.hash_pandas_object(df, index=False).sum()):016x}"
+        if clave is not None:
+            _huellas.clear()
+            _huellas[clave] = huella
+    return huella
+
+
+def meses_cerrados(fecha_i, fecha_f, hoy=None):
+    """Meses completos dentro de [fecha_i, fecha_f] anteriores al mes en curso."""
+    fi, ff = pd.Timestamp(fecha_i).normalize(), pd.Timestamp(fecha_f).normalize()
+    abierto = pd.Timestamp(hoy or date.today()).to_period('M')
+    return [m for m in pd.period_range(fi, ff, freq='M')
+            if m.start_time >= fi and m.end_time.normalize() <= ff and m < abierto]
+
+
+def _meses_con_snapshot(tipo, meses, version=''):
+    engine = _engine_snapshots()
+    if engine is None or not meses:
+        return set()
+    with engine.connect() as conn:
+        df = pd.read_sql(text(
+            "SELECT mes FROM snap_meses WHERE tipo = :t AND version_recetas = :v"
+        ), conn, params={"t": tipo, "v": version})
+    hechos = set(pd.to_datetime(df['mes']).dt.to_period('M'))
+    return {m for m in meses if m in hechos}
+
+
+def plan_periodo(fecha_i, fecha_f, tipo, version=''):
+    """
+    Devuelve (meses_snapshot, tramos_vivos): los primeros de mes servidos desde
+    snapshot y los rangos (desde, hasta) que quedan por calcular en vivo.
+    Sin snapshots aplicables devuelve ([], [(fecha_i, fecha_f)]).
+    """
+    try:
+        con_snap = sorted(_meses_con_snapshot(tipo, meses_cerrados(fecha_i, fecha_f), version))
+    except Exception:
+        con_snap = []
+    if not con_snap:
+        return [], [(fecha_i, fecha_f)]
+
+    fi, ff = pd.Timestamp(fecha_i).normalize(), pd.Timestamp(fecha_f).normalize()
+    un_dia = pd.Timedelta(days=1)
+    tramos, cursor = [], fi
+    for m in con_snap:
+        if m.start_time > cursor:
+            tramos.append((cursor.date(), (m.start_time - un_dia).date()))
+        cursor = m.end_time.normalize() + un_dia
+    if cursor <= ff:
+        tramos.append((cursor.date(), ff.date()))
+    return [m.start_time.date() for m in con_snap], tramos
+
+
+def _leer(tabla, columnas, meses, local, extra="", params=None):
+    marcas, params_m = lista_in(meses, "m")
+    params = {**(params or {}), **params_m}
+    filtro_local = ""
+    if local != "Todos":
+        filtro_local = "AND local = UPPER(:l)"
+        params["l"] = local
+    return run_query(f"""
+        SELECT {', '.join(columnas)}
+        FROM {tabla}
+        WHERE mes IN ({marcas})
+        {filtro_local}
+        {extra}
+    """, params)
+
+
+def leer_ventas(meses, local):
+    return _leer('snap_ventas', ['sku_producto', 'nombre_producto', 'categoria_menu', 'cant', 'venta'],
+                 meses, local)
+
+
+def leer_consumo(meses, local, version):
+    return _leer('snap_consumo', ['sku_ingrediente', 'nombre_ingrediente', 'consumo_teorico'],
+                 meses, local, "AND version_recetas = :v", {"v": version})
+
+
+def leer_compras(meses, local):
+    return _leer('snap_compras', ['sku', 'cant_conv', 'suma_muc', 'n_muc'], meses, local)
+
+
+def sumar(partes, claves, valores):
+    """Concatena snapshot + tramos vivos y re-agrega (SUM de SQL: NULL si todo es NULL)."""
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True)
+    return df.groupby(claves, dropna=False)[valores].sum(min_count=1).reset_index()
+
+
+def resumen_snapshots():
+    """Meses guardados por tipo (tipo, meses, desde, hasta, generado)."""
+    if _engine_snapshots() is None:
+        return pd.DataFrame()
+    return run_query("""
+        SELECT tipo, COUNT(*) AS meses, MIN(mes) AS desde, MAX(mes) AS hasta, MAX(generado) AS generado
+        FROM snap_meses
+        GROUP BY 1
+        ORDER BY 1
+    """)
+
+
+# ============================================================
+# GENERACIÓN (proceso nocturno) E INVALIDACIÓN
+# ============================================================
+def _calcular_ventas(ini, fin):
+    return run_query(f"""
+        SELECT {_LOCAL_SQL} AS local, sku_producto, nombre_producto, categoria_menu,
+               SUM(cantidad_vendida) AS cant, SUM(monto_venta_real) AS venta
+        FROM ventas
+        WHERE fecha_venta BETWEEN :i AND :f
+        GROUP BY 1, 2, 3, 4
+    """, {"i": str(ini), "f": str(fin)})
+
+
+def _ventas_archivadas(ini, fin):
+    """Mismo agregado que _calcular_consumo, desde el archivo Parquet."""
+    partes = [df.assign(local=df['local'].fillna('').str.upper())
+                .groupby(['local', 'sku_producto'])['cantidad_vendida'].sum(min_count=1)
+              for df in leer_archivo('ventas', ['local', 'sku_producto', 'cantidad_vendida'], ini, fin)]
+    if not partes:
+        return pd.DataFrame(columns=['local', 'sku_producto', 'cant_vendida'])
+    return (pd.concat(partes).groupby(level=[0, 1]).sum(min_count=1)
+            .rename('cant_vendida').reset_index())
+
+
+def _calcular_consumo(ini, fin, df_rec, archivado=False):
+    from .informes import consumo_teorico
+
+    if archivado:
+        df_v = _ventas_archivadas(ini, fin)
+    else:
+        df_v = run_query(f"""
+            SELECT {_LOCAL_SQL} AS local, sku_producto, SUM(cantidad_vendida) AS cant_vendida
+            FROM ventas
+            WHERE fecha_venta BETWEEN :i AND :f
+            GROUP BY 1, 2
+        """, {"i": str(ini), "f": str(fin)})
+    partes = []
+    for local, df_l in df_v.groupby('local'):
+        cons = consumo_teorico(df_l[['sku_producto', 'cant_vendida']], df_rec)
+        partes.append(cons.assign(local=local))
+    if not partes:
+        return pd.DataFrame()
+    return pd.concat(partes, ignore_index=True)[
+        ['local', 'sku_ingrediente', 'nombre_ingrediente', 'consumo_teorico']]
+
+
+def _calcular_compras(ini, fin):
+    return run_query(f"""
+        SELECT {_LOCAL_SQL} AS local, sku,
+               SUM(cant_conv) AS cant_conv, SUM(muc) AS suma_muc, COUNT(muc) AS n_muc
+        FROM compras
+        WHERE fecha_dte >= :i AND fecha_dte < :fs
+          AND subcat = 'Directo'
+        GROUP BY 1, 2
+    """, {"i": str(ini), "fs": dia_siguiente(fin)})
+
+
+def _escribir_mes(engine, tipo, mes, df, version=''):
+    """Reemplaza el snapshot de `tipo` para `mes` (una transacción)."""
+    tabla = f"snap_{tipo}"
+    filtro_v = " AND version_recetas = :v" if tipo == 'consumo' else ""
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {tabla} WHERE mes = :m{filtro_v}"), {"m": mes, "v": version})
+        conn.execute(text("DELETE FROM snap_meses WHERE tipo = :t AND mes = :m AND version_recetas = :v"),
+                     {"t": tipo, "m": mes, "v": version})
+        if not df.empty:
+            df = df.assign(mes=mes)
+            if tipo == 'consumo':
+                df = df.assign(version_recetas=version)
+            df.to_sql(tabla, conn, if_exists='append', index=False)
+        conn.execute(text(
+            "INSERT INTO snap_meses (tipo, mes, version_recetas, filas, generado) VALUES (:t, :m, :v, :n, :g)"
+        ), {"t": tipo, "m": mes, "v": version, "n": len(df), "g": datetime.now()})
+
+
+def _rango_datos():
+    """(primer, último día) con ventas o compras, en la base o archivados; (None, None) si no hay."""
+    rango = run_query("""
+        SELECT MIN(d) AS desde, MAX(h) AS hasta FROM (
+            SELECT MIN(fecha_venta) AS d, MAX(fecha_venta) AS h FROM ventas
+            UNION ALL SELECT MIN(fecha_dte)::date, MAX(fecha_dte)::date FROM compras
+        ) t
+    """)
+    limites = [] if rango.empty else [pd.Timestamp(v) for v in rango.iloc[0] if pd.notna(v)]
+    anios = set(anios_archivados('ventas')) | set(anios_archivados('compras'))
+    if anios:
+        limites += [pd.Timestamp(f"{min(anios)}-01-01"), pd.Timestamp(f"{max(anios)}-12-31")]
+    if not limites:
+        return None, None
+    return min(limites), max(limites)
+
+
+def generar_snapshots(desde=None, hasta=None, recalcular=False, hoy=None):
+    """
+    Genera los snapshots que falten para los meses cerrados entre `desde` y
+    `hasta` (por defecto: desde el primer mes con datos hasta el mes anterior
+    al actual), sin pasar del último mes con datos. Devuelve {tipo: meses_generados}.
+    """
+    engine = _engine_snapshots()
+    if engine is None:
+        return {}
+    primero, ultimo = _rango_datos()
+    if primero is None:
+        return {}
+    desde = pd.Timestamp(primero if desde is None else desde).to_period('M').start_time
+    abierto = pd.Timestamp(hoy or date.today()).to_period('M')
+    hasta = pd.Timestamp(hasta).to_period('M') if hasta is not None else abierto - 1
+    meses = meses_cerrados(desde, min(hasta, abierto - 1, ultimo.to_period('M')).end_time, hoy)
+
+    df_rec = recetas()
+    version = version_recetas(df_rec)
+    archivados = {'ventas': set(anios_archivados('ventas')), 'consumo': set(anios_archivados('ventas')),
+                  'compras': set(anios_archivados('compras'))}
+    generados = {}
+    for tipo in TIPOS:
+        if tipo == 'consumo' and df_rec.empty:
+            continue
+        v = version if tipo == 'consumo' else ''
+        hechos = set() if recalcular else _meses_con_snapshot(tipo, meses, v)
+        n = 0
+        for m in meses:
+            archivado = m.year in archivados[tipo]
+            # Ventas y compras de un año archivado ya no están en la base: su snapshot queda
+            if m in hechos or (archivado and tipo != 'consumo'):
+                continue
+            ini, fin = m.start_time.date(), m.end_time.date()
+            with medir(f"snapshot: {tipo} {m}") as reg:
+                if tipo == 'ventas':
+                    df = _calcular_ventas(ini, fin)
+                elif tipo == 'consumo':
+                    df = _calcular_consumo(ini, fin, df_rec, archivado)
+                else:
+                    df = _calcular_compras(ini, fin)
+                _escribir_mes(engine, tipo, ini, df, v)
+                reg['filas_out'] = len(df)
+            n += 1
+        generados[tipo] = n
+    return generados
+
+
+def invalidar_snapshots(tipo, fechas):
+    """
+    Borra los snapshots de los meses presentes en `fechas` tras una carga que
+    los modifica ('ventas' invalida también el consumo teórico).
+    """
+    engine = get_engine()
+    if engine is None or fechas is None or len(fechas) == 0:
+        return
+    meses = sorted({p.start_time.date() for p in
+                    pd.to_datetime(pd.Series(fechas), errors='coerce').dropna().dt.to_period('M')})
+    if not meses or not asegurar_tabla(engine, *ESQUEMA_SNAPSHOTS):
+        return
+    tipos = ['ventas', 'consumo'] if tipo == 'ventas' else [tipo]
+    marcas, params = lista_in(meses, "m")
+    with engine.begin() as conn:
+        for t in tipos:
+            conn.execute(text(f"DELETE FROM snap_{t} WHERE mes IN ({marcas})"), params)
+            conn.execute(text(f"DELETE FROM snap_meses WHERE tipo = :t AND mes IN ({marcas})"),
+                         {**params, "t": t})